@@ -1,21 +1,493 @@
-import json
+import asyncio
+import copy
+import hashlib
 import logging
-import re
+import time
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
-import google.generativeai as genai
+from pydantic import ValidationError
 
+from app.cache import TTLCache
+from app.circuit import CircuitBreaker, CircuitOpen, Hedger
 from app.config import settings
-from app.models import ChatMessage
+from app.conversations import estimate_tokens, recent_turns_within
+from app.llm import InvalidModelOutput, LLMProvider, Usage, create_provider
+from app.metrics import LATENCY_BUCKETS_MS, TOKEN_BUCKETS, Histogram, registry
+from app.json_stream import JSONItemStream, JSONStreamError
+from app.models import ChatMessage, WorkoutExercise, WorkoutSuggestion
+from app.workout_rules import detect_focus
 
 logger = logging.getLogger(__name__)
 
-# Configure Gemini
-genai.configure(api_key=settings.gemini_api_key)
+# Backend chosen by settings.llm_provider (Gemini in production, stub for load tests)
+llm = create_provider()
 
-# Initialize the model (using gemini-2.5-flash for faster responses)
-model = genai.GenerativeModel('gemini-2.5-flash')
+CHAT_FALLBACK_MESSAGE = "I'm having trouble connecting right now. Please try again in a moment."
+
+
+class CoachBusy(Exception):
+    """Raised when no AI slot frees up within the queue timeout"""
+
+
+class CoachTimeout(Exception):
+    """Raised when the model does not answer within its deadline"""
+
+
+class ConcurrencyLimiter:
+    """
+    Global and per-user caps on in-flight model calls.
+
+    Callers wait at most queue_timeout seconds for a slot, so AI traffic
+    cannot pile up without bound. Semaphores are created lazily on the
+    running loop.
+    """
+
+    def __init__(self, max_concurrent: int, per_user: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self._loop = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._users: dict[str, list] = {}  # user_id -> [semaphore, holders + waiters]
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_concurrent)
+            self._users = {}
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str] = None):
+        self._bind()
+        user_entry = None
+        if user_id is not None:
+            user_entry = self._users.setdefault(user_id, [asyncio.Semaphore(self.per_user), 0])
+            user_entry[1] += 1
+
+        acquired = []
+        try:
+            semaphores = ([user_entry[0]] if user_entry else []) + [self._global]
+            for semaphore in semaphores:
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise CoachBusy("The AI coach is busy, please try again shortly")
+                acquired.append(semaphore)
+
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+            if user_entry is not None:
+                user_entry[1] -= 1
+                if user_entry[1] == 0:
+                    self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "per_user": self.per_user,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one task.
+
+    The shared task is shielded from individual callers: a caller that is
+    cancelled (e.g. its client disconnected) just stops waiting. Only when
+    the last waiter leaves is the task itself cancelled.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, list] = {}  # key -> [task, waiters]
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _forget(self, key: str, entry: list) -> None:
+        if self._calls.get(key) is entry:
+            del self._calls[key]
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._calls.get(key)
+        if entry is None:
+            entry = [asyncio.ensure_future(factory()), 0]
+            self._calls[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                self._forget(key, entry)
+                self.abandoned += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+class EndpointMetrics:
+    """Counters and histograms for the model calls of one endpoint label"""
+
+    OUTCOMES = ("ok", "busy", "circuit_open", "timeout", "error", "cancelled")
+
+    def __init__(self):
+        self.outcomes = dict.fromkeys(self.OUTCOMES, 0)
+        self.parse_failures = 0
+        self.fallbacks = 0
+        self.estimated_usage = 0
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.first_chunk_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.response_tokens = Histogram(TOKEN_BUCKETS)
+
+    @contextmanager
+    def track(self):
+        """Count the outcome of the model call made inside the block"""
+        try:
+            yield self
+        except CoachBusy:
+            self.outcomes["busy"] += 1
+            raise
+        except CircuitOpen:
+            self.outcomes["circuit_open"] += 1
+            raise
+        except CoachTimeout:
+            self.outcomes["timeout"] += 1
+            raise
+        except Exception:
+            self.outcomes["error"] += 1
+            raise
+        except BaseException:
+            # Cancelled task or a stream closed before it finished
+            self.outcomes["cancelled"] += 1
+            raise
+        else:
+            self.outcomes["ok"] += 1
+
+    def record_usage(self, prompt: str, text: str, usage: Usage) -> None:
+        """Record token counts, estimating from text when the backend gave none"""
+        if usage.prompt_tokens is None or usage.response_tokens is None:
+            self.estimated_usage += 1
+        self.prompt_tokens.observe(usage.prompt_tokens if usage.prompt_tokens is not None else estimate_tokens(prompt))
+        self.response_tokens.observe(
+            usage.response_tokens if usage.response_tokens is not None else estimate_tokens(text)
+        )
+
+    def stats(self) -> dict:
+        calls = sum(self.outcomes.values())
+        return {
+            "calls": calls,
+            "outcomes": dict(self.outcomes),
+            "parse_failures": self.parse_failures,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": round(self.fallbacks / calls, 4) if calls else 0.0,
+            "estimated_usage": self.estimated_usage,
+            "queue_wait_ms": self.queue_wait_ms.stats(),
+            "latency_ms": self.latency_ms.stats(),
+            "first_chunk_ms": self.first_chunk_ms.stats(),
+            "prompt_tokens": self.prompt_tokens.stats(),
+            "response_tokens": self.response_tokens.stats(),
+        }
+
+
+class LLMMetrics:
+    """
+    Instrumentation of model calls, labelled by endpoint.
+
+    Queue wait is the time spent waiting for an AI slot; latency covers the
+    whole completion and first_chunk the wait for a stream's first text.
+    Calls served by single-flight followers never reach the model and are
+    counted by ai_single_flight instead.
+    """
+
+    def __init__(self):
+        self._endpoints: dict[str, EndpointMetrics] = {}
+
+    def endpoint(self, endpoint: str) -> EndpointMetrics:
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def call(self, endpoint: str):
+        """Count the outcome of the model call made inside the block"""
+        return self.endpoint(endpoint).track()
+
+    def parse_failure(self, endpoint: str) -> None:
+        self.endpoint(endpoint).parse_failures += 1
+
+    def fallback(self, endpoint: str) -> None:
+        self.endpoint(endpoint).fallbacks += 1
+
+    def stats(self) -> dict:
+        return {name: metrics.stats() for name, metrics in sorted(self._endpoints.items())}
+
+
+class ModelTier:
+    """
+    A class of model calls with its own model, deadline, concurrency pool,
+    output cap and metrics.
+
+    A tier without a model of its own uses the default backend ``llm``,
+    looked up per call. The pool is taken before the global limiter, so
+    calls waiting on a full tier do not hold global slots.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Optional[str],
+        timeout: Optional[float],
+        max_concurrency: int,
+        max_output_tokens: Optional[int],
+    ):
+        self.name = name
+        self.model = model
+        self.timeout = timeout
+        self.max_output_tokens = max_output_tokens
+        self.pool = ConcurrencyLimiter(
+            max_concurrent=max_concurrency,
+            per_user=max_concurrency,
+            queue_timeout=settings.ai_queue_timeout_seconds,
+        )
+        self.metrics = EndpointMetrics()
+        self._provider = create_provider(model=model) if model else None
+
+    @property
+    def provider(self) -> LLMProvider:
+        return self._provider or llm
+
+    def deadline(self, timeout: float) -> float:
+        """The endpoint's timeout, shortened to the tier's if that is tighter"""
+        return timeout if self.timeout is None else min(timeout, self.timeout)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model or settings.llm_model,
+            "timeout_seconds": self.timeout,
+            "max_output_tokens": self.max_output_tokens,
+            "pool": self.pool.stats(),
+            **self.metrics.stats(),
+        }
+
+
+FAST, STANDARD, HEAVY = "fast", "standard", "heavy"
+
+# Tier for calls that do not pick one
+ENDPOINT_TIERS = {"plan": HEAVY, "summary": FAST}
+
+
+def chat_tier(user_message: str, conversation_history: Optional[list], prompt: str) -> str:
+    """Short messages early in a conversation are cheap enough for the fast tier"""
+    if len(user_message) <= settings.ai_fast_max_message_chars \
+            and len(conversation_history or ()) <= settings.ai_fast_max_history_turns \
+            and estimate_tokens(prompt) <= settings.ai_fast_max_prompt_tokens:
+        return FAST
+    return STANDARD
+
+
+def elapsed_ms(since: float) -> float:
+    return (time.perf_counter() - since) * 1000
+
+
+coach_limiter = ConcurrencyLimiter(
+    max_concurrent=settings.ai_max_concurrency,
+    per_user=settings.ai_per_user_concurrency,
+    queue_timeout=settings.ai_queue_timeout_seconds,
+)
+registry.register("ai_coach", coach_limiter.stats)
+
+prompt_flights = SingleFlight()
+registry.register("ai_single_flight", prompt_flights.stats)
+
+llm_metrics = LLMMetrics()
+registry.register("llm", llm_metrics.stats)
+
+model_tiers = {
+    name: ModelTier(
+        name,
+        model=getattr(settings, f"ai_{name}_model"),
+        timeout=getattr(settings, f"ai_{name}_timeout_seconds"),
+        max_concurrency=getattr(settings, f"ai_{name}_max_concurrency"),
+        max_output_tokens=getattr(settings, f"ai_{name}_max_output_tokens"),
+    )
+    for name in (FAST, STANDARD, HEAVY)
+}
+registry.register("ai_tiers", lambda: {name: tier.stats() for name, tier in model_tiers.items()})
+
+model_circuit = CircuitBreaker(
+    window=settings.ai_breaker_window,
+    min_calls=settings.ai_breaker_min_calls,
+    failure_ratio=settings.ai_breaker_failure_ratio,
+    slow_call_ratio=settings.ai_breaker_slow_call_ratio,
+    open_seconds=settings.ai_breaker_open_seconds,
+)
+registry.register("ai_circuit", model_circuit.stats)
+
+hedger = Hedger(delay=settings.ai_hedge_after_seconds)
+registry.register("ai_hedging", hedger.stats)
+
+# Last good plan/suggestion per similarity key, served while the circuit is open
+last_good = TTLCache(maxsize=settings.ai_last_good_max_entries, ttl=settings.ai_last_good_ttl_seconds)
+registry.register("ai_last_good", last_good.stats)
+
+
+async def generate_text(
+    prompt: str,
+    timeout: float,
+    endpoint: str,
+    user_id: Optional[str] = None,
+    coalesce: bool = False,
+    tier: Optional[str] = None,
+    response_schema: Optional[dict] = None
+) -> str:
+    """
+    Run a model call on the event loop without blocking it, within the AI limits.
+
+    The call goes to the named model tier, or the endpoint's default tier.
+    With coalesce, concurrent calls for the same prompt share one model call;
+    it runs under the first caller's slot and deadline. With response_schema,
+    the model is constrained to JSON matching it. Raises CircuitOpen
+    without calling the model while the circuit breaker is open; while it
+    is closed, a slow call may be hedged with a backup call.
+    """
+    model_tier = model_tiers[tier or ENDPOINT_TIERS.get(endpoint, STANDARD)]
+    timeout = model_tier.deadline(timeout)
+
+    async def attempt() -> tuple[str, Usage]:
+        usage = Usage()
+        text = await model_tier.provider.generate_with_usage(
+            prompt, endpoint, usage,
+            max_output_tokens=model_tier.max_output_tokens,
+            response_schema=response_schema
+        )
+        return text, usage
+
+    async def call() -> str:
+        queued = time.perf_counter()
+        slow_after = settings.ai_breaker_slow_call_fraction * timeout
+        with llm_metrics.call(endpoint) as metrics, model_tier.metrics.track(), \
+                model_circuit.call(slow_after, ignore=(CoachBusy,)) as timing:
+            async with model_tier.pool.slot(), coach_limiter.slot(user_id):
+                for recorder in (metrics, model_tier.metrics):
+                    recorder.queue_wait_ms.observe(elapsed_ms(queued))
+                started = time.perf_counter()
+                hedge = model_circuit.state == CircuitBreaker.CLOSED
+                try:
+                    text, usage = await asyncio.wait_for(hedger.run(attempt, enabled=hedge), timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise CoachTimeout(f"Model did not respond within {timeout:.0f}s")
+                timing.latency = time.perf_counter() - started
+                for recorder in (metrics, model_tier.metrics):
+                    recorder.latency_ms.observe(timing.latency * 1000)
+                    recorder.record_usage(prompt, text, usage)
+                return text
+
+    if not coalesce:
+        return await call()
+    key = hashlib.sha256(f"{endpoint}\n{model_tier.name}\n{prompt}".encode("utf-8")).hexdigest()
+    return await prompt_flights.do(key, call)
+
+
+async def stream_text(
+    prompt: str,
+    timeout: float,
+    endpoint: str,
+    user_id: Optional[str] = None,
+    tier: Optional[str] = None,
+    response_schema: Optional[dict] = None
+) -> AsyncIterator[str]:
+    """
+    Yield text chunks from a streaming model call as they arrive.
+
+    The AI slots are held until the stream is exhausted or closed; timeout
+    bounds the whole generation, not each chunk.
+    """
+    model_tier = model_tiers[tier or ENDPOINT_TIERS.get(endpoint, STANDARD)]
+    timeout = model_tier.deadline(timeout)
+    queued = time.perf_counter()
+    slow_after = settings.ai_breaker_slow_call_fraction * timeout
+    with llm_metrics.call(endpoint) as metrics, model_tier.metrics.track(), \
+            model_circuit.call(slow_after, ignore=(CoachBusy,)) as timing:
+        async with model_tier.pool.slot(), coach_limiter.slot(user_id):
+            for recorder in (metrics, model_tier.metrics):
+                recorder.queue_wait_ms.observe(elapsed_ms(queued))
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            usage = Usage()
+            parts = []
+            chunks = model_tier.provider.stream_with_usage(
+                prompt, endpoint, usage,
+                max_output_tokens=model_tier.max_output_tokens,
+                response_schema=response_schema
+            )
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(anext(chunks), timeout=max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    if text:
+                        if not parts:
+                            for recorder in (metrics, model_tier.metrics):
+                                recorder.first_chunk_ms.observe(elapsed_ms(started))
+                        parts.append(text)
+                        yield text
+            except asyncio.TimeoutError:
+                raise CoachTimeout(f"Model did not finish within {timeout:.0f}s")
+            finally:
+                await chunks.aclose()
+
+            timing.latency = time.perf_counter() - started
+            for recorder in (metrics, model_tier.metrics):
+                recorder.latency_ms.observe(timing.latency * 1000)
+                recorder.record_usage(prompt, "".join(parts), usage)
+
+
+def plan_similarity_key(goal: str, experience_level: str, days_per_week: int) -> tuple:
+    """Plans for the same goal, level and weekly frequency are interchangeable in a pinch"""
+    return ("plan", str(getattr(goal, "value", goal)), experience_level, days_per_week)
+
+
+def suggestion_similarity_key(user_message: str) -> tuple:
+    """Suggestions for the same body regions are similar"""
+    return ("suggest", detect_focus(user_message) or ("full_body",))
+
+
+def last_good_or_raise(key: tuple, error: CircuitOpen) -> dict:
+    """A copy of the last good result for key, or re-raise when there is none"""
+    cached = last_good.get(key)
+    if cached is None:
+        raise error
+    return {**copy.deepcopy(cached), "source": "last_good"}
 
 
 async def get_user_context(user_data: dict) -> str:
@@ -51,23 +523,19 @@ async def get_user_context(user_data: dict) -> str:
     return "\n".join(context_parts)
 
 
-async def chat_with_coach(
+def build_chat_prompt(
     user_message: str,
     user_context: str,
-    conversation_history: Optional[list[ChatMessage]] = None
+    conversation_history: Optional[list[ChatMessage]] = None,
+    summary: Optional[str] = None,
+    relevant_history: Optional[str] = None
 ) -> str:
     """
-    Chat with the AI fitness coach
-    
-    Args:
-        user_message: The user's current message
-        user_context: Context about the user (profile, goals, etc.)
-        conversation_history: Previous messages in the conversation
-    
-    Returns:
-        AI coach's response
+    Assemble the coach system prompt, the user's records relevant to the
+    message, the running summary, as much recent history as fits the token
+    budget and the new message
     """
-    
+
     # Build the system prompt
     system_prompt = f"""You are an expert AI fitness coach for BroncoFit. Your role is to provide:
 - Personalized fitness advice
@@ -88,21 +556,125 @@ Keep responses concise but informative (2-4 paragraphs max).
     
     # Build conversation history
     messages = [system_prompt]
-    
+
+    if relevant_history:
+        messages.append(f"Entries from the user's logs relevant to their message:\n{relevant_history}")
+
+    if summary:
+        messages.append(f"Summary of the earlier conversation:\n{summary}")
+
     if conversation_history:
-        for msg in conversation_history[-5:]:  # Keep last 5 messages for context
+        for msg in recent_turns_within(conversation_history, settings.chat_history_token_budget):
             role_prefix = "User" if msg.role == "user" else "Coach"
             messages.append(f"{role_prefix}: {msg.content}")
     
     messages.append(f"User: {user_message}")
+    return "\n\n".join(messages)
+
+
+async def chat_with_coach(
+    user_message: str,
+    user_context: str,
+    conversation_history: Optional[list[ChatMessage]] = None,
+    user_id: Optional[str] = None,
+    summary: Optional[str] = None,
+    relevant_history: Optional[str] = None
+) -> str:
+    """
+    Chat with the AI fitness coach
     
+    Args:
+        user_message: The user's current message
+        user_context: Context about the user (profile, goals, etc.)
+        conversation_history: Previous messages in the conversation
+        user_id: Caller, for per-user concurrency limits
+        summary: Running summary of turns no longer in the history
+        relevant_history: The user's logged records that match the message
+    
+    Returns:
+        AI coach's response
+    """
+    prompt = build_chat_prompt(user_message, user_context, conversation_history, summary, relevant_history)
+
     # Generate response
     try:
-        response = model.generate_content("\n\n".join(messages))
-        return response.text
+        return await generate_text(
+            prompt,
+            timeout=settings.ai_chat_timeout_seconds,
+            endpoint="chat",
+            user_id=user_id,
+            tier=chat_tier(user_message, conversation_history, prompt)
+        )
+    except CoachBusy:
+        raise
     except Exception:
         logger.exception("Error generating AI response")
-        return "I'm having trouble connecting right now. Please try again in a moment."
+        llm_metrics.fallback("chat")
+        return CHAT_FALLBACK_MESSAGE
+
+
+async def stream_chat_with_coach(
+    user_message: str,
+    user_context: str,
+    conversation_history: Optional[list[ChatMessage]] = None,
+    user_id: Optional[str] = None,
+    summary: Optional[str] = None,
+    relevant_history: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of chat_with_coach: yields reply text as the model
+    produces it. Failures before the first chunk yield the fallback message;
+    later failures propagate to the caller.
+    """
+    prompt = build_chat_prompt(user_message, user_context, conversation_history, summary, relevant_history)
+
+    started = False
+    try:
+        async for text in stream_text(
+            prompt,
+            timeout=settings.ai_chat_timeout_seconds,
+            endpoint="chat",
+            user_id=user_id,
+            tier=chat_tier(user_message, conversation_history, prompt)
+        ):
+            started = True
+            yield text
+    except CoachBusy:
+        raise
+    except Exception:
+        if started:
+            raise
+        logger.exception("Error streaming AI response")
+        llm_metrics.fallback("chat")
+        yield CHAT_FALLBACK_MESSAGE
+
+
+async def summarize_conversation(
+    previous_summary: Optional[str],
+    turns: list[ChatMessage],
+    user_id: Optional[str] = None
+) -> str:
+    """Fold older conversation turns into the running summary"""
+    transcript = "\n".join(
+        f"{'User' if turn.role == 'user' else 'Coach'}: {turn.content}" for turn in turns
+    )
+    prompt = f"""Update the running summary of a conversation between a user and their AI fitness coach.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New turns to fold in:
+{transcript}
+
+Write the updated summary in at most {settings.chat_summary_max_tokens * 3 // 4} words. Keep the user's goals,
+constraints, injuries, preferences and any advice or plans already agreed. Return only the summary."""
+
+    return await generate_text(
+        prompt,
+        timeout=settings.ai_chat_timeout_seconds,
+        endpoint="summary",
+        user_id=user_id
+    )
 
 
 async def generate_workout_plan(
@@ -111,7 +683,8 @@ async def generate_workout_plan(
     days_per_week: int,
     equipment: list[str],
     duration_minutes: int,
-    user_context: str
+    user_context: str,
+    user_id: Optional[str] = None
 ) -> dict:
     """
     Generate a personalized workout plan using Gemini
@@ -120,6 +693,7 @@ async def generate_workout_plan(
     """
 
     equipment_str = ", ".join(equipment) if equipment else "bodyweight only"
+    similar = plan_similarity_key(goal, experience_level, days_per_week)
 
     prompt = f"""Create a detailed {days_per_week}-day per week workout plan with the following specifications:
 
@@ -148,31 +722,39 @@ Focus on progressive overload and sustainability.
 """
 
     try:
-        response = model.generate_content(prompt)
-
-        return {
+        plan_text = await generate_text(
+            prompt,
+            timeout=settings.ai_plan_timeout_seconds,
+            endpoint="plan",
+            user_id=user_id,
+            coalesce=True
+        )
+
+        plan = {
             "plan_name": f"{experience_level.title()} {goal.replace('_', ' ').title()} Plan",
             "description": f"A {days_per_week}-day per week program designed for {goal.replace('_', ' ')}",
             "duration_weeks": 8 if experience_level == "beginner" else 12,
-            "ai_generated_plan": response.text,
+            "ai_generated_plan": plan_text,
             "created_at": datetime.now()
         }
+        last_good.set(similar, plan)
+        return plan
+    except CircuitOpen as e:
+        return last_good_or_raise(similar, e)
+    except (CoachBusy, CoachTimeout):
+        raise
     except Exception:
         logger.exception("Error generating workout plan")
         raise Exception("Failed to generate workout plan")
 
 
-async def suggest_workout(
-    user_message: str,
-    user_context: str
-) -> dict:
-    """
-    Generate a structured workout suggestion based on user's request
+# Generation is constrained to this schema, so the prompt only describes the content
+SUGGESTION_SCHEMA = WorkoutSuggestion.model_json_schema()
+SUGGESTION_MESSAGE = "Here's a workout I've created for you! You can review it and save it directly to your workout log."
 
-    Returns a structured workout with exercises that can be saved directly
-    """
 
-    prompt = f"""You are an expert fitness coach. The user is asking for a workout suggestion.
+def build_suggestion_prompt(user_message: str, user_context: str) -> str:
+    return f"""You are an expert fitness coach. The user is asking for a workout suggestion.
 
 User Context:
 {user_context}
@@ -180,66 +762,143 @@ User Context:
 User Request:
 {user_message}
 
-Generate a workout with 4-8 exercises that matches their request. Return your response as a JSON object with this exact structure:
-
-{{
-  "workout_name": "Name of the workout (e.g., 'Upper Body Strength')",
-  "description": "Brief 1-2 sentence description of the workout",
-  "exercises": [
-    {{
-      "exercise_name": "Exercise name",
-      "exercise_type": "strength",
-      "sets": 3,
-      "reps": 10,
-      "weight_kg": null,
-      "notes": "Brief form tip or instruction"
-    }}
-  ],
-  "duration_minutes": 45,
-  "notes": "Any additional tips for the workout"
-}}
+Generate a workout with 4-8 exercises that matches their request.
 
 Rules:
-- exercise_type must be one of: "strength", "cardio", "flexibility", "sports"
 - For strength exercises: include sets and reps, leave weight_kg as null (user will fill in)
 - For cardio: include duration_minutes in the exercise, leave sets/reps as null
-- Include 4-8 exercises total
+- Give each exercise a brief form tip or instruction in its notes
+- Keep the description to 1-2 sentences
 - Base recommendations on their fitness goal and experience level
-- Make it practical and effective
-- Return ONLY the JSON, no other text"""
+- Make it practical and effective"""
 
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
 
-        # Extract JSON from markdown code blocks if present
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            response_text = json_match.group(1)
+class SuggestionParser:
+    """
+    Parses a suggestion as the model streams it.
 
-        # Parse the JSON response
-        workout_data = json.loads(response_text)
+    feed() returns each exercise once its closing brace arrives, validated
+    against WorkoutExercise; exercises that fail validation are logged and
+    dropped. finish() validates the rest of the workout and builds the
+    response. Output that is not a JSON object, or leaves no valid
+    exercises, raises InvalidModelOutput.
+    """
 
-        # Validate the structure
-        if not workout_data.get("workout_name"):
-            workout_data["workout_name"] = "AI Suggested Workout"
-        if not workout_data.get("exercises"):
-            raise ValueError("No exercises in workout")
+    def __init__(self):
+        self._stream = JSONItemStream("exercises")
+        self.exercises: list[dict] = []
+
+    def feed(self, text: str) -> list[dict]:
+        try:
+            items = self._stream.feed(text)
+        except JSONStreamError as e:
+            raise self._invalid(e)
+
+        completed = []
+        for item in items:
+            try:
+                exercise = WorkoutExercise.model_validate(item).model_dump(mode="json")
+            except ValidationError:
+                logger.warning("Dropping invalid suggested exercise: %s", item)
+                continue
+            self.exercises.append(exercise)
+            completed.append(exercise)
+        return completed
+
+    def finish(self) -> dict:
+        try:
+            data = self._stream.finish()
+            data["exercises"] = self.exercises
+            if not self.exercises:
+                raise ValueError("No valid exercises in workout")
+            data["workout_name"] = data.get("workout_name") or "AI Suggested Workout"
+            workout = WorkoutSuggestion.model_validate(data).model_dump(mode="json")
+        except (JSONStreamError, ValidationError, ValueError, TypeError) as e:
+            raise self._invalid(e)
+
+        return {"success": True, "workout": workout, "message": SUGGESTION_MESSAGE, "source": "model"}
+
+    @staticmethod
+    def _invalid(error: Exception) -> InvalidModelOutput:
+        logger.warning("Unusable workout suggestion from the model: %s", error)
+        llm_metrics.parse_failure("suggest")
+        return InvalidModelOutput(f"The model returned an unusable workout: {error}")
 
-        return {
-            "success": True,
-            "workout": workout_data,
-            "message": "Here's a workout I've created for you! You can review it and save it directly to your workout log."
-        }
 
-    except json.JSONDecodeError:
-        logger.exception("Error parsing AI JSON response. Raw response: %s", response_text)
-        # Return a fallback workout
-        return {
-            "success": False,
-            "error": "Failed to generate structured workout",
-            "fallback_text": response_text
-        }
+async def suggest_workout(
+    user_message: str,
+    user_context: str,
+    user_id: Optional[str] = None
+) -> dict:
+    """
+    Generate a structured workout suggestion based on user's request
+
+    Returns a structured workout with exercises that can be saved directly
+    """
+    similar = suggestion_similarity_key(user_message)
+    try:
+        response_text = await generate_text(
+            build_suggestion_prompt(user_message, user_context),
+            timeout=settings.ai_suggest_timeout_seconds,
+            endpoint="suggest",
+            user_id=user_id,
+            coalesce=True,
+            response_schema=SUGGESTION_SCHEMA
+        )
+    except CircuitOpen as e:
+        return last_good_or_raise(similar, e)
+    except (CoachBusy, CoachTimeout, InvalidModelOutput):
+        raise
     except Exception:
         logger.exception("Error generating workout suggestion")
         raise Exception("Failed to generate workout suggestion")
+
+    parser = SuggestionParser()
+    parser.feed(response_text)
+    result = parser.finish()
+    last_good.set(similar, result)
+    return result
+
+
+async def stream_workout_suggestion(
+    user_message: str,
+    user_context: str,
+    user_id: Optional[str] = None
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Streaming variant of suggest_workout: yields ("exercise", exercise) as
+    each exercise is generated and validated, then ("done", response).
+    A last good suggestion served while the circuit is open is replayed
+    the same way.
+    """
+    similar = suggestion_similarity_key(user_message)
+    parser = SuggestionParser()
+    chunks = stream_text(
+        build_suggestion_prompt(user_message, user_context),
+        timeout=settings.ai_suggest_timeout_seconds,
+        endpoint="suggest",
+        user_id=user_id,
+        response_schema=SUGGESTION_SCHEMA
+    )
+    try:
+        async for text in chunks:
+            for exercise in parser.feed(text):
+                yield "exercise", exercise
+    except CircuitOpen as e:
+        result = last_good_or_raise(similar, e)
+        for exercise in result["workout"]["exercises"]:
+            yield "exercise", exercise
+        yield "done", result
+        return
+    except (CoachBusy, CoachTimeout, InvalidModelOutput):
+        raise
+    except Exception:
+        logger.exception("Error streaming workout suggestion")
+        raise Exception("Failed to generate workout suggestion")
+    finally:
+        # Release the AI slots as soon as parsing fails or the client goes away
+        await chunks.aclose()
+
+    result = parser.finish()
+    last_good.set(similar, result)
+    yield "done", result
@@ -0,0 +1,148 @@
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.models import BulkItemError, BulkResult
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+# Request body docs for endpoints that read the raw request stream
+BULK_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "application/x-ndjson": {"schema": {"type": "string", "description": "One JSON object per line"}},
+        },
+    }
+}
+
+
+class _ParseError:
+    def __init__(self, message: str):
+        self.message = message
+
+
+async def iter_bulk_items(request: Request) -> AsyncIterator[Any]:
+    """
+    Yield raw items from a JSON array body or a streamed NDJSON body.
+
+    NDJSON lines are decoded as they arrive; a malformed line yields a
+    _ParseError in its place instead of failing the whole request.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _decode_line(line)
+        if buffer.strip():
+            yield _decode_line(buffer)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+    if len(items) > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.bulk_max_items} items per request"
+        )
+    for item in items:
+        yield item
+
+
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return _ParseError(f"Invalid JSON: {e}")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'item'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+async def bulk_insert(
+    request: Request,
+    model: type[BaseModel],
+    build_document: Callable[[BaseModel], dict],
+    collection,
+    on_inserted: Optional[Callable[[list[dict]], Awaitable[None]]] = None,
+) -> BulkResult:
+    """
+    Validate items with `model`, build documents and write them with
+    unordered insert_many in chunks of settings.bulk_chunk_size.
+
+    Invalid or rejected items are reported per index; the rest of the batch
+    is still written. `on_inserted` receives each chunk's inserted documents.
+    """
+    ids: list[Optional[str]] = []
+    errors: list[BulkItemError] = []
+    chunk: list[tuple[int, dict]] = []
+
+    async def flush():
+        documents = [document for _, document in chunk]
+        failed: dict[int, str] = {}
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+
+        inserted = []
+        for position, (index, document) in enumerate(chunk):
+            if position in failed:
+                errors.append(BulkItemError(index=index, error=failed[position]))
+            else:
+                ids[index] = str(document["_id"])
+                inserted.append(document)
+        chunk.clear()
+
+        if inserted and on_inserted is not None:
+            await on_inserted(inserted)
+
+    index = 0
+    async for item in iter_bulk_items(request):
+        if index >= settings.bulk_max_items:
+            errors.append(BulkItemError(
+                index=index,
+                error=f"Batch limit of {settings.bulk_max_items} items reached; remaining items were not processed"
+            ))
+            break
+
+        ids.append(None)
+        if isinstance(item, _ParseError):
+            errors.append(BulkItemError(index=index, error=item.message))
+        else:
+            try:
+                chunk.append((index, build_document(model.model_validate(item))))
+            except ValidationError as e:
+                errors.append(BulkItemError(index=index, error=_format_validation_error(e)))
+
+        if len(chunk) >= settings.bulk_chunk_size:
+            await flush()
+        index += 1
+
+    if chunk:
+        await flush()
+
+    errors.sort(key=lambda error: error.index)
+    return BulkResult(
+        inserted=sum(1 for inserted_id in ids if inserted_id is not None),
+        ids=ids,
+        errors=errors,
+    )
@@ -1,3 +1,16 @@
+"""
+Fitness calculations: BMR, TDEE, macros and BMI
+
+Each calculation has a scalar form for one person and a ``_batch`` form
+that takes one array per input and computes every row at once with NumPy.
+The batch forms perform the same float operations in the same order and
+round exactly like Python's ``round``, so their results are identical to
+calling the scalar form row by row.
+"""
+from typing import Sequence
+
+import numpy as np
+
 from app.models import ActivityLevel
 
 
@@ -10,6 +23,24 @@ ACTIVITY_MULTIPLIERS = {
     ActivityLevel.VERY_ACTIVE: 1.9,      # Very hard exercise & physical job
 }
 
+# Daily calorie offset from TDEE per weight goal
+GOAL_OFFSETS = {
+    "mild_weight_loss": -250,      # 0.5 lb/week
+    "weight_loss": -500,           # 1 lb/week
+    "extreme_weight_loss": -1000,  # 2 lb/week
+    "mild_weight_gain": 250,       # 0.5 lb/week
+    "weight_gain": 500,            # 1 lb/week
+    "fast_weight_gain": 1000,      # 2 lb/week
+}
+
+MALE = ("male", "m")
+
+BMI_CATEGORY_BOUNDS = (18.5, 25, 30)
+BMI_CATEGORIES = ("Underweight", "Normal weight", "Overweight", "Obese")
+
+# Veltkamp splitting constant for float64 (2**27 + 1)
+SPLITTER = 134217729.0
+
 
 def calculate_bmr_mifflin_st_jeor(weight_kg: float, height_cm: float, age: int, sex: str) -> float:
     """
@@ -26,7 +57,7 @@ def calculate_bmr_mifflin_st_jeor(weight_kg: float, height_cm: float, age: int,
     """
     base = (10 * weight_kg) + (6.25 * height_cm) - (5 * age)
 
-    if sex.lower() in ("male", "m"):
+    if sex.lower() in MALE:
         bmr = base + 5
     else:  # female
         bmr = base - 161
@@ -71,14 +102,8 @@ def calculate_tdee(weight_kg: float, height_cm: float, age: int, sex: str, activ
         "protein_g": protein_g,
         "carbs_g": carbs_g,
         "fat_g": fat_g,
-        # Weight loss recommendations
-        "mild_weight_loss": round(tdee - 250, 2),      # 0.5 lb/week
-        "weight_loss": round(tdee - 500, 2),           # 1 lb/week
-        "extreme_weight_loss": round(tdee - 1000, 2),  # 2 lb/week
-        # Weight gain recommendations
-        "mild_weight_gain": round(tdee + 250, 2),      # 0.5 lb/week
-        "weight_gain": round(tdee + 500, 2),           # 1 lb/week
-        "fast_weight_gain": round(tdee + 1000, 2),     # 2 lb/week
+        # Weight loss and gain recommendations
+        **{goal: round(tdee + offset, 2) for goal, offset in GOAL_OFFSETS.items()},
     }
 
 
@@ -88,7 +113,8 @@ def calculate_bmi(weight_kg: float, height_cm: float) -> float:
     BMI = weight(kg) / (height(m))^2
     """
     height_m = height_cm / 100
-    bmi = weight_kg / (height_m ** 2)
+    # Multiplied rather than ** 2: pow() is not correctly rounded on every libm
+    bmi = weight_kg / (height_m * height_m)
     return round(bmi, 2)
 
 
@@ -103,3 +129,84 @@ def get_bmi_category(bmi: float) -> str:
     else:
         return "Obese"
 
+
+def _split(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split each float into high and low halves whose products are exact"""
+    scaled = SPLITTER * values
+    high = scaled - (scaled - values)
+    return high, values - high
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    round(value, 2) for every element, bit for bit.
+
+    Python rounds the exact decimal value, half to even. values * 100 is
+    itself rounded, which only matters when it lands exactly on .5: then
+    the product's rounding error (recovered exactly by Dekker's product)
+    says which side of the tie the true value lies on.
+    """
+    scaled = values * 100
+    rounded = np.rint(scaled)
+    ties = np.flatnonzero(np.abs(scaled - np.trunc(scaled)) == 0.5)
+    if len(ties):
+        tied, product = values[ties], scaled[ties]
+        high, low = _split(tied)
+        hundred_high, hundred_low = _split(np.float64(100))
+        error = ((high * hundred_high - product) + high * hundred_low + low * hundred_high) + low * hundred_low
+        rounded[ties] = np.where(error > 0, np.ceil(product), np.where(error < 0, np.floor(product), rounded[ties]))
+    return rounded / 100
+
+
+def calculate_tdee_batch(
+    weight_kg: Sequence[float],
+    height_cm: Sequence[float],
+    age: Sequence[int],
+    sex: Sequence[str],
+    activity_level: Sequence[ActivityLevel],
+) -> dict[str, np.ndarray]:
+    """
+    calculate_tdee for many people at once.
+
+    Takes one sequence per input, all the same length, and returns the same
+    keys as calculate_tdee, each an array in input order.
+    """
+    weight = np.asarray(weight_kg, dtype=np.float64)
+    height = np.asarray(height_cm, dtype=np.float64)
+    years = np.asarray(age, dtype=np.float64)
+    # map() keeps the per-row lookups for the categorical inputs out of the interpreter loop
+    male = np.fromiter(map(frozenset(MALE).__contains__, map(str.lower, sex)), dtype=bool, count=len(weight))
+    multiplier = np.fromiter(
+        map(ACTIVITY_MULTIPLIERS.__getitem__, activity_level), dtype=np.float64, count=len(weight)
+    )
+
+    base = (10 * weight) + (6.25 * height) - (5 * years)
+    bmr = _round2(np.where(male, base + 5, base - 161))
+    tdee = _round2(bmr * multiplier)
+
+    protein_g = _round2(weight * 2)
+    fat_g = _round2(tdee * 0.25 / 9)
+    carbs_g = _round2((tdee - protein_g * 4 - fat_g * 9) / 4)
+
+    return {
+        "bmr": bmr,
+        "tdee": tdee,
+        "activity_multiplier": multiplier,
+        "maintenance_calories": tdee,
+        "protein_g": protein_g,
+        "carbs_g": carbs_g,
+        "fat_g": fat_g,
+        **{goal: _round2(tdee + offset) for goal, offset in GOAL_OFFSETS.items()},
+    }
+
+
+def calculate_bmi_batch(weight_kg: Sequence[float], height_cm: Sequence[float]) -> np.ndarray:
+    """calculate_bmi for many people at once"""
+    height_m = np.asarray(height_cm, dtype=np.float64) / 100
+    return _round2(np.asarray(weight_kg, dtype=np.float64) / (height_m * height_m))
+
+
+def get_bmi_categories(bmi: np.ndarray) -> list[str]:
+    """get_bmi_category for every element of bmi"""
+    indexes = np.searchsorted(BMI_CATEGORY_BOUNDS, bmi, side="right")
+    return np.asarray(BMI_CATEGORIES, dtype=object)[indexes].tolist()
@@ -0,0 +1,188 @@
+"""
+Circuit breaker and hedged requests for calls to the model backend
+
+When the model degrades, the breaker trips on the failure or slow-call
+ratio of the most recent calls and rejects new calls at once for a cool-off
+period, so requests fail fast instead of each paying the full timeout.
+After the cool-off a single probe call is let through: success closes the
+circuit, failure opens it again.
+
+Hedging starts a second, identical call when the first has not answered
+within a delay and returns whichever finishes first, trading extra model
+calls for a shorter latency tail. It is off unless a delay is configured.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the model while the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The AI coach is temporarily unavailable, please try again shortly")
+        self.retry_after = retry_after
+
+
+class CallTiming:
+    """Set by the caller once the model call itself has finished"""
+
+    latency: Optional[float] = None
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int,
+        min_calls: int,
+        failure_ratio: float,
+        slow_call_ratio: float,
+        open_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_ratio = slow_call_ratio
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow) per recent call
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        return max(self.open_seconds - (self._clock() - self._opened_at), 0.0)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen unless a call may go ahead now"""
+        if self.state == self.OPEN:
+            if self._clock() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpen(self.retry_after())
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpen(1.0)
+            self._probing = True
+
+    def record(self, failed: bool, slow: bool = False) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if failed or slow:
+                self._open()
+            else:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            return
+        if self.state == self.OPEN:
+            return  # a call that started before the circuit opened
+
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow_calls = sum(1 for _, slow in self._outcomes if slow)
+        if failures / len(self._outcomes) >= self.failure_ratio or \
+                slow_calls / len(self._outcomes) >= self.slow_call_ratio:
+            self._open()
+
+    def release(self) -> None:
+        """Forget a call that told us nothing about the model (busy, cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened += 1
+
+    @contextmanager
+    def call(self, slow_after: float, ignore: tuple = ()):
+        """
+        Guard one model call.
+
+        The caller sets ``timing.latency`` on the yielded object when the
+        model answers; a call slower than slow_after seconds counts as slow.
+        Exceptions in ``ignore`` (our own capacity limits) are not held
+        against the model.
+        """
+        self.before_call()
+        timing = CallTiming()
+        try:
+            yield timing
+        except ignore:
+            self.release()
+            raise
+        except Exception:
+            self.record(failed=True)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.record(failed=False, slow=timing.latency is not None and timing.latency > slow_after)
+
+    def stats(self) -> dict:
+        recent = len(self._outcomes)
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "recent_calls": recent,
+            "recent_failure_ratio": round(sum(f for f, _ in self._outcomes) / recent, 4) if recent else 0.0,
+            "recent_slow_ratio": round(sum(s for _, s in self._outcomes) / recent, 4) if recent else 0.0,
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == self.OPEN else 0.0,
+        }
+
+
+class Hedger:
+    """Races a backup call against a slow first call (disabled when delay is None)"""
+
+    def __init__(self, delay: Optional[float]):
+        self.delay = delay
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def run(self, factory: Callable[[], Awaitable[Any]], enabled: bool = True) -> Any:
+        if self.delay is None or not enabled:
+            return await factory()
+
+        first = asyncio.ensure_future(factory())
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            attempts.append(asyncio.ensure_future(factory()))
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            self.hedge_wins += 1
+                        return attempt.result()
+            return first.result()  # both failed: surface the first error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "delay_seconds": self.delay,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
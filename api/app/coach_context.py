@@ -0,0 +1,122 @@
+"""
+Per-user context for the AI coach
+
+Every chat turn and workout suggestion needs the same snapshot of the user:
+profile, latest measurement and recent activity. The reads run concurrently
+with projections limited to the fields the prompt uses, and the rendered
+text is cached per user until one of those collections changes. Routers
+that write profiles, measurements, workouts or meals call
+``bump_user_version`` after a successful write; the cache checks the
+user's version in MongoDB on every read, so a write handled by another
+worker is seen immediately.
+"""
+import asyncio
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from app.ai_coach import get_user_context
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import registry
+from app.user_versions import read_user_version
+
+PROFILE_FIELDS = (
+    "age",
+    "sex",
+    "height_cm",
+    "current_weight_kg",
+    "target_weight_kg",
+    "activity_level",
+    "fitness_goal",
+)
+MEASUREMENT_FIELDS = ("weight_kg", "body_fat_pct")
+RECENT_ACTIVITY_LIMIT = 5
+
+
+def projection(fields: tuple[str, ...]) -> dict:
+    return {"_id": 0, **dict.fromkeys(fields, 1)}
+
+
+class CoachContext(NamedTuple):
+    text: str
+    fitness_goal: Optional[str]
+
+
+async def fetch_user_data(db, user_id: str) -> dict:
+    """Read everything the coach context needs in one concurrent round"""
+    # Only the number of recent workouts and meals is rendered, so their ids suffice
+    profile, latest_measurement, recent_workouts, recent_meals = await asyncio.gather(
+        db.profiles.find_one({"user_id": user_id}, projection(PROFILE_FIELDS)),
+        db.measurements.find_one(
+            {"user_id": user_id},
+            projection(MEASUREMENT_FIELDS),
+            sort=[("measurement_date", -1)],
+        ),
+        db.workouts.find({"user_id": user_id}, {"_id": 1})
+        .sort("created_at", -1).limit(RECENT_ACTIVITY_LIMIT).to_list(RECENT_ACTIVITY_LIMIT),
+        db.meals.find({"user_id": user_id}, {"_id": 1})
+        .sort("created_at", -1).limit(RECENT_ACTIVITY_LIMIT).to_list(RECENT_ACTIVITY_LIMIT),
+    )
+
+    user_data = {"recent_workouts": recent_workouts, "recent_meals": recent_meals}
+    if profile:
+        user_data["profile"] = profile
+    if latest_measurement:
+        user_data["latest_measurement"] = latest_measurement
+    return user_data
+
+
+class CoachContextCache:
+    """
+    Caches the rendered coach context per user, tagged with the user's data
+    version it was loaded at.
+
+    An entry is served only while the caller's current version matches it.
+    A load is stored under the version read before it started, so a load
+    that raced a write is replaced on the next read.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)  # user_id -> (version, context)
+        self.stale = 0
+
+    async def get_or_load(
+        self,
+        user_id: str,
+        version: int,
+        load: Callable[[], Awaitable[CoachContext]],
+    ) -> CoachContext:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            cached_version, context = entry
+            if cached_version == version:
+                return context
+            self.stale += 1
+
+        context = await load()
+        self._entries.set(user_id, (version, context))
+        return context
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "stale": self.stale}
+
+
+coach_context_cache = CoachContextCache(
+    maxsize=settings.coach_context_cache_max_entries,
+    ttl=settings.coach_context_cache_ttl_seconds,
+)
+registry.register("coach_context_cache", coach_context_cache.stats)
+
+
+async def load_coach_context(db, user_id: str) -> CoachContext:
+    """The user's coach context, from the cache when nothing changed since the last turn"""
+
+    async def load() -> CoachContext:
+        user_data = await fetch_user_data(db, user_id)
+        text = await get_user_context(user_data)
+        return CoachContext(text, user_data.get("profile", {}).get("fitness_goal"))
+
+    version = await read_user_version(db, user_id)
+    return await coach_context_cache.get_or_load(user_id, version, load)
@@ -10,12 +10,42 @@ class Settings(BaseSettings):
     # MongoDB Configuration
     mongodb_uri: str = "mongodb://localhost:27017"
     database_name: str = "broncofit"
+    ensure_indexes_on_startup: bool = True
+
+    # MongoDB connection pool (per worker process)
+    mongodb_min_pool_size: int = 0
+    mongodb_max_pool_size: int = 100
+    mongodb_wait_queue_timeout_ms: Optional[int] = 10000
+    mongodb_server_selection_timeout_ms: int = 30000
+    mongodb_connect_timeout_ms: int = 20000
+    mongodb_socket_timeout_ms: Optional[int] = None
+    mongodb_compressors: str = ""  # e.g. "zstd,snappy,zlib" (zstd/snappy need extra packages)
+    mongodb_retry_reads: bool = True
+    mongodb_retry_writes: bool = True
 
     # JWT Configuration
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440  # 24 hours
 
+    # Authenticated-principal cache (0 disables)
+    principal_cache_max_entries: int = 10000
+    principal_cache_ttl_seconds: float = 60.0
+
+    # Bulk ingestion endpoints
+    bulk_max_items: int = 5000
+    bulk_chunk_size: int = 500
+
+    # Batch TDEE/BMI calculation endpoints
+    calculation_batch_max_rows: int = 50000
+
+    # Streaming export cursor batch size
+    export_batch_size: int = 500
+
+    # Password hashing pool (bcrypt runs off the event loop)
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 32
+
     # API Configuration
     api_host: str = "0.0.0.0"
     api_port: int = 8000
@@ -23,6 +53,93 @@ class Settings(BaseSettings):
     # Gemini AI Configuration
     gemini_api_key: str
 
+    # LLM backend: "gemini", or "stub" for offline load testing
+    llm_provider: str = "gemini"
+    llm_model: str = "gemini-2.5-flash"
+
+    # Stub backend profile (latency_ms is the median time to first chunk)
+    llm_stub_latency_ms: float = 800.0
+    llm_stub_latency_distribution: str = "lognormal"  # "fixed", "uniform" or "lognormal"
+    llm_stub_latency_spread: float = 0.5  # lognormal sigma, or +/- fraction for uniform
+    llm_stub_chunk_interval_ms: float = 50.0
+    llm_stub_chunk_chars: int = 40
+    llm_stub_error_rate: float = 0.0
+    llm_stub_seed: Optional[int] = None
+
+    # AI coach concurrency limits and deadlines
+    ai_max_concurrency: int = 8
+    ai_per_user_concurrency: int = 2
+    ai_queue_timeout_seconds: float = 5.0
+    ai_chat_timeout_seconds: float = 30.0
+    ai_plan_timeout_seconds: float = 90.0
+    ai_suggest_timeout_seconds: float = 45.0
+
+    # Model tiers: short chat turns and summaries go to "fast", workout plans to
+    # "heavy", everything else to "standard". An unset model uses llm_model; a
+    # tier timeout can only shorten the endpoint's. Each tier's pool caps its
+    # share of ai_max_concurrency so heavy calls cannot starve cheap ones.
+    # Thinking models count thinking tokens against max_output_tokens and
+    # google-generativeai cannot switch thinking off, so a tight cap can leave
+    # no room for the answer; only cap tiers whose model does not think.
+    ai_fast_model: Optional[str] = None
+    ai_fast_timeout_seconds: Optional[float] = 15.0
+    ai_fast_max_concurrency: int = 6
+    ai_fast_max_output_tokens: Optional[int] = None
+    ai_standard_model: Optional[str] = None
+    ai_standard_timeout_seconds: Optional[float] = None
+    ai_standard_max_concurrency: int = 6
+    ai_standard_max_output_tokens: Optional[int] = None
+    ai_heavy_model: Optional[str] = None
+    ai_heavy_timeout_seconds: Optional[float] = None
+    ai_heavy_max_concurrency: int = 2
+    ai_heavy_max_output_tokens: Optional[int] = None
+    # A chat turn is routed to the fast tier only if all of these are small
+    ai_fast_max_message_chars: int = 280
+    ai_fast_max_history_turns: int = 6
+    ai_fast_max_prompt_tokens: int = 1500
+
+    # AI circuit breaker: trips when enough of the recent model calls fail or
+    # run slow (slower than slow_call_fraction of their timeout)
+    ai_breaker_window: int = 20
+    ai_breaker_min_calls: int = 10
+    ai_breaker_failure_ratio: float = 0.5
+    ai_breaker_slow_call_ratio: float = 0.5
+    ai_breaker_slow_call_fraction: float = 0.8
+    ai_breaker_open_seconds: float = 30.0
+    # Start a backup model call after this many seconds (unset disables hedging)
+    ai_hedge_after_seconds: Optional[float] = None
+    # Last good plan/suggestion per similar input, served while the circuit is open
+    ai_last_good_max_entries: int = 500
+    ai_last_good_ttl_seconds: float = 7 * 24 * 3600.0
+
+    # AI workout plan cache (in-memory LRU in front of MongoDB; ttl 0 disables)
+    plan_cache_max_entries: int = 1000
+    plan_cache_memory_ttl_seconds: float = 3600.0
+    plan_cache_ttl_seconds: float = 30 * 24 * 3600.0
+
+    # Background workout-plan jobs (workers per process; 0 leaves jobs to other processes)
+    plan_job_workers: int = 2
+    plan_job_poll_seconds: float = 1.0
+    plan_job_lease_seconds: float = 300.0
+    plan_job_max_attempts: int = 3
+    # Delay before the first retry of a transiently failed job; doubles with each attempt
+    plan_job_retry_backoff_seconds: float = 5.0
+
+    # Rendered AI coach context per user, dropped on writes to the data it is built from
+    coach_context_cache_max_entries: int = 10000
+    coach_context_cache_ttl_seconds: float = 600.0
+
+    # AI coach conversation memory (approximate tokens, ~4 characters each)
+    chat_history_token_budget: int = 2000
+    chat_summary_max_tokens: int = 400
+
+    # Retrieval of the user's own records for chat (in-memory BM25 index per user)
+    chat_retrieval_top_k: int = 8
+    chat_retrieval_token_budget: int = 300
+    history_index_max_users: int = 1000
+    history_index_ttl_seconds: float = 1800.0
+    history_index_max_records: int = 500  # most recent per collection
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,137 @@
+"""
+Server-side AI coach conversations
+
+Turns are persisted in ``ai_conversations`` so clients only send the new
+message and a conversation id. When the stored turns outgrow the history
+token budget, the oldest ones are folded into a running summary, which
+keeps the prompt bounded no matter how long the conversation runs.
+"""
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+Summarizer = Callable[[Optional[str], list[ChatMessage]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    limit = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def recent_turns_within(turns: list[ChatMessage], budget: int) -> list[ChatMessage]:
+    """The newest turns whose combined size fits the token budget, oldest first"""
+    kept: list[ChatMessage] = []
+    used = 0
+    for turn in reversed(turns):
+        used += estimate_tokens(turn.content)
+        if used > budget:
+            break
+        kept.append(turn)
+    return kept[::-1]
+
+
+def conversation_messages(conversation: dict) -> list[ChatMessage]:
+    return [ChatMessage(**turn) for turn in conversation.get("turns", [])]
+
+
+def _turn(message: ChatMessage) -> dict:
+    return {
+        "role": message.role,
+        "content": message.content,
+        "timestamp": message.timestamp or datetime.utcnow(),
+    }
+
+
+async def start_conversation(db, user_id: str, seed: Optional[list[ChatMessage]] = None) -> dict:
+    """Create a conversation, optionally seeded with client-side history"""
+    now = datetime.utcnow()
+    turns = [_turn(message) for message in seed or []]
+    conversation = {
+        "user_id": user_id,
+        "summary": None,
+        "turns": turns,
+        "turn_count": len(turns),
+        "summarized_turns": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await db.ai_conversations.insert_one(conversation)
+    conversation["_id"] = result.inserted_id
+    return conversation
+
+
+async def get_conversation(db, user_id: str, conversation_id: str) -> Optional[dict]:
+    """The user's conversation, or None if the id is malformed or not theirs"""
+    if not ObjectId.is_valid(conversation_id):
+        return None
+    return await db.ai_conversations.find_one({"_id": ObjectId(conversation_id), "user_id": user_id})
+
+
+async def append_turns(db, conversation_id: ObjectId, messages: list[ChatMessage]) -> Optional[dict]:
+    """Append turns atomically and return the updated conversation"""
+    return await db.ai_conversations.find_one_and_update(
+        {"_id": conversation_id},
+        {
+            "$push": {"turns": {"$each": [_turn(message) for message in messages]}},
+            "$inc": {"turn_count": len(messages)},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def needs_compaction(conversation: dict) -> bool:
+    used = sum(estimate_tokens(turn["content"]) for turn in conversation.get("turns", []))
+    return used > settings.chat_history_token_budget
+
+
+async def compact_conversation(db, conversation_id: ObjectId, summarize: Summarizer) -> bool:
+    """
+    Fold the oldest turns into the running summary once over budget.
+
+    Half the budget is kept as raw recent turns so compaction does not run on
+    every message. The write is conditional on turn_count, so a turn appended
+    meanwhile makes this a no-op and the next turn compacts instead.
+    Returns whether the conversation was compacted.
+    """
+    conversation = await db.ai_conversations.find_one({"_id": conversation_id})
+    if conversation is None or not needs_compaction(conversation):
+        return False
+
+    messages = conversation_messages(conversation)
+    keep = len(recent_turns_within(messages, settings.chat_history_token_budget // 2))
+    older = messages[:len(messages) - keep]
+    if not older:
+        return False
+
+    try:
+        summary = await summarize(conversation.get("summary"), older)
+    except Exception:
+        logger.exception("Conversation summarization failed for %s", conversation_id)
+        return False
+
+    result = await db.ai_conversations.update_one(
+        {"_id": conversation_id, "turn_count": conversation["turn_count"]},
+        {"$set": {
+            "summary": truncate_to_tokens(summary.strip(), settings.chat_summary_max_tokens),
+            "turns": conversation["turns"][len(older):],
+            "summarized_turns": conversation.get("summarized_turns", 0) + len(older),
+            "updated_at": datetime.utcnow(),
+        }},
+    )
+    return result.modified_count == 1
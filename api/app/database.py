@@ -1,33 +1,160 @@
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
+import threading
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
 from app.config import settings
+from app.metrics import registry
 
 logger = logging.getLogger(__name__)
 
 
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    CMAP listener tracking connection pool usage across all servers.
+
+    Events are delivered on driver threads, so counters are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pool_exhausted = 0
+        self.pool_cleared = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def _record_wait(self, duration: float) -> None:
+        wait_ms = duration * 1000
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event.duration)
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.pool_exhausted += 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            logger.warning("MongoDB connection pool exhausted for %s", event.address)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "max_pool_size": settings.mongodb_max_pool_size,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_exhausted": self.pool_exhausted,
+                "pool_cleared": self.pool_cleared,
+                "avg_wait_ms": round(self.total_wait_ms / attempts, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
 class Database:
     client: AsyncIOMotorClient = None
+    database: AsyncIOMotorDatabase = None
 
 
 db = Database()
+pool_metrics = PoolMetricsListener()
+registry.register("mongodb_pool", pool_metrics.stats)
 
 
 async def get_database():
-    # Ensure client is initialized
-    if db.client is None:
-        await connect_to_mongo()
-    return db.client[settings.database_name]
+    """Return the application database; the client is owned by the app lifespan"""
+    if db.database is None:
+        raise RuntimeError("MongoDB client is not connected; call connect_to_mongo() first")
+    return db.database
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Stored dates are naive UTC; convert timezone-aware values to match"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def client_options() -> dict:
+    """Motor client keyword arguments derived from Settings"""
+    options = {
+        "minPoolSize": settings.mongodb_min_pool_size,
+        "maxPoolSize": settings.mongodb_max_pool_size,
+        "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+        "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+        "socketTimeoutMS": settings.mongodb_socket_timeout_ms,
+        "retryReads": settings.mongodb_retry_reads,
+        "retryWrites": settings.mongodb_retry_writes,
+        "event_listeners": [pool_metrics],
+    }
+    if settings.mongodb_compressors:
+        options["compressors"] = settings.mongodb_compressors
+    return options
 
 
 async def connect_to_mongo():
     """Connect to MongoDB on startup"""
     if db.client is None:
-        db.client = AsyncIOMotorClient(settings.mongodb_uri)
-        logger.info("Connected to MongoDB at %s", settings.mongodb_uri)
+        db.client = AsyncIOMotorClient(settings.mongodb_uri, **client_options())
+        db.database = db.client[settings.database_name]
+        logger.info(
+            "Connected to MongoDB (pool %d-%d)",
+            settings.mongodb_min_pool_size,
+            settings.mongodb_max_pool_size,
+        )
 
 
 async def close_mongo_connection():
     """Close MongoDB connection on shutdown"""
     if db.client is not None:
         db.client.close()
+        db.client = None
+        db.database = None
         logger.info("Closed MongoDB connection")
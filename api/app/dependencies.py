@@ -1,21 +1,79 @@
+import time
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.auth import decode_access_token
+from app.auth import decode_access_token_claims
+from app.cache import TTLCache
+from app.config import settings
 from app.database import get_database
+from app.metrics import registry
 from bson import ObjectId
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+class PrincipalCache:
+    """
+    Caches the user document resolved for a bearer token.
+
+    Entries are keyed by the raw token and remember the user id they belong
+    to, so every token of a user can be dropped when that user changes.
+    An entry never outlives the ``exp`` claim of its token, which lets cache
+    hits skip signature verification safely.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        _, user = entry
+        return dict(user)
+
+    def put(self, token: str, user: dict, expires_at: Optional[float] = None) -> None:
+        ttl = None
+        if expires_at is not None:
+            ttl = expires_at - time.time()
+        self._entries.set(token, (str(user["_id"]), dict(user)), ttl=ttl)
+
+    def invalidate_token(self, token: str) -> None:
+        self._entries.pop(token)
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached token of a user; call whenever the user document changes"""
+        return self._entries.discard_where(lambda _, entry: entry[0] == str(user_id))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.principal_cache_max_entries,
+    ttl=settings.principal_cache_ttl_seconds,
+)
+registry.register("principal_cache", principal_cache.stats)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get the current authenticated user from JWT token"""
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    user_id = decode_access_token(token)
+    claims = decode_access_token_claims(token)
+    user_id = claims.get("sub") if claims else None
     if user_id is None:
         raise credentials_exception
 
@@ -25,5 +83,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if user is None:
         raise credentials_exception
 
-    return user
+    principal_cache.put(token, user, expires_at=claims.get("exp"))
 
+    return user
@@ -0,0 +1,135 @@
+"""
+Backend copy of the exercise catalog
+
+Ported from ``src/data/exerciseLibrary.js`` (names, categories, muscle
+groups, equipment and difficulty match the frontend library; the note is
+the execution cue from its description). Keep the two in sync when
+exercises are added.
+"""
+from typing import NamedTuple
+
+DIFFICULTY_ORDER = ("beginner", "intermediate", "advanced")
+
+# Body regions the muscle groups in the library belong to
+MUSCLE_REGIONS = {
+    "chest": "upper", "upper chest": "upper", "triceps": "upper", "shoulders": "upper",
+    "back": "upper", "lats": "upper", "biceps": "upper", "forearms": "upper",
+    "side delts": "upper", "front delts": "upper", "rear delts": "upper", "upper back": "upper",
+    "quads": "lower", "glutes": "lower", "hamstrings": "lower", "legs": "lower", "calves": "lower",
+    "power": "lower",
+    "core": "core", "abs": "core", "obliques": "core",
+    "full body": "full_body",
+    "cardio": "cardio",
+}
+
+
+class Exercise(NamedTuple):
+    name: str
+    category: str  # "strength" or "cardio", as in the library
+    muscle_groups: tuple[str, ...]
+    equipment: str
+    difficulty: str
+    note: str
+
+    @property
+    def primary_region(self) -> str:
+        """Region of the first-listed (main) muscle group"""
+        return MUSCLE_REGIONS[self.muscle_groups[0]]
+
+    @property
+    def level(self) -> int:
+        return DIFFICULTY_ORDER.index(self.difficulty)
+
+
+EXERCISES: tuple[Exercise, ...] = (
+    Exercise("Bench Press", "strength", ("chest", "triceps", "shoulders"), "barbell", "intermediate",
+             "Unrack, lower to lower chest with forearms vertical, press up while driving feet and keeping wrists stacked"),
+    Exercise("Incline Bench Press", "strength", ("upper chest", "triceps", "shoulders"), "barbell", "intermediate",
+             "Lower to upper chest/neckline with controlled touch, press back up and slightly back"),
+    Exercise("Dumbbell Flyes", "strength", ("chest",), "dumbbells", "beginner",
+             "Open arms in a wide arc until chest stretches (elbows stay bent), squeeze pecs to bring bells together above chest"),
+    Exercise("Push-ups", "strength", ("chest", "triceps", "shoulders"), "bodyweight", "beginner",
+             "Lower chest between hands keeping elbows ~45° from body, push the floor away to full lockout"),
+    Exercise("Cable Chest Fly", "strength", ("chest",), "cable", "beginner",
+             "Sweep handles in a hugging arc until hands meet at sternum height"),
+    Exercise("Deadlift", "strength", ("back", "legs", "core"), "barbell", "advanced",
+             "Push floor away, bar drags up legs, stand tall with hips and knees locking together"),
+    Exercise("Pull-ups", "strength", ("back", "biceps"), "bodyweight", "intermediate",
+             "Pull chest toward bar, drive elbows to ribs, pause near top"),
+    Exercise("Bent Over Row", "strength", ("back", "biceps"), "barbell", "intermediate",
+             "Row toward lower chest/upper abs, squeeze shoulder blades"),
+    Exercise("Lat Pulldown", "strength", ("lats", "biceps"), "cable", "beginner",
+             "Pull bar to upper chest by driving elbows down and back"),
+    Exercise("Seated Cable Row", "strength", ("back", "biceps"), "cable", "beginner",
+             "Pull handle to lower ribs while squeezing shoulder blades"),
+    Exercise("Squat", "strength", ("quads", "glutes", "hamstrings"), "barbell", "intermediate",
+             "Sit between hips and knees, keep knees tracking over toes, descend to parallel or below as mobility allows"),
+    Exercise("Front Squat", "strength", ("quads", "core"), "barbell", "advanced",
+             "Keep torso upright, sit down between heels, maintain knee tracking"),
+    Exercise("Leg Press", "strength", ("quads", "glutes"), "machine", "beginner",
+             "Lower sled until thighs near 90°, keep heels down, press to near lockout without hyperextending"),
+    Exercise("Romanian Deadlift", "strength", ("hamstrings", "glutes", "back"), "barbell", "intermediate",
+             "Keep bar close to legs, lower until hamstrings stretch while spine stays neutral"),
+    Exercise("Leg Curl", "strength", ("hamstrings",), "machine", "beginner",
+             "Curl pad toward glutes without lifting hips"),
+    Exercise("Leg Extension", "strength", ("quads",), "machine", "beginner",
+             "Extend knees to near lockout without snapping"),
+    Exercise("Lunges", "strength", ("quads", "glutes"), "dumbbells", "beginner",
+             "Step forward, lower until both knees ~90° with front knee over midfoot"),
+    Exercise("Bulgarian Split Squat", "strength", ("quads", "glutes"), "dumbbells", "intermediate",
+             "Drop straight down, keep torso slightly forward, drive through front heel to stand"),
+    Exercise("Overhead Press", "strength", ("shoulders", "triceps"), "barbell", "intermediate",
+             "Press bar overhead while moving head slightly back then through"),
+    Exercise("Dumbbell Shoulder Press", "strength", ("shoulders", "triceps"), "dumbbells", "beginner",
+             "Press to full elbow extension without shrugging"),
+    Exercise("Lateral Raises", "strength", ("side delts",), "dumbbells", "beginner",
+             "Raise arms to ~shoulder height with thumbs slightly down or neutral"),
+    Exercise("Front Raises", "strength", ("front delts",), "dumbbells", "beginner",
+             "Lift one or both bells to shoulder height, control down"),
+    Exercise("Face Pulls", "strength", ("rear delts", "upper back"), "cable", "beginner",
+             "Pull rope toward the face with elbows high, externally rotating so thumbs point behind you"),
+    Exercise("Barbell Curl", "strength", ("biceps",), "barbell", "beginner",
+             "Curl by flexing elbows while keeping upper arms pinned"),
+    Exercise("Dumbbell Curl", "strength", ("biceps",), "dumbbells", "beginner",
+             "Curl alternately or together"),
+    Exercise("Hammer Curl", "strength", ("biceps", "forearms"), "dumbbells", "beginner",
+             "Curl while keeping elbows tight and forearms neutral"),
+    Exercise("Tricep Dips", "strength", ("triceps",), "bodyweight", "intermediate",
+             "Lower by bending elbows to ~90° while keeping torso upright"),
+    Exercise("Tricep Pushdown", "strength", ("triceps",), "cable", "beginner",
+             "Pin elbows to sides, extend elbows until arms straight"),
+    Exercise("Skull Crushers", "strength", ("triceps",), "barbell", "intermediate",
+             "Hinge at elbows to lower bar near forehead/behind head"),
+    Exercise("Plank", "strength", ("core",), "bodyweight", "beginner",
+             "Squeeze glutes and abs, keep ribs down and chin tucked"),
+    Exercise("Sit-ups", "strength", ("abs",), "bodyweight", "beginner",
+             "Curl torso up by initiating with abs (not neck/hip flexors), then lower under control"),
+    Exercise("Russian Twists", "strength", ("obliques", "abs"), "bodyweight", "beginner",
+             "Rotate torso to tap floor/med ball side-to-side"),
+    Exercise("Hanging Leg Raises", "strength", ("abs",), "bodyweight", "advanced",
+             "Posteriorly tilt pelvis then raise straight legs to ~90° without swinging"),
+    Exercise("Cable Crunches", "strength", ("abs",), "cable", "beginner",
+             "Crunch by flexing spine (bring ribs to pelvis) while keeping hips stable"),
+    Exercise("Running", "cardio", ("legs", "cardio"), "none", "beginner",
+             "Maintain tall posture, slight forward lean from ankles, midfoot strike, relaxed arms"),
+    Exercise("Cycling", "cardio", ("legs", "cardio"), "bike", "beginner",
+             "Smooth cadence 80–100 rpm (indoors), push-pull pedal stroke, maintain steady breathing"),
+    Exercise("Rowing", "cardio", ("back", "legs", "cardio"), "rowing machine", "intermediate",
+             "Legs → body → arms on the drive"),
+    Exercise("Jump Rope", "cardio", ("calves", "cardio"), "jump rope", "beginner",
+             "Small, quick jumps on balls of feet"),
+    Exercise("Burpees", "cardio", ("full body", "cardio"), "bodyweight", "intermediate",
+             "Squat down → hands to floor → jump feet back → chest to floor → push up → jump feet forward → jump and clap overhead"),
+    Exercise("Mountain Climbers", "cardio", ("core", "cardio"), "bodyweight", "beginner",
+             "Drive knees toward chest alternately while keeping hips level"),
+    Exercise("Clean and Jerk", "strength", ("full body",), "barbell", "advanced",
+             "First pull (from floor), second pull (hip extension/shrug), receive in front rack → dip & drive → jerk (split/power)"),
+    Exercise("Snatch", "strength", ("full body",), "barbell", "advanced",
+             "Pull from floor to knees → scoop/second pull to extension → pull under → catch overhead in squat → stand"),
+    Exercise("Power Clean", "strength", ("back", "legs", "shoulders"), "barbell", "advanced",
+             "Smooth first pull, explosive second pull, receive bar on shoulders above parallel (power)"),
+    Exercise("Box Jumps", "strength", ("legs", "power"), "box", "intermediate",
+             "Load with quarter squat, swing arms, jump and land softly with knees tracking"),
+    Exercise("Kettlebell Swings", "strength", ("glutes", "hamstrings", "core"), "kettlebell", "intermediate",
+             "Hard-style hip hinge (not a squat)"),
+)
@@ -0,0 +1,363 @@
+"""
+Per-user retrieval over workout, meal and measurement history
+
+The coach context only summarizes the user, so questions about their own
+records ("how has my bench progressed?") need the matching entries. Each
+record is rendered as one short line and indexed with BM25; a chat turn
+pulls in the best-scoring lines that fit a token budget.
+
+Indexes live in process memory. A user's index is built from MongoDB the
+first time they chat and tagged with the user's data version (see
+app.user_versions). Write handlers bump the version and pass the new one
+to ``history_index.add`` / ``history_index.remove``, which update a loaded
+index in place only if it was current just before that write. Any other
+gap, such as a write handled by another worker, leaves the index behind
+the stored version, and the next search rebuilds it.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from app.cache import TTLCache
+from app.config import settings
+from app.conversations import estimate_tokens
+from app.database import naive_utc
+from app.metrics import LATENCY_BUCKETS_MS, Histogram, registry
+from app.user_versions import read_user_version
+
+logger = logging.getLogger(__name__)
+
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be been did do does for from had has have how i in is it "
+    "me my of on or so than that the this to was were what when where which with "
+    "you your".split()
+)
+TOKEN_PATTERN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+# kind -> (collection, date field, projection)
+SOURCES = {
+    "workout": ("workouts", "workout_date", {
+        "workout_name": 1, "exercises": 1, "duration_minutes": 1, "notes": 1, "workout_date": 1,
+    }),
+    "meal": ("meals", "meal_date", {
+        "meal_type": 1, "foods.food_name": 1, "total_calories": 1, "total_protein_g": 1,
+        "notes": 1, "meal_date": 1,
+    }),
+    "measurement": ("measurements", "measurement_date", {
+        "weight_kg": 1, "body_fat_pct": 1, "notes": 1, "measurement_date": 1,
+    }),
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words and numbers without stopwords; a plural "s" is dropped"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _number(value) -> str:
+    return f"{value:g}" if isinstance(value, (int, float)) else str(value)
+
+
+def _describe_exercise(exercise: dict) -> str:
+    parts = [exercise.get("exercise_name", "")]
+    if exercise.get("sets") and exercise.get("reps"):
+        parts.append(f"{exercise['sets']}x{exercise['reps']}")
+    elif exercise.get("sets"):
+        parts.append(f"{exercise['sets']} sets")
+    if exercise.get("weight_kg"):
+        parts.append(f"@ {_number(exercise['weight_kg'])} kg")
+    if exercise.get("duration_minutes"):
+        parts.append(f"{exercise['duration_minutes']} min")
+    if exercise.get("distance_km"):
+        parts.append(f"{_number(exercise['distance_km'])} km")
+    return " ".join(parts)
+
+
+def render_record(kind: str, document: dict) -> str:
+    """One line per record, as it is shown to the model"""
+    date = record_date(kind, document)
+    day = date.strftime("%Y-%m-%d") if date else "undated"
+
+    if kind == "workout":
+        exercises = "; ".join(_describe_exercise(e) for e in document.get("exercises") or [])
+        line = f"{day} workout {document.get('workout_name', '')}: {exercises}"
+        if document.get("duration_minutes"):
+            line += f" ({document['duration_minutes']} min)"
+    elif kind == "meal":
+        foods = ", ".join(food.get("food_name", "") for food in document.get("foods") or [])
+        line = f"{day} meal {document.get('meal_type', '')}: {foods}"
+        if document.get("total_calories") is not None:
+            line += f" ({_number(round(document['total_calories']))} kcal"
+            if document.get("total_protein_g"):
+                line += f", {_number(round(document['total_protein_g']))} g protein"
+            line += ")"
+    else:
+        line = f"{day} measurement: weight {_number(document.get('weight_kg'))} kg"
+        if document.get("body_fat_pct") is not None:
+            line += f", body fat {_number(document['body_fat_pct'])}%"
+
+    if document.get("notes"):
+        line += f". {document['notes']}"
+    return line
+
+
+def record_date(kind: str, document: dict) -> Optional[datetime]:
+    """The record's date as stored (naive UTC), whether it came from Mongo or a request body"""
+    date = document.get(SOURCES[kind][1]) or document.get("created_at")
+    return naive_utc(date) if isinstance(date, datetime) else None
+
+
+class SearchHit(NamedTuple):
+    line: str
+    date: Optional[datetime]
+    score: float
+
+
+class UserIndex:
+    """
+    BM25 index over one user's records.
+
+    Records occupy slots; removing one frees its slot for the next add, so
+    the per-slot arrays only grow with the largest number of live records.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version  # user data version the records reflect
+        self._slots: dict[str, int] = {}  # record key -> slot
+        self._free: list[int] = []
+        self._lines: list[Optional[str]] = []
+        self._dates: list[Optional[datetime]] = []
+        self._terms: list[Counter] = []
+        self._lengths: list[int] = []
+        self._postings: dict[str, dict[int, int]] = {}  # term -> slot -> frequency
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, key: str, line: str, date: Optional[datetime]) -> None:
+        """Index a record, replacing any earlier version with the same key"""
+        self.remove(key)
+        terms = Counter(tokenize(line))
+        if self._free:
+            slot = self._free.pop()
+            self._lines[slot], self._dates[slot] = line, date
+            self._terms[slot], self._lengths[slot] = terms, sum(terms.values())
+        else:
+            slot = len(self._lines)
+            self._lines.append(line)
+            self._dates.append(date)
+            self._terms.append(terms)
+            self._lengths.append(sum(terms.values()))
+        self._slots[key] = slot
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[slot] = frequency
+
+    def remove(self, key: str) -> bool:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        for term in self._terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+        self._lines[slot], self._dates[slot] = None, None
+        self._terms[slot], self._lengths[slot] = Counter(), 0
+        self._free.append(slot)
+        return True
+
+    def trim(self, kind: str, limit: int) -> int:
+        """Drop the oldest records of kind beyond limit, as a build would; returns how many"""
+        prefix = f"{kind}:"
+        keys = [key for key in self._slots if key.startswith(prefix)]
+        if len(keys) <= limit:
+            return 0
+        keys.sort(key=lambda key: (self._dates[self._slots[key]] or datetime.min, key))
+        for key in keys[:len(keys) - limit]:
+            self.remove(key)
+        return len(keys) - limit
+
+    def search(self, query: str, k: int) -> list[SearchHit]:
+        """The k best-scoring records for query, best first"""
+        live = len(self._slots)
+        if not live or k <= 0:
+            return []
+
+        lengths = np.asarray(self._lengths, dtype=np.float64)
+        average_length = lengths.sum() / live
+        scores = np.zeros(len(lengths))
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            slots = np.fromiter(postings.keys(), dtype=np.intp, count=len(postings))
+            frequencies = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            idf = np.log1p((live - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = K1 * (1 - B + B * lengths[slots] / average_length)
+            scores[slots] += idf * frequencies * (K1 + 1) / (frequencies + norm)
+
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        ranked = matches[np.argsort(-scores[matches], kind="stable")]
+        return [SearchHit(self._lines[slot], self._dates[slot], float(scores[slot])) for slot in ranked]
+
+
+def record_key(kind: str, record_id) -> str:
+    return f"{kind}:{record_id}"
+
+
+class HistoryIndex:
+    """Loaded per-user indexes, built on first use and updated on write"""
+
+    def __init__(self, max_users: int, ttl: float, max_records: int):
+        self.max_records = max_records
+        self._users = TTLCache(maxsize=max_users, ttl=ttl)
+        self._builds: dict[tuple[str, int], asyncio.Future] = {}
+        self.builds = 0
+        self.stale = 0
+        self.updates = 0
+        self.build_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.search_ms = Histogram(LATENCY_BUCKETS_MS)
+
+    async def _build(self, db, user_id: str, version: int) -> UserIndex:
+        started = time.perf_counter()
+
+        async def read(kind: str) -> list[dict]:
+            collection, date_field, projection = SOURCES[kind]
+            return await getattr(db, collection).find({"user_id": user_id}, projection) \
+                .sort([(date_field, -1), ("_id", -1)]) \
+                .limit(self.max_records).to_list(self.max_records)
+
+        kinds = list(SOURCES)
+        # Tagged with the version read before the reads: a write that lands
+        # mid-build leaves the index behind and it is rebuilt next time
+        index = UserIndex(version)
+        for kind, documents in zip(kinds, await asyncio.gather(*(read(kind) for kind in kinds))):
+            for document in documents:
+                index.add(record_key(kind, document["_id"]), render_record(kind, document), record_date(kind, document))
+
+        self._users.set(user_id, index)
+        self.builds += 1
+        self.build_ms.observe((time.perf_counter() - started) * 1000)
+        return index
+
+    async def get(self, db, user_id: str) -> UserIndex:
+        """The user's index, built from the database if it is not loaded or is behind"""
+        version = await read_user_version(db, user_id)
+        index = self._users.get(user_id)
+        if index is not None:
+            if index.version == version:
+                return index
+            self.stale += 1
+
+        key = (user_id, version)
+        build = self._builds.get(key)
+        if build is None:
+            build = asyncio.ensure_future(self._build(db, user_id, version))
+            self._builds[key] = build
+            build.add_done_callback(lambda _: self._builds.pop(key, None))
+        return await asyncio.shield(build)
+
+    def _current(self, user_id: str, version: int) -> Optional[UserIndex]:
+        """
+        The loaded index if it reflects every write before the one that
+        produced version; a write from a batch already applied (same
+        version) also counts. A loaded index with a gap is dropped.
+        """
+        index = self._users.get(user_id)
+        if index is None:
+            return None
+        if index.version not in (version - 1, version):
+            self._users.pop(user_id)
+            return None
+        index.version = version
+        return index
+
+    def add(self, user_id: str, kind: str, record_id, document: dict, version: int) -> None:
+        """Index a new or updated record; call with the version bump_user_version returned"""
+        index = self._current(user_id, version)
+        if index is None:
+            return
+        index.add(record_key(kind, record_id), render_record(kind, document), record_date(kind, document))
+        index.trim(kind, self.max_records)
+        self.updates += 1
+
+    def remove(self, user_id: str, kind: str, record_id, version: int) -> None:
+        index = self._current(user_id, version)
+        if index is None:
+            return
+        if index.remove(record_key(kind, record_id)):
+            self.updates += 1
+
+    async def search(self, db, user_id: str, query: str, k: int) -> list[SearchHit]:
+        index = await self.get(db, user_id)
+        started = time.perf_counter()
+        hits = index.search(query, k)
+        self.search_ms.observe((time.perf_counter() - started) * 1000)
+        return hits
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def stats(self) -> dict:
+        return {
+            "users": self._users.stats(),
+            "builds": self.builds,
+            "stale": self.stale,
+            "incremental_updates": self.updates,
+            "build_ms": self.build_ms.stats(),
+            "search_ms": self.search_ms.stats(),
+        }
+
+
+history_index = HistoryIndex(
+    max_users=settings.history_index_max_users,
+    ttl=settings.history_index_ttl_seconds,
+    max_records=settings.history_index_max_records,
+)
+registry.register("history_index", history_index.stats)
+
+
+def fit_to_budget(hits: list[SearchHit], token_budget: int) -> list[SearchHit]:
+    """Best hits first until the budget is spent, returned oldest first"""
+    chosen = []
+    remaining = token_budget
+    for hit in hits:
+        cost = estimate_tokens(hit.line)
+        if cost <= remaining:
+            chosen.append(hit)
+            remaining -= cost
+    return sorted(chosen, key=lambda hit: hit.date or datetime.min)
+
+
+async def relevant_history(db, user_id: str, message: str) -> str:
+    """
+    The user's records most relevant to message, one per line, within the
+    configured token budget; empty when nothing matches. Retrieval problems
+    are logged and never fail the chat.
+    """
+    try:
+        hits = await history_index.search(db, user_id, message, settings.chat_retrieval_top_k)
+        chosen = fit_to_budget(hits, settings.chat_retrieval_token_budget)
+    except Exception:
+        logger.exception("History retrieval failed")
+        return ""
+    return "\n".join(hit.line for hit in chosen)
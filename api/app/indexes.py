@@ -0,0 +1,251 @@
+"""
+Declarative MongoDB index registry
+
+Indexes are applied idempotently at startup (see ``app.main``) or from the
+command line:
+
+    python -m app.indexes            # create missing indexes
+    python -m app.indexes --check    # also fail if any router query COLLSCANs
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.pagination import encode_cursor, keyset_filter
+
+logger = logging.getLogger(__name__)
+
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "workouts": [
+        IndexModel(
+            [("user_id", ASCENDING), ("workout_date", DESCENDING), ("_id", DESCENDING)],
+            name="user_workout_date_id",
+        ),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "meals": [
+        IndexModel(
+            [("user_id", ASCENDING), ("meal_date", DESCENDING), ("_id", DESCENDING)],
+            name="user_meal_date_id",
+        ),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    "nutrition_daily": [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], name="user_day_unique", unique=True),
+    ],
+    "measurements": [
+        IndexModel(
+            [("user_id", ASCENDING), ("measurement_date", DESCENDING), ("_id", DESCENDING)],
+            name="user_measurement_date_id",
+        ),
+    ],
+    # Workers claim the oldest queued job or the oldest expired lease;
+    # finished jobs are purged after a week
+    "ai_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "workout_plans": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+    # Conversations are looked up by _id; idle ones expire after 90 days
+    "ai_conversations": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=90 * 24 * 3600),
+    ],
+    # Plans are looked up by _id; MongoDB purges them once expires_at passes
+    "ai_plan_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+# Indexes superseded by the registry above; dropped by ensure_indexes()
+RETIRED_INDEXES: dict[str, list[str]] = {
+    "workouts": ["user_workout_date"],
+    "meals": ["user_meal_date"],
+    "measurements": ["user_measurement_date"],
+}
+
+
+class QueryShape(NamedTuple):
+    """A representative query issued by a router, used for plan checks"""
+    collection: str
+    filter: dict
+    sort: list[tuple[str, int]] = []
+
+
+# Placeholder values only matter for explain(); shapes mirror app/routers
+_USER = "000000000000000000000000"
+_SINCE = {"$gte": datetime(1970, 1, 1)}
+
+
+def _seek(date_field: str) -> dict:
+    """Keyset continuation filter, as built by app.pagination.keyset_filter"""
+    return keyset_filter({"user_id": _USER}, date_field, encode_cursor(datetime(2000, 1, 1), ObjectId()))
+
+
+ROUTER_QUERIES: list[QueryShape] = [
+    QueryShape("users", {"email": "user@example.com"}),
+    QueryShape("profiles", {"user_id": _USER}),
+    QueryShape("workouts", {"user_id": _USER}, [("workout_date", DESCENDING), ("_id", DESCENDING)]),
+    QueryShape("workouts", _seek("workout_date"), [("workout_date", DESCENDING), ("_id", DESCENDING)]),
+    QueryShape("workouts", {"user_id": _USER}, [("created_at", DESCENDING)]),
+    QueryShape("meals", {"user_id": _USER}, [("meal_date", DESCENDING), ("_id", DESCENDING)]),
+    QueryShape("meals", _seek("meal_date"), [("meal_date", DESCENDING), ("_id", DESCENDING)]),
+    QueryShape("meals", {"user_id": _USER, "meal_date": _SINCE}, [("meal_date", DESCENDING)]),
+    QueryShape("meals", {"user_id": _USER}, [("created_at", DESCENDING)]),
+    QueryShape("nutrition_daily", {"user_id": _USER, "day": _SINCE}),
+    QueryShape("nutrition_daily", {"user_id": _USER, "day": _SINCE}, [("day", ASCENDING)]),
+    QueryShape("measurements", {"user_id": _USER}, [("measurement_date", DESCENDING)]),
+    QueryShape("measurements", {"user_id": _USER}, [("measurement_date", DESCENDING), ("_id", DESCENDING)]),
+    QueryShape("measurements", _seek("measurement_date"), [("measurement_date", DESCENDING), ("_id", DESCENDING)]),
+    # app/routers/export.py walks history oldest first
+    QueryShape("workouts", {"user_id": _USER}, [("workout_date", ASCENDING), ("_id", ASCENDING)]),
+    QueryShape("meals", {"user_id": _USER}, [("meal_date", ASCENDING), ("_id", ASCENDING)]),
+    QueryShape("measurements", {"user_id": _USER}, [("measurement_date", ASCENDING), ("_id", ASCENDING)]),
+    # app/plan_jobs.py claims and app/routers/ai_coach.py plan listing
+    QueryShape("ai_jobs", {"status": "queued", "not_before": {"$not": {"$gt": datetime(2000, 1, 1)}}}, [("created_at", ASCENDING)]),
+    QueryShape("ai_jobs", {"status": "running", "lease_expires_at": {"$lt": datetime(2000, 1, 1)}, "attempts": {"$lt": 3}}, [("lease_expires_at", ASCENDING)]),
+    QueryShape("workout_plans", {"user_id": _USER}, [("created_at", DESCENDING)]),
+]
+
+
+def _index_keys(model: IndexModel) -> list[tuple[str, Any]]:
+    return list(model.document["key"].items())
+
+
+def _is_operator(value: Any) -> bool:
+    return isinstance(value, dict) and any(k.startswith("$") for k in value)
+
+
+def index_supports(keys: list[tuple[str, Any]], shape: QueryShape) -> bool:
+    """
+    Check whether an index key pattern can serve a query shape without a
+    collection scan or in-memory sort: equality fields must form the key
+    prefix, followed by the sort (or range) fields in order.
+    """
+    # Top-level $or/$and only narrow the range bounds set by the other fields
+    fields = {field: value for field, value in shape.filter.items() if not field.startswith("$")}
+    equality = {field for field, value in fields.items() if not _is_operator(value)}
+    ranges = [field for field, value in fields.items() if _is_operator(value)]
+    ordered = list(shape.sort) or [(field, ASCENDING) for field in ranges]
+
+    if len(keys) < len(equality) + len(ordered):
+        return False
+    if {field for field, _ in keys[:len(equality)]} != equality:
+        return False
+
+    tail = keys[len(equality):len(equality) + len(ordered)]
+    if [field for field, _ in tail] != [field for field, _ in ordered]:
+        return False
+    if not shape.sort:
+        return True
+
+    # A compound index can be walked forwards or backwards, not mixed
+    same = all(key_dir == sort_dir for (_, key_dir), (_, sort_dir) in zip(tail, ordered))
+    flipped = all(key_dir == -sort_dir for (_, key_dir), (_, sort_dir) in zip(tail, ordered))
+    return same or flipped
+
+
+def uncovered_queries(
+    indexes: dict[str, list[IndexModel]] = INDEXES,
+    queries: list[QueryShape] = ROUTER_QUERIES,
+) -> list[QueryShape]:
+    """Return the router query shapes that no registered index supports"""
+    return [
+        shape for shape in queries
+        if not any(index_supports(_index_keys(model), shape) for model in indexes.get(shape.collection, []))
+    ]
+
+
+def plan_has_collscan(plan: Any) -> bool:
+    """Recursively look for a COLLSCAN stage in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(plan_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(plan_has_collscan(item) for item in plan)
+    return False
+
+
+async def ensure_indexes(database) -> dict[str, list[str]]:
+    """Create every registered index; existing identical indexes are a no-op"""
+    created: dict[str, list[str]] = {}
+    for collection, models in INDEXES.items():
+        try:
+            created[collection] = await database[collection].create_indexes(models)
+        except OperationFailure:
+            logger.exception("Failed to create indexes on %s", collection)
+
+    for collection, names in RETIRED_INDEXES.items():
+        try:
+            existing = await database[collection].index_information()
+            for name in names:
+                if name in existing:
+                    await database[collection].drop_index(name)
+                    logger.info("Dropped retired index %s.%s", collection, name)
+        except OperationFailure:
+            logger.exception("Failed to drop retired indexes on %s", collection)
+    logger.info("Ensured indexes on %d collections", len(created))
+    return created
+
+
+async def verify_query_plans(database) -> list[str]:
+    """Explain every router query shape and report the ones that COLLSCAN"""
+    failures = []
+    for shape in ROUTER_QUERIES:
+        cursor = database[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        explain = await cursor.limit(1).explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if plan_has_collscan(winning_plan):
+            failures.append(f"{shape.collection}: filter={shape.filter} sort={shape.sort}")
+    return failures
+
+
+async def _main(check: bool) -> int:
+    from app.database import close_mongo_connection, connect_to_mongo, get_database
+
+    await connect_to_mongo()
+    try:
+        database = await get_database()
+        await ensure_indexes(database)
+        if not check:
+            return 0
+
+        uncovered = uncovered_queries()
+        for shape in uncovered:
+            print(f"UNINDEXED: {shape.collection}: filter={shape.filter} sort={shape.sort}")
+
+        failures = await verify_query_plans(database)
+        for failure in failures:
+            print(f"COLLSCAN: {failure}")
+        return 1 if uncovered or failures else 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and verify BroncoFit MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="fail if any router query falls back to COLLSCAN")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(args.check)))
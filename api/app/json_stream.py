@@ -0,0 +1,119 @@
+"""
+Incremental parsing of a streamed JSON object
+
+Model output arrives in arbitrary chunks. ``JSONItemStream`` scans the text
+as it comes in and hands back each element of one top-level array (e.g. a
+workout's ``exercises``) as soon as that element's closing brace arrives,
+so callers can act on it before the rest of the response is generated.
+The whole object is decoded once the stream ends.
+"""
+import json
+from typing import Optional
+
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed text is not a single complete JSON object"""
+
+
+class _Container:
+    __slots__ = ("kind", "start", "key", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind  # "{" or "["
+        self.start = start
+        self.key: Optional[str] = None  # object key whose value is being read
+        self.expect_key = kind == "{"
+
+
+class JSONItemStream:
+    """
+    Scans a JSON object chunk by chunk, yielding the elements of
+    ``root[array_key]`` as they complete.
+
+    Anything before the opening brace is ignored. Only the scanner state is
+    kept between chunks, so each character is looked at once.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[_Container] = []
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume a chunk; returns the array elements it completed"""
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._root_end is not None:
+                if not char.isspace():
+                    raise JSONStreamError("Unexpected text after the JSON object")
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    top = self._stack[-1]
+                    if top.kind == "{" and top.expect_key:
+                        top.key = json.loads(buffer[self._string_start:index + 1])
+                continue
+
+            if self._root_start is None:
+                if char == "{":
+                    self._root_start = index
+                    self._stack.append(_Container("{", index))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._stack.append(_Container(char, index))
+            elif char in "}]":
+                container = self._stack.pop()
+                if (char == "}") != (container.kind == "{"):
+                    raise JSONStreamError("Mismatched brackets in streamed JSON")
+                if not self._stack:
+                    self._root_end = index + 1
+                elif self._is_array_item(container):
+                    completed.append(self._decode(buffer[container.start:index + 1]))
+            elif char == ":":
+                self._stack[-1].expect_key = False
+            elif char == "," and self._stack[-1].kind == "{":
+                self._stack[-1].expect_key = True
+
+        self._pos = len(buffer)
+        return completed
+
+    def _is_array_item(self, container: _Container) -> bool:
+        """Whether container was an object directly inside root[array_key]"""
+        return (
+            container.kind == "{"
+            and len(self._stack) == 2
+            and self._stack[1].kind == "["
+            and self._stack[0].key == self.array_key
+        )
+
+    @staticmethod
+    def _decode(text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as error:
+            raise JSONStreamError(str(error)) from error
+
+    def finish(self) -> dict:
+        """Decode the complete object; raises JSONStreamError if it never closed"""
+        if self._root_end is None:
+            raise JSONStreamError("Streamed JSON ended before the object was complete")
+        return self._decode(self._buffer[self._root_start:self._root_end])
@@ -0,0 +1,352 @@
+"""
+LLM provider backends for the AI coach
+
+``settings.llm_provider`` selects the backend:
+
+- ``gemini``: Google Gemini via google-generativeai (production)
+- ``stub``: offline, deterministic backend with configurable latency,
+  streaming cadence, error rate and canned responses, for load testing and
+  capacity planning without touching the real API
+
+Every call carries an endpoint label (``chat``, ``plan``, ``suggest``,
+``summary``) so backends and instrumentation can tell callers apart.
+Backends that know their token usage report it through a ``Usage``
+passed to ``generate_with_usage``/``stream_with_usage``, which also take
+the calling model tier's output token cap and, for structured output, a
+JSON Schema the response must follow.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.conversations import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """Raised when a backend fails to produce a completion"""
+
+
+class InvalidModelOutput(Exception):
+    """Raised when model output is empty, or schema-constrained output still fails to parse or validate"""
+
+
+@dataclass
+class Usage:
+    """Token counts for one call, as reported by the backend (None if unknown)"""
+
+    prompt_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+
+
+class LLMProvider(ABC):
+    """Interface implemented by every backend"""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str, endpoint: str) -> str:
+        """Return the full completion text"""
+
+    @abstractmethod
+    def stream(self, prompt: str, endpoint: str) -> AsyncIterator[str]:
+        """Yield completion text in chunks as the backend produces them"""
+
+    async def generate_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> str:
+        """generate(), filling usage when the backend reports it; output cap and schema where supported"""
+        return await self.generate(prompt, endpoint)
+
+    def stream_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """stream(), filling usage when the backend reports it; output cap and schema where supported"""
+        return self.stream(prompt, endpoint)
+
+
+# JSON Schema keywords Gemini's response_schema understands
+GEMINI_SCHEMA_KEYS = ("type", "format", "description", "nullable", "enum", "properties", "required", "items")
+
+
+def gemini_schema(schema: dict, definitions: Optional[dict] = None) -> dict:
+    """
+    Convert a pydantic JSON Schema to the OpenAPI subset Gemini accepts:
+    $refs inlined, Optional[X] as X with nullable, titles and defaults dropped
+    """
+    definitions = schema.get("$defs", {}) if definitions is None else definitions
+    if "$ref" in schema:
+        return gemini_schema(definitions[schema["$ref"].rsplit("/", 1)[-1]], definitions)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        converted = gemini_schema(options[0], definitions)
+        if len(options) < len(schema["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    converted = {key: schema[key] for key in GEMINI_SCHEMA_KEYS if key in schema}
+    if "properties" in converted:
+        converted["properties"] = {
+            name: gemini_schema(value, definitions) for name, value in converted["properties"].items()
+        }
+    if "items" in converted:
+        converted["items"] = gemini_schema(converted["items"], definitions)
+    return converted
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt: str, endpoint: str) -> str:
+        return await self.generate_with_usage(prompt, endpoint, Usage())
+
+    def stream(self, prompt: str, endpoint: str) -> AsyncIterator[str]:
+        return self.stream_with_usage(prompt, endpoint, Usage())
+
+    @staticmethod
+    def _read_usage(response, usage: Usage) -> None:
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return
+        usage.prompt_tokens = metadata.prompt_token_count or usage.prompt_tokens
+        usage.response_tokens = metadata.candidates_token_count or usage.response_tokens
+
+    @staticmethod
+    def _text(response) -> str:
+        # .text raises when the candidate has no parts, e.g. when thinking
+        # used up the whole output cap
+        try:
+            return response.text
+        except ValueError:
+            return ""
+
+    @staticmethod
+    def _finish_reason(response) -> str:
+        candidates = getattr(response, "candidates", None)
+        if not candidates:
+            return "no candidates"
+        return f"finish reason {getattr(candidates[0].finish_reason, 'name', candidates[0].finish_reason)}"
+
+    @staticmethod
+    def _generation_config(max_output_tokens: Optional[int], response_schema: Optional[dict]) -> Optional[dict]:
+        config = {}
+        if max_output_tokens:
+            config["max_output_tokens"] = max_output_tokens
+        if response_schema:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = gemini_schema(response_schema)
+        return config or None
+
+    async def generate_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> str:
+        response = await self._model.generate_content_async(
+            prompt, generation_config=self._generation_config(max_output_tokens, response_schema)
+        )
+        self._read_usage(response, usage)
+        text = self._text(response)
+        if not text.strip():
+            raise InvalidModelOutput(f"The model returned no text ({self._finish_reason(response)})")
+        return text
+
+    async def stream_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        response = await self._model.generate_content_async(
+            prompt, stream=True, generation_config=self._generation_config(max_output_tokens, response_schema)
+        )
+        produced = False
+        async for chunk in response:
+            # Every chunk carries usage so far; the last one has the totals
+            self._read_usage(chunk, usage)
+            text = self._text(chunk)
+            if text:
+                produced = True
+                yield text
+        if not produced:
+            raise InvalidModelOutput(f"The model returned no text ({self._finish_reason(response)})")
+
+
+STUB_WORKOUT = {
+    "workout_name": "Full Body Strength",
+    "description": "A balanced session hitting every major muscle group.",
+    "exercises": [
+        {"exercise_name": "Goblet Squat", "exercise_type": "strength", "sets": 3, "reps": 10,
+         "weight_kg": None, "notes": "Keep your chest up and knees tracking over toes"},
+        {"exercise_name": "Push-ups", "exercise_type": "strength", "sets": 3, "reps": 12,
+         "weight_kg": None, "notes": "Brace your core and lower under control"},
+        {"exercise_name": "Dumbbell Row", "exercise_type": "strength", "sets": 3, "reps": 10,
+         "weight_kg": None, "notes": "Pull the elbow toward your hip"},
+        {"exercise_name": "Romanian Deadlift", "exercise_type": "strength", "sets": 3, "reps": 10,
+         "weight_kg": None, "notes": "Hinge at the hips with a neutral spine"},
+        {"exercise_name": "Plank", "exercise_type": "strength", "sets": 3, "reps": None,
+         "weight_kg": None, "notes": "Hold 30-45 seconds"},
+    ],
+    "duration_minutes": 45,
+    "notes": "Rest 60-90 seconds between sets.",
+}
+
+STUB_RESPONSES = {
+    "chat": (
+        "Great question! Consistency matters more than intensity, so aim for three to four sessions "
+        "a week that you can sustain. Pair your training with enough protein, around 1.6 g per kg of "
+        "body weight, and prioritise sleep so your body can recover.\n\n"
+        "Track your workouts and meals for the next two weeks and we can adjust from there."
+    ),
+    "plan": (
+        "Day 1 - Upper Body: Bench Press 3x8, Bent-over Row 3x10, Overhead Press 3x10, Biceps Curl 3x12.\n"
+        "Day 2 - Lower Body: Back Squat 3x8, Romanian Deadlift 3x10, Walking Lunge 3x12, Calf Raise 3x15.\n"
+        "Day 3 - Conditioning: 20 minutes intervals, Plank 3x45s, Side Plank 3x30s.\n"
+        "Rest 60-90 seconds between sets and add weight once every set reaches the top of the rep range."
+    ),
+    "suggest": json.dumps(STUB_WORKOUT),
+    "summary": "The user is working on general fitness and asked for training and nutrition advice.",
+}
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline backend with a tunable latency profile.
+
+    Time to the first chunk is drawn from the configured distribution; the
+    remaining chunks follow at a fixed cadence. Responses are canned per
+    endpoint, so runs are reproducible when a seed is set.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        distribution: str = "lognormal",
+        spread: float = 0.5,
+        chunk_interval_ms: float = 50.0,
+        chunk_chars: int = 40,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        responses: Optional[dict[str, str]] = None,
+    ):
+        if distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.spread = spread
+        self.chunk_interval_ms = chunk_interval_ms
+        self.chunk_chars = max(1, chunk_chars)
+        self.error_rate = error_rate
+        self.responses = {**STUB_RESPONSES, **(responses or {})}
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def sample_latency(self) -> float:
+        """Seconds until the first chunk; latency_ms is the median"""
+        if self.distribution == "fixed":
+            ms = self.latency_ms
+        elif self.distribution == "uniform":
+            ms = self._random.uniform(self.latency_ms * (1 - self.spread), self.latency_ms * (1 + self.spread))
+        else:
+            ms = self._random.lognormvariate(math.log(max(self.latency_ms, 1e-3)), self.spread)
+        return max(ms, 0.0) / 1000
+
+    def response_for(self, prompt: str, endpoint: str) -> str:
+        return self.responses.get(endpoint, self.responses["chat"])
+
+    async def _start(self, prompt: str, endpoint: str, max_output_tokens: Optional[int]) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency())
+        if self.error_rate and self._random.random() < self.error_rate:
+            digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+            raise LLMError(f"Stub provider injected failure ({endpoint}, prompt {digest})")
+        text = self.response_for(prompt, endpoint)
+        if max_output_tokens:
+            text = truncate_to_tokens(text, max_output_tokens)
+        return text
+
+    async def generate(self, prompt: str, endpoint: str) -> str:
+        return await self.generate_with_usage(prompt, endpoint, Usage())
+
+    def stream(self, prompt: str, endpoint: str) -> AsyncIterator[str]:
+        return self.stream_with_usage(prompt, endpoint, Usage())
+
+    async def generate_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> str:
+        text = await self._start(prompt, endpoint, max_output_tokens)
+        remaining_chunks = max(0, math.ceil(len(text) / self.chunk_chars) - 1)
+        await asyncio.sleep(remaining_chunks * self.chunk_interval_ms / 1000)
+        usage.prompt_tokens, usage.response_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        return text
+
+    async def stream_with_usage(
+        self,
+        prompt: str,
+        endpoint: str,
+        usage: Usage,
+        max_output_tokens: Optional[int] = None,
+        response_schema: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        text = await self._start(prompt, endpoint, max_output_tokens)
+        usage.prompt_tokens, usage.response_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        for start in range(0, len(text), self.chunk_chars):
+            if start:
+                await asyncio.sleep(self.chunk_interval_ms / 1000)
+            yield text[start:start + self.chunk_chars]
+
+
+def create_provider(name: Optional[str] = None, model: Optional[str] = None) -> LLMProvider:
+    """Build the backend named by settings.llm_provider (or `name`) for settings.llm_model (or `model`)"""
+    name = (name or settings.llm_provider).lower()
+    if name == "gemini":
+        return GeminiProvider(api_key=settings.gemini_api_key, model_name=model or settings.llm_model)
+    if name == "stub":
+        logger.warning("Using the offline stub LLM provider; AI responses are canned")
+        return StubProvider(
+            latency_ms=settings.llm_stub_latency_ms,
+            distribution=settings.llm_stub_latency_distribution,
+            spread=settings.llm_stub_latency_spread,
+            chunk_interval_ms=settings.llm_stub_chunk_interval_ms,
+            chunk_chars=settings.llm_stub_chunk_chars,
+            error_rate=settings.llm_stub_error_rate,
+            seed=settings.llm_stub_seed,
+        )
+    raise ValueError(f"Unknown LLM provider: {name}")
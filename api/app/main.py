@@ -1,13 +1,42 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import connect_to_mongo, close_mongo_connection
-from app.routers import auth, profile, calculations, measurements, ai_coach, workouts, nutrition
+from app.auth import password_hash_pool
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.indexes import ensure_indexes
+from app.plan_jobs import plan_workers
+from app.routers import auth, profile, calculations, measurements, ai_coach, workouts, nutrition, export
 from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the MongoDB client and worker pools for the life of the app"""
+    await connect_to_mongo()
+    if settings.ensure_indexes_on_startup:
+        try:
+            await ensure_indexes(await get_database())
+        except Exception:
+            logger.exception("Index bootstrap failed; run `python -m app.indexes` manually")
+    plan_workers.start()
+
+    yield
+
+    await plan_workers.stop()
+    await close_mongo_connection()
+    password_hash_pool.shutdown()
+
 
 app = FastAPI(
     title="BroncoFit API",
     description="AI Fitness Coach Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
@@ -22,19 +51,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Database connection events
-@app.on_event("startup")
-async def startup_db_client():
-    await connect_to_mongo()
-
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    await close_mongo_connection()
-
-
 # Include routers with /api prefix
 app.include_router(auth.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
@@ -43,6 +62,7 @@ app.include_router(measurements.router, prefix="/api")
 app.include_router(ai_coach.router, prefix="/api")
 app.include_router(workouts.router, prefix="/api")
 app.include_router(nutrition.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
 
 
 # Health check endpoint
@@ -51,6 +71,12 @@ async def health_check():
     return {"status": "healthy", "service": "BroncoFit API"}
 
 
+# In-process cache and pool stats for capacity tuning
+@app.get("/metrics")
+async def metrics():
+    return registry.snapshot()
+
+
 @app.get("/")
 async def root():
     return {
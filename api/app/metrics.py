@@ -0,0 +1,75 @@
+import bisect
+from typing import Callable, Sequence
+
+# Upper bounds for latency histograms (milliseconds) and size histograms (tokens)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, cumulative like Prometheus' ``le`` buckets.
+
+    Quantiles are estimated as the upper bound of the bucket holding them,
+    which is coarse but cheap and good enough to pick timeouts from.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else "+Inf"
+        return "+Inf"
+
+    def stats(self) -> dict:
+        cumulative = {}
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 1),
+            "avg": round(self.sum / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": cumulative,
+        }
+
+
+class MetricsRegistry:
+    """
+    Collects point-in-time stats from named in-process components.
+
+    Components register a zero-argument callable returning a JSON-serializable
+    dict; the registry calls every collector when a snapshot is requested.
+    """
+
+    def __init__(self):
+        self._collectors: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, collector: Callable[[], dict]) -> None:
+        self._collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        return {name: collector() for name, collector in self._collectors.items()}
+
+
+registry = MetricsRegistry()
@@ -1,6 +1,6 @@
 # app/models.py
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, model_validator
+from typing import Annotated, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -113,6 +113,92 @@ class TDEEResponse(BaseModel):
     fast_weight_gain: float  # +1000 cal
 
 
+def _same_length(columns: BaseModel) -> BaseModel:
+    lengths = {len(values) for values in columns.__dict__.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    return columns
+
+
+def _rows_or_columns(batch: BaseModel) -> BaseModel:
+    if (batch.rows is None) == (batch.columns is None):
+        raise ValueError("Provide exactly one of rows or columns")
+    return batch
+
+
+class TDEEColumns(BaseModel):
+    """TDEE inputs as one list per field, all the same length"""
+    age: list[Annotated[int, Field(ge=13, le=120)]]
+    sex: list[Sex]
+    height_cm: list[Annotated[float, Field(gt=0, le=300)]]
+    weight_kg: list[Annotated[float, Field(gt=0, le=500)]]
+    activity_level: list[ActivityLevel]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        return _same_length(self)
+
+
+class TDEEBatchRequest(BaseModel):
+    """A batch of TDEE inputs, either as rows or as columns"""
+    rows: Optional[list[TDEERequest]] = None
+    columns: Optional[TDEEColumns] = None
+
+    @model_validator(mode="after")
+    def check_layout(self):
+        return _rows_or_columns(self)
+
+
+class TDEEBatchResponse(BaseModel):
+    """Batch TDEE results as one list per TDEEResponse field, in input order"""
+    count: int
+    bmr: list[float]
+    tdee: list[float]
+    activity_multiplier: list[float]
+    maintenance_calories: list[float]
+    protein_g: list[float]
+    carbs_g: list[float]
+    fat_g: list[float]
+    mild_weight_loss: list[float]
+    weight_loss: list[float]
+    extreme_weight_loss: list[float]
+    mild_weight_gain: list[float]
+    weight_gain: list[float]
+    fast_weight_gain: list[float]
+
+
+class BMIRequest(BaseModel):
+    weight_kg: float = Field(..., gt=0)
+    height_cm: float = Field(..., gt=0)
+
+
+class BMIColumns(BaseModel):
+    """BMI inputs as one list per field, both the same length"""
+    weight_kg: list[Annotated[float, Field(gt=0)]]
+    height_cm: list[Annotated[float, Field(gt=0)]]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        return _same_length(self)
+
+
+class BMIBatchRequest(BaseModel):
+    """A batch of BMI inputs, either as rows or as columns"""
+    rows: Optional[list[BMIRequest]] = None
+    columns: Optional[BMIColumns] = None
+
+    @model_validator(mode="after")
+    def check_layout(self):
+        return _rows_or_columns(self)
+
+
+class BMIBatchResponse(BaseModel):
+    """Batch BMI results as one list per field, in input order"""
+    count: int
+    bmi: list[float]
+    category: list[str]
+
+
 # Measurement Models
 class MeasurementCreate(BaseModel):
     weight_kg: float = Field(..., gt=0, le=500)
@@ -156,6 +242,24 @@ class WorkoutCreate(BaseModel):
     notes: Optional[str] = None
 
 
+class WorkoutSuggestion(BaseModel):
+    """A suggested workout; the model's output is constrained to this schema"""
+    workout_name: str
+    description: Optional[str] = None
+    exercises: list[WorkoutExercise]
+    duration_minutes: Optional[int] = None
+    notes: Optional[str] = None
+
+
+class WorkoutUpdate(BaseModel):
+    """Partial workout update; only fields present in the request are changed"""
+    workout_name: Optional[str] = None
+    exercises: Optional[list[WorkoutExercise]] = None
+    workout_date: Optional[datetime] = None
+    duration_minutes: Optional[int] = None
+    notes: Optional[str] = None
+
+
 class WorkoutOut(WorkoutCreate):
     id: str
     user_id: str
@@ -188,6 +292,15 @@ class MealCreate(BaseModel):
     notes: Optional[str] = None
 
 
+class MealUpdate(BaseModel):
+    """Partial meal update; only fields present in the request are changed"""
+    meal_type: Optional[MealType] = None
+    foods: Optional[list[FoodItem]] = None  # replaces the whole list
+    add_foods: Optional[list[FoodItem]] = None  # appended; totals adjusted incrementally
+    meal_date: Optional[datetime] = None
+    notes: Optional[str] = None
+
+
 class MealOut(MealCreate):
   id: str
   user_id: str
@@ -200,6 +313,43 @@ class MealOut(MealCreate):
   model_config = ConfigDict(from_attributes=True)
 
 
+class SummaryBucket(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class NutritionTotals(BaseModel):
+    total_calories: float = 0
+    total_protein_g: float = 0
+    total_carbs_g: float = 0
+    total_fat_g: float = 0
+    meals_logged: int = 0
+
+
+class NutritionSummaryPeriod(NutritionTotals):
+    period_start: datetime
+
+
+class NutritionSummaryOut(BaseModel):
+    from_date: datetime
+    to_date: datetime
+    bucket: SummaryBucket
+    periods: list[NutritionSummaryPeriod]
+
+
+# Bulk Ingestion Models
+class BulkItemError(BaseModel):
+    index: int
+    error: str
+
+
+class BulkResult(BaseModel):
+    inserted: int
+    ids: list[Optional[str]]  # aligned with the request items; None where an item failed
+    errors: list[BulkItemError]
+
+
 # AI Coach Models
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -209,12 +359,23 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: Optional[list[ChatMessage]] = []
+    conversation_id: Optional[str] = None  # omit to start a new server-side conversation
+    conversation_history: Optional[list[ChatMessage]] = []  # seeds a new conversation only
 
 
 class ChatResponse(BaseModel):
     response: str
     timestamp: datetime
+    conversation_id: Optional[str] = None
+
+
+class ConversationOut(BaseModel):
+    id: str
+    summary: Optional[str] = None
+    turns: list[ChatMessage]
+    summarized_turns: int = 0
+    created_at: datetime
+    updated_at: datetime
 
 
 # Workout Plan Models
@@ -234,3 +395,31 @@ class WorkoutPlanOut(BaseModel):
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class StoredWorkoutPlanOut(BaseModel):
+    id: str
+    plan_name: str
+    description: str
+    duration_weeks: int
+    ai_generated_plan: str
+    request: WorkoutPlanRequest
+    created_at: datetime
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class PlanJobOut(BaseModel):
+    id: str
+    status: JobStatus
+    attempts: int = 0
+    error: Optional[str] = None
+    plan_id: Optional[str] = None
+    plan: Optional[StoredWorkoutPlanOut] = None  # included once the job has succeeded
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,189 @@
+"""
+Daily nutrition rollups
+
+One ``nutrition_daily`` document per (user, day) holds the macro totals of
+that day's meals. Meal writes keep it current with ``$inc`` deltas, so
+summary reads cost O(days) index lookups instead of O(meals) scans.
+
+Rollups can be rebuilt from ``meals`` for backfill or drift repair:
+
+    python -m app.nutrition_rollup --check            # report drift, exit 1 if any
+    python -m app.nutrition_rollup                    # repair every user
+    python -m app.nutrition_rollup --user <user_id>   # repair a single user
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Iterable, Optional
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from app.database import naive_utc
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ("total_calories", "total_protein_g", "total_carbs_g", "total_fat_g")
+DRIFT_TOLERANCE = 1e-6
+
+
+def day_start(value: datetime) -> datetime:
+    """Midnight of the value's UTC day, matching $dateTrunc over the stored dates"""
+    return naive_utc(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_ops(user_id: str, changes: Iterable[tuple[dict, int]]) -> list[UpdateOne]:
+    """
+    Fold meal changes into one $inc upsert per affected day.
+
+    Each change is a (meal, sign) pair: +1 when the meal is added to its day,
+    -1 when it is removed.
+    """
+    deltas: dict[datetime, dict[str, float]] = {}
+    for meal, sign in changes:
+        delta = deltas.setdefault(day_start(meal["meal_date"]), {"meals_logged": 0})
+        delta["meals_logged"] += sign
+        for field in ROLLUP_FIELDS:
+            delta[field] = delta.get(field, 0) + sign * (meal.get(field) or 0)
+
+    now = datetime.utcnow()
+    return [
+        UpdateOne(
+            {"user_id": user_id, "day": day},
+            {"$inc": delta, "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for day, delta in deltas.items()
+        if any(delta.values())
+    ]
+
+
+async def record_meal_change(db, user_id: str, before: Optional[dict], after: Optional[dict]) -> None:
+    """Apply the rollup delta for a meal going from `before` to `after` (either may be None)"""
+    changes = []
+    if before is not None:
+        changes.append((before, -1))
+    if after is not None:
+        changes.append((after, 1))
+
+    ops = rollup_ops(user_id, changes)
+    if ops:
+        await db.nutrition_daily.bulk_write(ops, ordered=False)
+
+
+async def read_periods(db, user_id: str, start: datetime, end: datetime, unit: str) -> list[dict]:
+    """Per-period totals in [start, end) read from the rollups, oldest first"""
+    match = {"user_id": user_id, "day": {"$gte": start, "$lt": end}, "meals_logged": {"$gt": 0}}
+
+    if unit == "day":
+        docs = await db.nutrition_daily.find(
+            match, {"_id": 0, "day": 1, "meals_logged": 1, **{f: 1 for f in ROLLUP_FIELDS}}
+        ).sort("day", 1).to_list(None)
+        for doc in docs:
+            doc["period_start"] = doc.pop("day")
+        return docs
+
+    docs = await db.nutrition_daily.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$day", "unit": unit, "startOfWeek": "monday"}},
+            "meals_logged": {"$sum": "$meals_logged"},
+            **{field: {"$sum": f"${field}"} for field in ROLLUP_FIELDS},
+        }},
+        {"$sort": {"_id": 1}},
+    ]).to_list(None)
+    for doc in docs:
+        doc["period_start"] = doc.pop("_id")
+    return docs
+
+
+async def _expected_rollups(db, user_id: str) -> dict[datetime, dict]:
+    docs = await db.meals.aggregate([
+        {"$match": {"user_id": user_id, "meal_date": {"$ne": None}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$meal_date", "unit": "day"}},
+            "meals_logged": {"$sum": 1},
+            **{field: {"$sum": f"${field}"} for field in ROLLUP_FIELDS},
+        }},
+    ]).to_list(None)
+    return {doc.pop("_id"): doc for doc in docs}
+
+
+def _drifted(expected: dict, actual: dict) -> bool:
+    if expected.get("meals_logged", 0) != actual.get("meals_logged", 0):
+        return True
+    return any(
+        abs((expected.get(field) or 0) - (actual.get(field) or 0)) > DRIFT_TOLERANCE
+        for field in ROLLUP_FIELDS
+    )
+
+
+async def rebuild_user(db, user_id: str, check_only: bool = False) -> int:
+    """
+    Recompute a user's rollups from their meals.
+
+    Returns the number of drifted days (missing, stale or orphaned). Unless
+    check_only is set, drifted days are replaced with the recomputed values.
+    """
+    expected = await _expected_rollups(db, user_id)
+    actual = {
+        doc["day"]: doc
+        for doc in await db.nutrition_daily.find({"user_id": user_id}).to_list(None)
+    }
+
+    now = datetime.utcnow()
+    ops = []
+    for day, totals in expected.items():
+        if day not in actual or _drifted(totals, actual[day]):
+            ops.append(ReplaceOne(
+                {"user_id": user_id, "day": day},
+                {"user_id": user_id, "day": day, **totals, "updated_at": now},
+                upsert=True,
+            ))
+    for day, doc in actual.items():
+        if day not in expected:
+            ops.append(DeleteOne({"_id": doc["_id"]}))
+
+    if ops and not check_only:
+        await db.nutrition_daily.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def rebuild_all(db, check_only: bool = False) -> int:
+    """Rebuild rollups for every user; returns the total number of drifted days"""
+    drifted = 0
+    async for user in db.users.find({}, {"_id": 1}):
+        user_id = str(user["_id"])
+        user_drift = await rebuild_user(db, user_id, check_only=check_only)
+        if user_drift:
+            logger.info("User %s: %d drifted day(s)", user_id, user_drift)
+        drifted += user_drift
+    return drifted
+
+
+async def _main(user_id: Optional[str], check_only: bool) -> int:
+    from app.database import close_mongo_connection, connect_to_mongo, get_database
+
+    await connect_to_mongo()
+    try:
+        database = await get_database()
+        if user_id:
+            drifted = await rebuild_user(database, user_id, check_only=check_only)
+        else:
+            drifted = await rebuild_all(database, check_only=check_only)
+        action = "found" if check_only else "repaired"
+        print(f"{action} {drifted} drifted day(s)")
+        return 1 if check_only and drifted else 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify nutrition_daily rollups")
+    parser.add_argument("--user", help="only rebuild this user id")
+    parser.add_argument("--check", action="store_true", help="report drift without writing; exit 1 if any")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(args.user, args.check)))
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(date: Optional[datetime], doc_id: ObjectId) -> str:
+    """Encode the last (date, _id) seen into an opaque, URL-safe cursor; date is None for undated documents"""
+    raw = json.dumps({"d": date.isoformat() if date else None, "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime], ObjectId]:
+    """Decode a cursor produced by encode_cursor; raises 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        date = datetime.fromisoformat(data["d"]) if data["d"] is not None else None
+        return date, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def keyset_filter(base_filter: dict, date_field: str, cursor: Optional[str]) -> dict:
+    """
+    Extend a query so it resumes strictly after the cursor position in
+    (date desc, _id desc) order. Documents with a null or missing date sort
+    after every dated one, so a dated cursor still reaches them and an
+    undated cursor only seeks on _id among them.
+    """
+    if not cursor:
+        return base_filter
+
+    date, doc_id = decode_cursor(cursor)
+    if date is None:
+        return {**base_filter, date_field: None, "_id": {"$lt": doc_id}}
+    return {
+        **base_filter,
+        "$or": [
+            {date_field: {"$lt": date}},
+            {date_field: date, "_id": {"$lt": doc_id}},
+            {date_field: None},
+        ],
+    }
+
+
+def page_sort(date_field: str) -> list[tuple[str, int]]:
+    return [(date_field, -1), ("_id", -1)]
+
+
+async def fetch_page(
+    collection,
+    base_filter: dict,
+    date_field: str,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Fetch one page of a user's history, newest first.
+
+    With a cursor the page is served by an index seek; skip is honoured only
+    when no cursor is given, for backwards compatibility. Returns the
+    documents and the cursor for the following page (None when exhausted).
+    """
+    query = collection.find(keyset_filter(base_filter, date_field, cursor)).sort(page_sort(date_field))
+    if skip and not cursor:
+        query = query.skip(skip)
+    docs = await query.limit(limit).to_list(limit)
+
+    next_cursor = None
+    if limit and len(docs) == limit:
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(date_field), last["_id"])
+    return docs, next_cursor
@@ -0,0 +1,170 @@
+"""
+Two-tier cache for AI-generated workout plans
+
+Plan requests have a small input space, so plans are shared between users
+whose normalized request and coarse profile bucket (age band, sex, activity
+level) match. An in-process LRU sits in front of the ``ai_plan_cache``
+collection, whose ``expires_at`` TTL index lets MongoDB purge stale plans.
+
+Plans are generated from the bucket alone, never from an individual's
+profile, so a shared plan cannot leak another user's details.
+"""
+import copy
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import registry
+from app.models import WorkoutPlanRequest
+
+logger = logging.getLogger(__name__)
+
+# Bumping this invalidates every stored plan (e.g. after a prompt change)
+PLAN_CACHE_VERSION = 1
+
+AGE_BANDS = ((18, "under 18"), (30, "18-29"), (40, "30-39"), (50, "40-49"), (60, "50-59"))
+
+
+def age_band(age: Optional[int]) -> Optional[str]:
+    if age is None:
+        return None
+    for upper, label in AGE_BANDS:
+        if age < upper:
+            return label
+    return "60+"
+
+
+def profile_bucket(profile: Optional[dict]) -> dict:
+    """Coarse, non-identifying slice of a profile that plans may depend on"""
+    profile = profile or {}
+    return {
+        "age_band": age_band(profile.get("age")),
+        "sex": profile.get("sex"),
+        "activity_level": profile.get("activity_level"),
+    }
+
+
+def bucket_context(bucket: dict) -> str:
+    """User context for the plan prompt, built from the bucket only"""
+    lines = ["User Profile:"]
+    if bucket.get("age_band"):
+        lines.append(f"- Age: {bucket['age_band']} years old")
+    if bucket.get("sex"):
+        lines.append(f"- Sex: {bucket['sex']}")
+    if bucket.get("activity_level"):
+        lines.append(f"- Activity Level: {bucket['activity_level']}")
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def plan_cache_key(request: WorkoutPlanRequest, bucket: dict) -> str:
+    """Stable key over the normalized request and profile bucket"""
+    normalized = {
+        "v": PLAN_CACHE_VERSION,
+        "goal": request.goal.value,
+        "experience_level": request.experience_level.strip().lower(),
+        "days_per_week": request.days_per_week,
+        "equipment": sorted({item.strip().lower() for item in request.equipment_available if item.strip()}),
+        "duration": request.duration_per_session,
+        "profile": bucket,
+    }
+    raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    In-memory LRU over a MongoDB collection with a TTL index.
+
+    Store failures are logged and treated as misses, so a degraded cache
+    never fails a plan request. Entries hold the plan without its
+    ``created_at``; a served copy is stamped with the time it was served.
+    """
+
+    def __init__(self, maxsize: int, memory_ttl: float, ttl: float):
+        self._memory = TTLCache(maxsize=maxsize, ttl=memory_ttl)
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.store_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def get(self, db, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+
+        plan = self._memory.get(key)
+        if plan is not None:
+            self.memory_hits += 1
+            return self._served(plan)
+
+        now = datetime.utcnow()
+        try:
+            document = await db.ai_plan_cache.find_one({"_id": key, "expires_at": {"$gt": now}})
+        except PyMongoError:
+            self.store_errors += 1
+            logger.exception("Plan cache read failed")
+            document = None
+
+        if document is None:
+            self.misses += 1
+            return None
+
+        self.store_hits += 1
+        self._memory.set(key, document["plan"], ttl=(document["expires_at"] - now).total_seconds())
+        return self._served(document["plan"])
+
+    @staticmethod
+    def _served(plan: dict) -> dict:
+        return {**copy.deepcopy(plan), "created_at": datetime.now()}
+
+    async def put(self, db, key: str, plan: dict) -> None:
+        if not self.enabled:
+            return
+
+        plan = {field: value for field, value in plan.items() if field != "created_at"}
+        self._memory.set(key, copy.deepcopy(plan))
+        now = datetime.utcnow()
+        try:
+            await db.ai_plan_cache.replace_one(
+                {"_id": key},
+                {"plan": plan, "created_at": now, "expires_at": now + timedelta(seconds=self.ttl)},
+                upsert=True,
+            )
+            self.writes += 1
+        except PyMongoError:
+            self.store_errors += 1
+            logger.exception("Plan cache write failed")
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.store_hits + self.misses
+        return {
+            "memory": self._memory.stats(),
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "store_errors": self.store_errors,
+            "hit_ratio": round((self.memory_hits + self.store_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+plan_cache = PlanCache(
+    maxsize=settings.plan_cache_max_entries,
+    memory_ttl=settings.plan_cache_memory_ttl_seconds,
+    ttl=settings.plan_cache_ttl_seconds,
+)
+registry.register("plan_cache", plan_cache.stats)
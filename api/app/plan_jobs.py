@@ -0,0 +1,310 @@
+"""
+Background generation of AI workout plans
+
+``POST /ai-coach/jobs`` stores a job in ``ai_jobs`` and returns at once.
+A bounded pool of asyncio workers, started by the app lifespan, claims
+jobs with an atomic find_one_and_update and holds them under a lease: a
+job whose worker died is reclaimed once the lease expires, until it runs
+out of attempts. Jobs put back after a transient failure wait out a
+backoff (``not_before``) before they can be claimed again. Finished plans
+are written to ``workout_plans`` so they can be fetched again without
+regenerating them.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.ai_coach import CoachBusy, CoachTimeout, generate_workout_plan
+from app.circuit import CircuitOpen
+from app.config import settings
+from app.database import get_database
+from app.metrics import registry
+from app.models import JobStatus, WorkoutPlanRequest
+from app.plan_cache import bucket_context, plan_cache, plan_cache_key, profile_bucket
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value)
+
+
+async def generate_plan(db, user_id: str, request: WorkoutPlanRequest) -> dict:
+    """
+    Serve a plan from the plan cache or generate and cache it.
+
+    Only the coarse profile bucket feeds the prompt and the cache key, since
+    cached plans are shared between users.
+    """
+    profile = await db.profiles.find_one(
+        {"user_id": user_id},
+        {"_id": 0, "age": 1, "sex": 1, "activity_level": 1}
+    )
+    bucket = profile_bucket(profile)
+    cache_key = plan_cache_key(request, bucket)
+
+    plan = await plan_cache.get(db, cache_key)
+    if plan is not None:
+        return plan
+
+    plan = await generate_workout_plan(
+        goal=request.goal,
+        experience_level=request.experience_level,
+        days_per_week=request.days_per_week,
+        equipment=request.equipment_available,
+        duration_minutes=request.duration_per_session,
+        user_context=bucket_context(bucket),
+        user_id=user_id
+    )
+    # A stand-in served while the model is unavailable is not cached for this request
+    if plan.get("source") != "last_good":
+        await plan_cache.put(db, cache_key, plan)
+    return plan
+
+
+class JobEvents:
+    """In-process wakeups for clients following a job over SSE"""
+
+    def __init__(self):
+        self._waiters: dict[str, set[asyncio.Event]] = {}
+
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """Return when the job changes or after timeout, whichever is first"""
+        event = asyncio.Event()
+        self._waiters.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    def notify(self, job_id: str) -> None:
+        for event in self._waiters.get(job_id, ()):
+            event.set()
+
+
+job_events = JobEvents()
+
+
+async def enqueue_plan_job(db, user_id: str, request: WorkoutPlanRequest) -> dict:
+    now = datetime.utcnow()
+    job = {
+        "user_id": user_id,
+        "kind": "workout_plan",
+        "status": JobStatus.QUEUED.value,
+        "request": request.model_dump(mode="json"),
+        "attempts": 0,
+        "error": None,
+        "plan_id": None,
+        "not_before": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+    result = await db.ai_jobs.insert_one(job)
+    job["_id"] = result.inserted_id
+    plan_workers.wake()
+    return job
+
+
+async def get_job(db, user_id: str, job_id: str) -> Optional[dict]:
+    """The user's job, or None if the id is malformed or not theirs"""
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db.ai_jobs.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+
+
+async def fail_exhausted_jobs(db, now: datetime) -> None:
+    """Fail jobs whose lease expired on their last allowed attempt"""
+    await db.ai_jobs.update_many(
+        {
+            "status": JobStatus.RUNNING.value,
+            "lease_expires_at": {"$lt": now},
+            "attempts": {"$gte": settings.plan_job_max_attempts},
+        },
+        {
+            "$set": {
+                "status": JobStatus.FAILED.value,
+                "error": "Workout plan job did not finish within its attempts",
+                "finished_at": now,
+                "updated_at": now,
+            },
+            "$unset": {"lease_expires_at": ""},
+        },
+    )
+
+
+async def claim_job(db, worker_id: str, lease_seconds: float) -> Optional[dict]:
+    """
+    Atomically take the oldest queued job that is past its backoff, or one
+    whose lease expired with attempts left
+    """
+    now = datetime.utcnow()
+    await fail_exhausted_jobs(db, now)
+    claim = {
+        "$set": {
+            "status": JobStatus.RUNNING.value,
+            "worker": worker_id,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "started_at": now,
+            "updated_at": now,
+        },
+        "$inc": {"attempts": 1},
+    }
+    candidates = (
+        # $not also matches jobs queued before not_before existed
+        ({"status": JobStatus.QUEUED.value, "not_before": {"$not": {"$gt": now}}}, [("created_at", 1)]),
+        (
+            {
+                "status": JobStatus.RUNNING.value,
+                "lease_expires_at": {"$lt": now},
+                "attempts": {"$lt": settings.plan_job_max_attempts},
+            },
+            [("lease_expires_at", 1)],
+        ),
+    )
+    for query, sort in candidates:
+        job = await db.ai_jobs.find_one_and_update(query, claim, sort=sort, return_document=ReturnDocument.AFTER)
+        if job is not None:
+            return job
+    return None
+
+
+async def _finish(db, job: dict, changes: dict) -> bool:
+    """Record a job outcome unless another worker has reclaimed it meanwhile"""
+    now = datetime.utcnow()
+    result = await db.ai_jobs.update_one(
+        {"_id": job["_id"], "worker": job["worker"], "attempts": job["attempts"]},
+        {"$set": {**changes, "updated_at": now}, "$unset": {"lease_expires_at": ""}},
+    )
+    job_events.notify(str(job["_id"]))
+    return result.modified_count == 1
+
+
+async def run_job(db, job: dict) -> str:
+    """Generate the plan for a claimed job; returns the resulting status"""
+    try:
+        plan = await generate_plan(db, job["user_id"], WorkoutPlanRequest(**job["request"]))
+    except (CoachBusy, CircuitOpen, CoachTimeout) as e:
+        # Capacity and availability problems are transient: put the job back until attempts run out
+        status = JobStatus.QUEUED if job["attempts"] < settings.plan_job_max_attempts else JobStatus.FAILED
+        changes = {"status": status.value, "error": str(e)}
+        if status == JobStatus.FAILED:
+            changes["finished_at"] = datetime.utcnow()
+        else:
+            backoff = settings.plan_job_retry_backoff_seconds * 2 ** (job["attempts"] - 1)
+            changes["not_before"] = datetime.utcnow() + timedelta(seconds=backoff)
+        await _finish(db, job, changes)
+        return status.value
+    except Exception:
+        logger.exception("Workout plan job %s failed", job["_id"])
+        await _finish(db, job, {
+            "status": JobStatus.FAILED.value,
+            "error": "Failed to generate workout plan",
+            "finished_at": datetime.utcnow(),
+        })
+        return JobStatus.FAILED.value
+
+    result = await db.workout_plans.insert_one({
+        "user_id": job["user_id"],
+        "job_id": job["_id"],
+        "request": job["request"],
+        **plan,
+        # A cached plan carries the time it was first generated; record when this one was saved
+        "created_at": datetime.utcnow(),
+    })
+    await _finish(db, job, {
+        "status": JobStatus.SUCCEEDED.value,
+        "plan_id": result.inserted_id,
+        "error": None,
+        "finished_at": datetime.utcnow(),
+    })
+    return JobStatus.SUCCEEDED.value
+
+
+class PlanJobWorkers:
+    """
+    Fixed pool of asyncio tasks draining ``ai_jobs``.
+
+    Idle workers sleep until a job is enqueued in this process or the poll
+    interval passes, so jobs enqueued by other processes are picked up too.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float, lease_seconds: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.busy = 0
+        self.outcomes: dict[str, int] = {}
+
+    def start(self) -> None:
+        if self._tasks or self.concurrency <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(f"{id(self):x}-{index}"), name=f"plan-job-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        logger.info("Started %d plan job workers", self.concurrency)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _idle(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            try:
+                db = await get_database()
+                job = await claim_job(db, worker_id, self.lease_seconds)
+                if job is None:
+                    await self._idle()
+                    continue
+
+                self.busy += 1
+                try:
+                    status = await run_job(db, job)
+                finally:
+                    self.busy -= 1
+                self.outcomes[status] = self.outcomes.get(status, 0) + 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Plan job worker %s error", worker_id)
+                await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "busy": self.busy,
+            "outcomes": dict(self.outcomes),
+        }
+
+
+plan_workers = PlanJobWorkers(
+    concurrency=settings.plan_job_workers,
+    poll_interval=settings.plan_job_poll_seconds,
+    lease_seconds=settings.plan_job_lease_seconds,
+)
+registry.register("plan_jobs", plan_workers.stats)
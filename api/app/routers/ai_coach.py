@@ -1,13 +1,53 @@
+import asyncio
 import logging
+import math
+import time
 from datetime import datetime
+from functools import partial
 
-from fastapi import APIRouter, Depends, HTTPException
+from bson import ObjectId
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
-from app.ai_coach import chat_with_coach, generate_workout_plan, get_user_context, suggest_workout
+from app.ai_coach import (
+    CHAT_FALLBACK_MESSAGE,
+    CoachBusy,
+    InvalidModelOutput,
+    CoachTimeout,
+    chat_with_coach,
+    stream_chat_with_coach,
+    stream_workout_suggestion,
+    suggest_workout,
+    summarize_conversation,
+)
+from app.conversations import (
+    append_turns,
+    compact_conversation,
+    conversation_messages,
+    get_conversation,
+    needs_compaction,
+    start_conversation,
+)
+from app.circuit import CircuitOpen
+from app.coach_context import load_coach_context
+from app.config import settings
 from app.database import get_database
 from app.dependencies import get_current_user
-from app.models import ChatRequest, ChatResponse, WorkoutPlanRequest, WorkoutPlanOut
+from app.history_index import relevant_history
+from app.models import (
+    ChatMessage,
+    ChatRequest,
+    ChatResponse,
+    ConversationOut,
+    JobStatus,
+    PlanJobOut,
+    StoredWorkoutPlanOut,
+    WorkoutPlanRequest,
+)
+from app.plan_jobs import TERMINAL_STATUSES, enqueue_plan_job, generate_plan, get_job, job_events
+from app.sse import event_stream, sse_event
+from app.workout_rules import record_suggestion_path, suggest_from_rules
 
 logger = logging.getLogger(__name__)
 
@@ -18,67 +58,223 @@ class WorkoutSuggestionRequest(BaseModel):
     message: str
 
 
+def coach_unavailable(error: Exception) -> HTTPException:
+    """Map AI limiter/circuit/deadline/output failures to retryable HTTP errors"""
+    if isinstance(error, CoachBusy):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(error),
+            headers={"Retry-After": "5"},
+        )
+    if isinstance(error, CircuitOpen):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(error),
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+        )
+    if isinstance(error, InvalidModelOutput):
+        return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(error))
+    return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(error))
+
+
+async def open_conversation(db, user_id: str, request: ChatRequest) -> dict:
+    """Load the requested conversation, or start one seeded with any client history"""
+    if request.conversation_id:
+        conversation = await get_conversation(db, user_id, request.conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return conversation
+    return await start_conversation(db, user_id, seed=request.conversation_history)
+
+
+async def record_exchange(db, conversation: dict, message: str, reply: str) -> bool:
+    """Persist a completed exchange; returns whether the conversation needs compacting"""
+    if reply == CHAT_FALLBACK_MESSAGE:
+        return False
+
+    now = datetime.utcnow()
+    updated = await append_turns(db, conversation["_id"], [
+        ChatMessage(role="user", content=message, timestamp=now),
+        ChatMessage(role="assistant", content=reply, timestamp=now),
+    ])
+    return updated is not None and needs_compaction(updated)
+
+
+def compaction_task(db, conversation_id: ObjectId, user_id: str):
+    return partial(compact_conversation, db, conversation_id, partial(summarize_conversation, user_id=user_id))
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Chat with the AI fitness coach
+
+    Turns are stored server-side; send the returned conversation_id with the
+    next message instead of re-uploading the history. A busy coach answers
+    429; model timeouts and an open circuit reply with the fallback message.
     """
+    user_id = str(current_user["_id"])
+    conversation = await open_conversation(db, user_id, request)
+
     try:
-        # Gather user context
-        user_data = {}
-        
-        # Get profile
-        user_id = str(current_user["_id"])
-        profile = await db.profiles.find_one({"user_id": user_id})
-        if profile:
-            profile.pop("_id", None)
-            user_data["profile"] = profile
-
-        # Get latest measurement
-        latest_measurement = await db.measurements.find_one(
-            {"user_id": user_id},
-            sort=[("measurement_date", -1)]
+        context, history = await asyncio.gather(
+            load_coach_context(db, user_id),
+            relevant_history(db, user_id, request.message),
         )
-        if latest_measurement:
-            latest_measurement.pop("_id", None)
-            user_data["latest_measurement"] = latest_measurement
-
-        # Get recent workouts (last 7 days)
-        recent_workouts = await db.workouts.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(5).to_list(5)
-        user_data["recent_workouts"] = recent_workouts
-
-        # Get recent meals (last 7 days)
-        recent_meals = await db.meals.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(5).to_list(5)
-        user_data["recent_meals"] = recent_meals
-        
-        # Build context
-        context = await get_user_context(user_data)
         
         # Get AI response
         response_text = await chat_with_coach(
             user_message=request.message,
-            user_context=context,
-            conversation_history=request.conversation_history
+            user_context=context.text,
+            conversation_history=conversation_messages(conversation),
+            user_id=user_id,
+            summary=conversation.get("summary"),
+            relevant_history=history
         )
+
+        if await record_exchange(db, conversation, request.message, response_text):
+            background_tasks.add_task(compaction_task(db, conversation["_id"], user_id))
         
         return ChatResponse(
             response=response_text,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            conversation_id=str(conversation["_id"])
         )
         
+    except CoachBusy as e:
+        raise coach_unavailable(e)
     except Exception as e:
         logger.exception("Chat error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Chat with the AI fitness coach, streaming the reply as server-sent events.
+
+    Emits a `chunk` event ({"text"}) per model chunk and a final `done` event
+    with the assembled response and timing in milliseconds. The first chunk
+    is awaited before the response starts, so a busy coach still surfaces as
+    429. Other failures before the first chunk stream the fallback message,
+    as /chat replies with it; later failures arrive as an `error` event.
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    user_id = str(current_user["_id"])
+    conversation = await open_conversation(db, user_id, request)
+
+    try:
+        context, history = await asyncio.gather(
+            load_coach_context(db, user_id),
+            relevant_history(db, user_id, request.message),
+        )
+        context_ms = elapsed_ms()
+
+        chunks = stream_chat_with_coach(
+            user_message=request.message,
+            user_context=context.text,
+            conversation_history=conversation_messages(conversation),
+            user_id=user_id,
+            summary=conversation.get("summary"),
+            relevant_history=history
+        )
+        first_chunk = await anext(chunks, None)
+        first_chunk_ms = elapsed_ms()
+    except CoachBusy as e:
+        raise coach_unavailable(e)
+    except Exception as e:
+        logger.exception("Chat stream error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        parts = []
+        try:
+            if first_chunk is not None:
+                parts.append(first_chunk)
+                yield sse_event("chunk", {"text": first_chunk})
+            async for text in chunks:
+                parts.append(text)
+                yield sse_event("chunk", {"text": text})
+
+            reply = "".join(parts)
+            await record_exchange(db, conversation, request.message, reply)
+        except Exception as e:
+            logger.exception("Chat stream error")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        finally:
+            await chunks.aclose()
+
+        yield sse_event("done", {
+            "response": reply,
+            "conversation_id": str(conversation["_id"]),
+            "timestamp": datetime.now(),
+            "timing": {
+                "context_ms": context_ms,
+                "first_chunk_ms": first_chunk_ms,
+                "total_ms": elapsed_ms(),
+            },
+        })
+
+    # compact_conversation re-checks the budget, so scheduling it is cheap
+    return event_stream(events(), background=BackgroundTask(compaction_task(db, conversation["_id"], user_id)))
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationOut)
+async def read_conversation(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Get a stored conversation: running summary plus the unsummarized turns"""
+    conversation = await get_conversation(db, str(current_user["_id"]), conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    return ConversationOut(
+        id=str(conversation["_id"]),
+        summary=conversation.get("summary"),
+        turns=conversation_messages(conversation),
+        summarized_turns=conversation.get("summarized_turns", 0),
+        created_at=conversation["created_at"],
+        updated_at=conversation["updated_at"],
+    )
+
+
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(
+    conversation_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Delete a stored conversation"""
+    if not ObjectId.is_valid(conversation_id):
+        raise HTTPException(status_code=400, detail="Invalid conversation ID")
+
+    result = await db.ai_conversations.delete_one({
+        "_id": ObjectId(conversation_id),
+        "user_id": str(current_user["_id"])
+    })
+
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    return {"message": "Conversation deleted successfully"}
+
+
 @router.post("/generate-workout-plan", response_model=dict)
 async def create_workout_plan(
     request: WorkoutPlanRequest,
@@ -86,37 +282,160 @@ async def create_workout_plan(
     db=Depends(get_database)
 ):
     """
-    Generate a personalized workout plan using AI
+    Generate a personalized workout plan using AI, waiting for the result
+
+    Plans are shared through the plan cache between users with the same
+    request and profile bucket, so repeat combinations skip the model.
+    Prefer POST /ai-coach/jobs for new clients: generation can take longer
+    than proxies allow a request to stay open.
     """
     try:
-        # Get user profile for context
-        user_id = str(current_user["_id"])
-        profile = await db.profiles.find_one({"user_id": user_id})
-
-        user_data = {}
-        if profile:
-            profile.pop("_id", None)
-            user_data["profile"] = profile
-
-        context = await get_user_context(user_data)
-
-        # Generate plan
-        plan = await generate_workout_plan(
-            goal=request.goal,
-            experience_level=request.experience_level,
-            days_per_week=request.days_per_week,
-            equipment=request.equipment_available,
-            duration_minutes=request.duration_per_session,
-            user_context=context
-        )
-
-        return plan
+        return await generate_plan(db, str(current_user["_id"]), request)
 
+    except (CoachBusy, CircuitOpen, CoachTimeout) as e:
+        raise coach_unavailable(e)
     except Exception as e:
         logger.exception("Workout plan generation error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def stored_plan_out(plan: dict) -> StoredWorkoutPlanOut:
+    return StoredWorkoutPlanOut(
+        id=str(plan["_id"]),
+        plan_name=plan["plan_name"],
+        description=plan["description"],
+        duration_weeks=plan["duration_weeks"],
+        ai_generated_plan=plan["ai_generated_plan"],
+        request=plan["request"],
+        created_at=plan["created_at"],
+    )
+
+
+async def plan_job_out(db, job: dict) -> PlanJobOut:
+    """Describe a job, embedding the stored plan once it has succeeded"""
+    plan = None
+    if job["status"] == JobStatus.SUCCEEDED.value and job.get("plan_id"):
+        stored = await db.workout_plans.find_one({"_id": job["plan_id"], "user_id": job["user_id"]})
+        if stored:
+            plan = stored_plan_out(stored)
+
+    return PlanJobOut(
+        id=str(job["_id"]),
+        status=job["status"],
+        attempts=job.get("attempts", 0),
+        error=job.get("error"),
+        plan_id=str(job["plan_id"]) if job.get("plan_id") else None,
+        plan=plan,
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
+@router.post("/jobs", response_model=PlanJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_plan_job(
+    request: WorkoutPlanRequest,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Queue a workout plan for background generation
+
+    Returns the queued job at once; poll GET /ai-coach/jobs/{job_id} or
+    follow GET /ai-coach/jobs/{job_id}/events until it finishes.
+    """
+    job = await enqueue_plan_job(db, str(current_user["_id"]), request)
+    return await plan_job_out(db, job)
+
+
+@router.get("/jobs/{job_id}", response_model=PlanJobOut)
+async def read_plan_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Get a plan job's status, with the plan once it has succeeded"""
+    job = await get_job(db, str(current_user["_id"]), job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return await plan_job_out(db, job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def follow_plan_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Follow a plan job as server-sent events
+
+    Emits a `status` event whenever the job changes and ends with `done`
+    (the job including its plan) or `failed`.
+    """
+    user_id = str(current_user["_id"])
+    job = await get_job(db, user_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        current = job
+        last_seen = None
+        while True:
+            out = await plan_job_out(db, current)
+            if out.status.value in TERMINAL_STATUSES:
+                event = "done" if out.status == JobStatus.SUCCEEDED else "failed"
+                yield sse_event(event, out.model_dump(mode="json"))
+                return
+            if (out.status, out.attempts) != last_seen:
+                last_seen = (out.status, out.attempts)
+                yield sse_event("status", out.model_dump(mode="json"))
+
+            # Woken early by workers in this process; polls for the others
+            await job_events.wait(job_id, settings.plan_job_poll_seconds)
+            current = await get_job(db, user_id, job_id)
+            if current is None:
+                yield sse_event("error", {"detail": "Job not found"})
+                return
+
+    return event_stream(events())
+
+
+@router.get("/plans", response_model=list[StoredWorkoutPlanOut])
+async def list_workout_plans(
+    limit: int = Query(default=10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """List the user's generated workout plans, newest first"""
+    plans = await db.workout_plans.find(
+        {"user_id": str(current_user["_id"])}
+    ).sort("created_at", -1).limit(limit).to_list(length=limit)
+
+    return [stored_plan_out(plan) for plan in plans]
+
+
+@router.get("/plans/{plan_id}", response_model=StoredWorkoutPlanOut)
+async def read_workout_plan(
+    plan_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Get a generated workout plan"""
+    if not ObjectId.is_valid(plan_id):
+        raise HTTPException(status_code=400, detail="Invalid plan ID")
+
+    plan = await db.workout_plans.find_one({
+        "_id": ObjectId(plan_id),
+        "user_id": str(current_user["_id"])
+    })
+
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    return stored_plan_out(plan)
+
+
 @router.post("/suggest-workout", response_model=dict)
 async def get_workout_suggestion(
     request: WorkoutSuggestionRequest,
@@ -124,37 +443,98 @@ async def get_workout_suggestion(
     db=Depends(get_database)
 ):
     """
-    Get an AI-generated workout suggestion that can be saved directly
+    Get a workout suggestion that can be saved directly
+
+    Simple requests ("30 min upper body, dumbbells") are answered from the
+    exercise catalog by rules; anything else goes to the AI. `source` in the
+    response says which path served it: rules, model or last_good.
     """
     try:
-        # Get user context
         user_id = str(current_user["_id"])
-        profile = await db.profiles.find_one({"user_id": user_id})
-
-        user_data = {}
-        if profile:
-            profile.pop("_id", None)
-            user_data["profile"] = profile
-
-        # Get latest measurement
-        latest_measurement = await db.measurements.find_one(
-            {"user_id": user_id},
-            sort=[("measurement_date", -1)]
-        )
-        if latest_measurement:
-            latest_measurement.pop("_id", None)
-            user_data["latest_measurement"] = latest_measurement
+        context = await load_coach_context(db, user_id)
 
-        context = await get_user_context(user_data)
+        result = suggest_from_rules(request.message, context.fitness_goal)
+        if result is not None:
+            record_suggestion_path("rules")
+            return result
 
         # Generate workout suggestion
         result = await suggest_workout(
             user_message=request.message,
-            user_context=context
+            user_context=context.text,
+            user_id=user_id
         )
+        record_suggestion_path(result["source"])
 
         return result
 
+    except (CoachBusy, CircuitOpen, CoachTimeout, InvalidModelOutput) as e:
+        raise coach_unavailable(e)
     except Exception as e:
         logger.exception("Workout suggestion error")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def replay_suggestion(result: dict):
+    """Emit a complete suggestion as the events a streamed one produces"""
+    for exercise in result["workout"]["exercises"]:
+        yield "exercise", exercise
+    yield "done", result
+
+
+@router.post("/suggest-workout/stream")
+async def stream_workout_suggestion_events(
+    request: WorkoutSuggestionRequest,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Get a workout suggestion as server-sent events
+
+    Emits an `exercise` event ({"index", "exercise"}) as soon as each
+    exercise is generated and validated, then a `done` event with the same
+    response as POST /ai-coach/suggest-workout. The first exercise is awaited
+    before the response starts, so limiter, circuit, deadline and invalid
+    output failures still surface as 429/503/504/502; later failures arrive
+    as an `error` event.
+    """
+    user_id = str(current_user["_id"])
+
+    try:
+        context = await load_coach_context(db, user_id)
+
+        result = suggest_from_rules(request.message, context.fitness_goal)
+        if result is not None:
+            suggestion = replay_suggestion(result)
+        else:
+            suggestion = stream_workout_suggestion(
+                user_message=request.message,
+                user_context=context.text,
+                user_id=user_id
+            )
+        first = await anext(suggestion)
+    except (CoachBusy, CircuitOpen, CoachTimeout, InvalidModelOutput) as e:
+        raise coach_unavailable(e)
+    except Exception as e:
+        logger.exception("Workout suggestion error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        index = 0
+        try:
+            event, payload = first
+            while True:
+                if event == "done":
+                    record_suggestion_path(payload["source"])
+                    yield sse_event("done", payload)
+                    return
+                yield sse_event("exercise", {"index": index, "exercise": payload})
+                index += 1
+                event, payload = await anext(suggestion)
+        except Exception as e:
+            logger.exception("Workout suggestion stream error")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            await suggestion.aclose()
+
+    return event_stream(events())
@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from app.models import UserCreate, UserLogin, UserOut, Token
-from app.auth import get_password_hash, verify_password, create_access_token
+from app.auth import (
+    PasswordHasherBusy,
+    create_access_token,
+    get_password_hash_async,
+    verify_password_async,
+)
 from app.database import get_database
 from app.dependencies import get_current_user
 from bson import ObjectId
@@ -10,6 +15,14 @@ from datetime import datetime
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def hasher_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 async def register(user: UserCreate):
     """Register a new user"""
@@ -23,11 +36,16 @@ async def register(user: UserCreate):
             detail="Email already registered"
         )
 
+    try:
+        password_hash = await get_password_hash_async(user.password)
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+
     # Create new user
     user_dict = {
         "email": user.email,
         "name": user.name,
-        "password_hash": get_password_hash(user.password),
+        "password_hash": password_hash,
         "created_at": datetime.utcnow(),
     }
 
@@ -49,7 +67,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # Find user by email (username field contains email)
     user = await db.users.find_one({"email": form_data.username})
 
-    if not user or not verify_password(form_data.password, user["password_hash"]):
+    try:
+        password_ok = user is not None and await verify_password_async(
+            form_data.password, user["password_hash"]
+        )
+    except PasswordHasherBusy:
+        raise hasher_busy_exception()
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
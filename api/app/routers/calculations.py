@@ -1,6 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from app.models import TDEERequest, TDEEResponse, MeasurementCreate, MeasurementOut
-from app.calculations import calculate_tdee, calculate_bmi, get_bmi_category
+from fastapi import APIRouter, HTTPException, Response, status, Depends
+from app.models import (
+    TDEERequest, TDEEResponse, TDEEBatchRequest, TDEEBatchResponse,
+    BMIBatchRequest, BMIBatchResponse, MeasurementCreate, MeasurementOut
+)
+from app.calculations import (
+    calculate_tdee, calculate_bmi, get_bmi_category,
+    calculate_tdee_batch, calculate_bmi_batch, get_bmi_categories
+)
+from app.config import settings
 from app.dependencies import get_current_user
 from app.database import get_database
 from bson import ObjectId
@@ -47,6 +54,55 @@ async def calculate_bmi_endpoint(weight_kg: float, height_cm: float):
     }
 
 
+def batch_columns(batch, fields: tuple[str, ...]) -> dict[str, list]:
+    """One list per field from a rows-or-columns batch request, within the size limit"""
+    if batch.columns is not None:
+        columns = {field: getattr(batch.columns, field) for field in fields}
+    else:
+        columns = {field: [getattr(row, field) for row in batch.rows] for field in fields}
+
+    if len(columns[fields[0]]) > settings.calculation_batch_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.calculation_batch_max_rows} rows per request"
+        )
+    return columns
+
+
+def batch_response(result) -> Response:
+    """Serialize a batch result with pydantic's encoder, several times faster than json for large float lists"""
+    return Response(content=result.model_dump_json(), media_type="application/json")
+
+
+@router.post("/tdee/batch", response_model=TDEEBatchResponse)
+async def calculate_tdee_batch_endpoint(batch: TDEEBatchRequest):
+    """
+    Calculate TDEE and macro recommendations for many people at once.
+
+    Send either `rows` (a list of /tdee request bodies) or `columns` (one
+    list per field). Results come back as one list per field, in input
+    order, with the same values /tdee returns for each row.
+    """
+    columns = batch_columns(batch, ("weight_kg", "height_cm", "age", "sex", "activity_level"))
+    results = calculate_tdee_batch(**columns)
+
+    response = TDEEBatchResponse(
+        count=len(columns["age"]),
+        **{field: values.tolist() for field, values in results.items()}
+    )
+    return batch_response(response)
+
+
+@router.post("/bmi/batch", response_model=BMIBatchResponse)
+async def calculate_bmi_batch_endpoint(batch: BMIBatchRequest):
+    """Calculate BMI and category for many people at once; same layouts as /tdee/batch"""
+    columns = batch_columns(batch, ("weight_kg", "height_cm"))
+    bmi = calculate_bmi_batch(columns["weight_kg"], columns["height_cm"])
+
+    response = BMIBatchResponse(count=len(bmi), bmi=bmi.tolist(), category=get_bmi_categories(bmi))
+    return batch_response(response)
+
+
 @router.post("/tdee/from-profile", response_model=TDEEResponse)
 async def calculate_tdee_from_profile(current_user = Depends(get_current_user)):
     """
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.database import get_database
+from app.dependencies import get_current_user
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+# Export name -> (collection, sort field, CSV columns)
+EXPORT_COLLECTIONS = {
+    "profile": ("profiles", None, [
+        "age", "sex", "height_cm", "current_weight_kg", "target_weight_kg", "activity_level",
+        "fitness_goal", "goal_intensity", "target_calories", "updated_at",
+    ]),
+    "measurements": ("measurements", "measurement_date", [
+        "measurement_date", "weight_kg", "body_fat_pct", "notes", "created_at",
+    ]),
+    "workouts": ("workouts", "workout_date", [
+        "workout_date", "workout_name", "duration_minutes", "exercises", "notes", "created_at",
+    ]),
+    "meals": ("meals", "meal_date", [
+        "meal_date", "meal_type", "total_calories", "total_protein_g", "total_carbs_g", "total_fat_g",
+        "foods", "notes", "created_at",
+    ]),
+}
+
+# Flush output in chunks of roughly this size rather than per document
+WRITE_BUFFER_BYTES = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Unserializable value: {type(value).__name__}")
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_json_default, separators=(",", ":"))
+    return str(value)
+
+
+async def _iter_documents(db, name: str, user_id: str) -> AsyncIterator[dict]:
+    collection, sort_field, _ = EXPORT_COLLECTIONS[name]
+    cursor = db[collection].find({"user_id": user_id}, {"user_id": 0})
+    if sort_field:
+        cursor = cursor.sort([(sort_field, 1), ("_id", 1)])
+    async for document in cursor.batch_size(settings.export_batch_size):
+        yield document
+
+
+async def _ndjson_rows(db, names: list[str], user_id: str) -> AsyncIterator[str]:
+    for name in names:
+        async for document in _iter_documents(db, name, user_id):
+            document["id"] = str(document.pop("_id"))
+            record = {"collection": name, **document}
+            yield json.dumps(record, default=_json_default, separators=(",", ":")) + "\n"
+
+
+async def _csv_rows(db, names: list[str], user_id: str) -> AsyncIterator[str]:
+    """One header + rows section per collection, sections separated by a blank line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    for position, name in enumerate(names):
+        columns = EXPORT_COLLECTIONS[name][2]
+        if position:
+            buffer.write("\r\n")
+        writer.writerow(["collection", "id", *columns])
+        yield take()
+
+        async for document in _iter_documents(db, name, user_id):
+            writer.writerow([name, str(document["_id"]), *(_csv_value(document.get(c)) for c in columns)])
+            yield take()
+
+
+async def _buffered(rows: AsyncIterator[str], compress: bool) -> AsyncIterator[bytes]:
+    """Coalesce rows into larger chunks and optionally gzip them on the fly"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    pending: list[bytes] = []
+    pending_size = 0
+
+    async for row in rows:
+        data = row.encode("utf-8")
+        pending.append(data)
+        pending_size += len(data)
+        if pending_size >= WRITE_BUFFER_BYTES:
+            chunk = b"".join(pending)
+            pending, pending_size = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b"".join(pending)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+@router.get("")
+async def export_account(
+    format: ExportFormat = ExportFormat.NDJSON,
+    collections: Optional[str] = None,
+    gzip: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Stream a full account export as NDJSON or CSV.
+
+    `collections` is a comma-separated subset of profile, measurements,
+    workouts and meals (default: all). Documents are read with bounded
+    cursor batches, so memory stays flat regardless of history size.
+    """
+    names = [n.strip() for n in collections.split(",") if n.strip()] if collections else list(EXPORT_COLLECTIONS)
+    unknown = [n for n in names if n not in EXPORT_COLLECTIONS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown collections: {', '.join(unknown)}. Choose from {', '.join(EXPORT_COLLECTIONS)}"
+        )
+
+    user_id = str(current_user["_id"])
+    if format == ExportFormat.CSV:
+        rows, media_type = _csv_rows(db, names, user_id), "text/csv"
+    else:
+        rows, media_type = _ndjson_rows(db, names, user_id), "application/x-ndjson"
+
+    filename = f"broncofit-export-{datetime.utcnow():%Y%m%d}.{format.value}"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _buffered(rows, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from app.models import MeasurementCreate, MeasurementOut
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from app.bulk import BULK_OPENAPI, bulk_insert
+from app.history_index import history_index
+from app.models import BulkResult, MeasurementCreate, MeasurementOut
 from app.dependencies import get_current_user
 from app.database import get_database
+from app.user_versions import bump_user_version
+from app.pagination import NEXT_CURSOR_HEADER, fetch_page
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
@@ -9,39 +13,72 @@ from typing import List, Optional
 router = APIRouter(prefix="/measurements", tags=["Measurements"])
 
 
-@router.post("", response_model=MeasurementOut, status_code=status.HTTP_201_CREATED)
-async def create_measurement(measurement: MeasurementCreate, current_user = Depends(get_current_user)):
-    """Log a new weight/body measurement"""
-    db = await get_database()
-
+def build_measurement_document(measurement: MeasurementCreate, user_id: str) -> dict:
     measurement_dict = measurement.model_dump(exclude_none=True)
-    measurement_dict["user_id"] = str(current_user["_id"])
+    measurement_dict["user_id"] = user_id
     measurement_dict["created_at"] = datetime.utcnow()
 
     # Use provided date or default to now
     if "measurement_date" not in measurement_dict or measurement_dict["measurement_date"] is None:
         measurement_dict["measurement_date"] = datetime.utcnow()
 
+    return measurement_dict
+
+
+@router.post("", response_model=MeasurementOut, status_code=status.HTTP_201_CREATED)
+async def create_measurement(measurement: MeasurementCreate, current_user = Depends(get_current_user)):
+    """Log a new weight/body measurement"""
+    db = await get_database()
+
+    measurement_dict = build_measurement_document(measurement, str(current_user["_id"]))
+
     result = await db.measurements.insert_one(measurement_dict)
+    version = await bump_user_version(db, measurement_dict["user_id"])
+    history_index.add(measurement_dict["user_id"], "measurement", result.inserted_id, measurement_dict, version)
     measurement_dict["id"] = str(result.inserted_id)
 
     return MeasurementOut(**measurement_dict)
 
 
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_OPENAPI)
+async def create_measurements_bulk(request: Request, current_user = Depends(get_current_user)):
+    """Log many measurements from a JSON array or NDJSON stream; failures are reported per item"""
+    db = await get_database()
+
+    user_id = str(current_user["_id"])
+
+    result = await bulk_insert(
+        request,
+        MeasurementCreate,
+        lambda measurement: build_measurement_document(measurement, user_id),
+        db.measurements,
+    )
+    # A loaded history index is left behind and rebuilt in one read on the next chat
+    await bump_user_version(db, user_id)
+    return result
+
+
 @router.get("", response_model=List[MeasurementOut])
 async def get_measurements(
+    response: Response,
     limit: int = 100,
-    skip: int = 0,
+    skip: int = Query(0, ge=0, deprecated=True),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_user)
 ):
-    """Get measurement history for the current user"""
+    """Get measurement history for the current user (pass the X-Next-Cursor header back as cursor for the next page)"""
     db = await get_database()
 
-    cursor = db.measurements.find(
-        {"user_id": str(current_user["_id"])}
-    ).sort("measurement_date", -1).skip(skip).limit(limit)
-
-    measurements = await cursor.to_list(length=limit)
+    measurements, next_cursor = await fetch_page(
+        db.measurements,
+        {"user_id": str(current_user["_id"])},
+        "measurement_date",
+        limit=limit,
+        skip=skip,
+        cursor=cursor,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
     return [
         MeasurementOut(
@@ -108,4 +145,6 @@ async def delete_measurement(measurement_id: str, current_user = Depends(get_cur
             detail="Measurement not found"
         )
 
+    version = await bump_user_version(db, str(current_user["_id"]))
+    history_index.remove(str(current_user["_id"]), "measurement", obj_id, version)
     return None
@@ -1,12 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import MealCreate, MealOut
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.bulk import BULK_OPENAPI, bulk_insert
+from app.history_index import history_index
+from app.models import BulkResult, MealCreate, MealOut, MealUpdate, NutritionSummaryOut, SummaryBucket
 from app.dependencies import get_current_user
-from app.database import get_database
+from app.database import get_database, naive_utc
+from app.user_versions import bump_user_version
+from app.pagination import NEXT_CURSOR_HEADER, fetch_page
+from app.nutrition_rollup import ROLLUP_FIELDS, read_periods, record_meal_change, rollup_ops
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 router = APIRouter(prefix="/nutrition", tags=["Nutrition"])
 
+# Fields that may not be cleared by a partial update
+REQUIRED_MEAL_FIELDS = ("meal_type", "foods", "meal_date")
+
+
+def compute_meal_totals(foods: list[dict]) -> dict:
+    """Sum the macros of a meal's foods in a single pass"""
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for food in foods:
+        totals["total_calories"] += food["calories"]
+        totals["total_protein_g"] += food.get("protein_g") or 0
+        totals["total_carbs_g"] += food.get("carbs_g") or 0
+        totals["total_fat_g"] += food.get("fat_g") or 0
+    return totals
+
+
+def build_meal_document(meal: MealCreate, user_id: str) -> dict:
+    meal_dict = meal.model_dump()
+    meal_dict["user_id"] = user_id
+    meal_dict["created_at"] = datetime.now()
+    
+    if meal_dict.get("meal_date"):
+        meal_dict["meal_date"] = naive_utc(meal_dict["meal_date"])
+    else:
+        meal_dict["meal_date"] = datetime.now()
+    
+    meal_dict.update(compute_meal_totals(meal_dict["foods"]))
+    return meal_dict
+
 
 @router.post("", response_model=MealOut)
 async def create_meal(
@@ -15,42 +51,64 @@ async def create_meal(
     db=Depends(get_database)
 ):
     """Log a new meal"""
-    meal_dict = meal.model_dump()
-    meal_dict["user_id"] = str(current_user["_id"])
-    meal_dict["created_at"] = datetime.now()
-    
-    if not meal_dict.get("meal_date"):
-        meal_dict["meal_date"] = datetime.now()
-    
-    # Calculate totals
-    total_calories = sum(food["calories"] for food in meal_dict["foods"])
-    total_protein = sum(food.get("protein_g", 0) for food in meal_dict["foods"])
-    total_carbs = sum(food.get("carbs_g", 0) for food in meal_dict["foods"])
-    total_fat = sum(food.get("fat_g", 0) for food in meal_dict["foods"])
-    
-    meal_dict["total_calories"] = total_calories
-    meal_dict["total_protein_g"] = total_protein
-    meal_dict["total_carbs_g"] = total_carbs
-    meal_dict["total_fat_g"] = total_fat
+    meal_dict = build_meal_document(meal, str(current_user["_id"]))
     
     result = await db.meals.insert_one(meal_dict)
+    await record_meal_change(db, meal_dict["user_id"], None, meal_dict)
+    version = await bump_user_version(db, meal_dict["user_id"])
+    history_index.add(meal_dict["user_id"], "meal", result.inserted_id, meal_dict, version)
     meal_dict["id"] = str(result.inserted_id)
     
     return MealOut(**meal_dict)
 
 
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_OPENAPI)
+async def create_meals_bulk(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Log many meals from a JSON array or NDJSON stream; failures are reported per item"""
+    user_id = str(current_user["_id"])
+
+    async def update_rollups(meals: list[dict]):
+        ops = rollup_ops(user_id, ((meal, 1) for meal in meals))
+        if ops:
+            await db.nutrition_daily.bulk_write(ops, ordered=False)
+
+    result = await bulk_insert(
+        request,
+        MealCreate,
+        lambda meal: build_meal_document(meal, user_id),
+        db.meals,
+        on_inserted=update_rollups,
+    )
+    # A loaded history index is left behind and rebuilt in one read on the next chat
+    await bump_user_version(db, user_id)
+    return result
+
+
 @router.get("", response_model=list[MealOut])
 async def get_meals(
+    response: Response,
     limit: int = 30,
-    skip: int = 0,
+    skip: int = Query(0, ge=0, deprecated=True),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db=Depends(get_database)
 ):
-    """Get user's meal history"""
-    meals = await db.meals.find(
-        {"user_id": str(current_user["_id"])}
-    ).sort("meal_date", -1).skip(skip).limit(limit).to_list(limit)
-    
+    """Get user's meal history (pass the X-Next-Cursor header back as cursor for the next page)"""
+    meals, next_cursor = await fetch_page(
+        db.meals,
+        {"user_id": str(current_user["_id"])},
+        "meal_date",
+        limit=limit,
+        skip=skip,
+        cursor=cursor,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
     for meal in meals:
         meal["id"] = str(meal.pop("_id"))
     
@@ -83,27 +141,48 @@ async def get_todays_nutrition_summary(
 ):
     """Get nutrition summary for today"""
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    meals = await db.meals.find({
-        "user_id": str(current_user["_id"]),
-        "meal_date": {"$gte": today_start}
-    }).to_list(100)
-    
-    total_calories = sum(m.get("total_calories", 0) for m in meals)
-    total_protein = sum(m.get("total_protein_g", 0) for m in meals)
-    total_carbs = sum(m.get("total_carbs_g", 0) for m in meals)
-    total_fat = sum(m.get("total_fat_g", 0) for m in meals)
-    
+
+    totals = await db.nutrition_daily.find_one(
+        {"user_id": str(current_user["_id"]), "day": today_start}
+    ) or {}
+
     return {
         "date": today_start,
-        "total_calories": total_calories,
-        "total_protein_g": total_protein,
-        "total_carbs_g": total_carbs,
-        "total_fat_g": total_fat,
-        "meals_logged": len(meals)
+        "total_calories": totals.get("total_calories", 0),
+        "total_protein_g": totals.get("total_protein_g", 0),
+        "total_carbs_g": totals.get("total_carbs_g", 0),
+        "total_fat_g": totals.get("total_fat_g", 0),
+        "meals_logged": totals.get("meals_logged", 0)
     }
 
 
+@router.get("/summary", response_model=NutritionSummaryOut)
+async def get_nutrition_summary(
+    from_date: datetime = Query(..., alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    bucket: SummaryBucket = SummaryBucket.DAY,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Get macro totals per day, week (starting Monday) or month in [from, to).
+    `to` is exclusive and defaults to now. Served from the daily rollups.
+    """
+    from_date = naive_utc(from_date)
+    to_date = naive_utc(to_date) if to_date else datetime.now()
+    if to_date <= from_date:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+
+    periods = await read_periods(db, str(current_user["_id"]), from_date, to_date, bucket.value)
+
+    return NutritionSummaryOut(
+        from_date=from_date,
+        to_date=to_date,
+        bucket=bucket,
+        periods=periods
+    )
+
+
 @router.get("/{meal_id}", response_model=MealOut)
 async def get_meal(
     meal_id: str,
@@ -135,30 +214,87 @@ async def update_meal(
 ):
     """Update a meal"""
     meal_dict = meal_update.model_dump()
+    if meal_dict["meal_date"] is None:
+        del meal_dict["meal_date"]  # keep the logged date
+    else:
+        meal_dict["meal_date"] = naive_utc(meal_dict["meal_date"])
     
-    # Recalculate totals
-    total_calories = sum(food["calories"] for food in meal_dict["foods"])
-    total_protein = sum(food.get("protein_g", 0) for food in meal_dict["foods"])
-    total_carbs = sum(food.get("carbs_g", 0) for food in meal_dict["foods"])
-    total_fat = sum(food.get("fat_g", 0) for food in meal_dict["foods"])
+    meal_dict.update(compute_meal_totals(meal_dict["foods"]))
     
-    meal_dict["total_calories"] = total_calories
-    meal_dict["total_protein_g"] = total_protein
-    meal_dict["total_carbs_g"] = total_carbs
-    meal_dict["total_fat_g"] = total_fat
+    return await _update_meal(meal_id, {"$set": meal_dict}, current_user, db)
+
+
+@router.patch("/{meal_id}", response_model=MealOut)
+async def patch_meal(
+    meal_id: str,
+    meal_patch: MealUpdate,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """
+    Update only the fields present in the request. `add_foods` appends
+    foods and adjusts the stored totals with $inc instead of rewriting them.
+    """
+    changes = meal_patch.model_dump(exclude_unset=True)
+    add_foods = changes.pop("add_foods", None)
+    for field in REQUIRED_MEAL_FIELDS:
+        if field in changes and changes[field] is None:
+            del changes[field]
     
-    try:
-        result = await db.meals.update_one(
-            {"_id": ObjectId(meal_id), "user_id": str(current_user["_id"])},
-            {"$set": meal_dict}
-        )
-    except:
+    if "meal_date" in changes:
+        changes["meal_date"] = naive_utc(changes["meal_date"])
+    
+    if add_foods and "foods" in changes:
+        raise HTTPException(status_code=400, detail="Use either foods or add_foods, not both")
+    
+    update = {}
+    if "foods" in changes:
+        changes.update(compute_meal_totals(changes["foods"]))
+    if changes:
+        update["$set"] = changes
+    if add_foods:
+        update["$push"] = {"foods": {"$each": add_foods}}
+        update["$inc"] = compute_meal_totals(add_foods)
+    
+    if not update:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    return await _update_meal(meal_id, update, current_user, db)
+
+
+def _apply_update(meal: dict, update: dict) -> dict:
+    """Compute the post-image of a meal for the $set/$push/$inc update we issue"""
+    after = {**meal, **update.get("$set", {})}
+    if "$push" in update:
+        after["foods"] = list(meal.get("foods", [])) + update["$push"]["foods"]["$each"]
+    for field, delta in update.get("$inc", {}).items():
+        after[field] = (meal.get(field) or 0) + delta
+    return after
+
+
+async def _update_meal(meal_id: str, update: dict, current_user: dict, db) -> MealOut:
+    if not ObjectId.is_valid(meal_id):
         raise HTTPException(status_code=400, detail="Invalid meal ID")
     
-    if result.matched_count == 0:
+    user_id = str(current_user["_id"])
+    # The pre-image is needed to move the old totals out of their day's
+    # rollup; the post-image is derived from it instead of re-reading
+    before = await db.meals.find_one_and_update(
+        {"_id": ObjectId(meal_id), "user_id": user_id},
+        update,
+        return_document=ReturnDocument.BEFORE
+    )
+    
+    if before is None:
         raise HTTPException(status_code=404, detail="Meal not found")
     
-    return await get_meal(meal_id, current_user, db)
+    after = _apply_update(before, update)
+    await record_meal_change(db, user_id, before, after)
+    version = await bump_user_version(db, user_id)
+    history_index.add(user_id, "meal", after["_id"], after, version)
+    
+    after["id"] = str(after.pop("_id"))
+    return MealOut(**after)
 
 
 @router.delete("/{meal_id}")
@@ -168,15 +304,19 @@ async def delete_meal(
     db=Depends(get_database)
 ):
     """Delete a meal"""
-    try:
-        result = await db.meals.delete_one({
-            "_id": ObjectId(meal_id),
-            "user_id": str(current_user["_id"])
-        })
-    except:
+    if not ObjectId.is_valid(meal_id):
         raise HTTPException(status_code=400, detail="Invalid meal ID")
     
-    if result.deleted_count == 0:
+    meal = await db.meals.find_one_and_delete({
+        "_id": ObjectId(meal_id),
+        "user_id": str(current_user["_id"])
+    })
+    
+    if meal is None:
         raise HTTPException(status_code=404, detail="Meal not found")
     
+    await record_meal_change(db, str(current_user["_id"]), meal, None)
+    version = await bump_user_version(db, str(current_user["_id"]))
+    history_index.remove(str(current_user["_id"]), "meal", meal["_id"], version)
+    
     return {"message": "Meal deleted successfully"}
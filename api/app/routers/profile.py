@@ -3,7 +3,9 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from app.models import ProfileCreate, ProfileUpdate, ProfileOut
 from app.dependencies import get_current_user
 from app.database import get_database
+from app.user_versions import bump_user_version
 from datetime import datetime
+from pymongo import ReturnDocument
 from zoneinfo import ZoneInfo
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
@@ -54,6 +56,7 @@ async def create_profile(profile: ProfileCreate, current_user = Depends(get_curr
     profile_dict["updated_at"] = datetime.utcnow()
 
     await db.profiles.insert_one(profile_dict)
+    await bump_user_version(db, profile_dict["user_id"])
 
     return ProfileOut(**profile_dict)
 
@@ -61,26 +64,40 @@ async def create_profile(profile: ProfileCreate, current_user = Depends(get_curr
 @router.put("", response_model=ProfileOut)
 async def update_profile(profile: ProfileUpdate, current_user = Depends(get_current_user)):
     """Update user profile"""
-    db = await get_database()
+    update_data = profile.model_dump(exclude_none=True)
+    return await _update_profile(update_data, current_user)
 
-    existing_profile = await db.profiles.find_one({"user_id": str(current_user["_id"])})
 
-    if not existing_profile:
+@router.patch("", response_model=ProfileOut)
+async def patch_profile(profile: ProfileUpdate, current_user = Depends(get_current_user)):
+    """Update only the fields present in the request; explicit nulls clear a field"""
+    update_data = profile.model_dump(exclude_unset=True)
+    if not update_data:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found. Please create a profile first."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
         )
+    return await _update_profile(update_data, current_user)
+
+
+async def _update_profile(update_data: dict, current_user) -> ProfileOut:
+    db = await get_database()
 
-    update_data = profile.model_dump(exclude_none=True)
     update_data["updated_at"] = datetime.utcnow()
 
-    await db.profiles.update_one(
+    updated_profile = await db.profiles.find_one_and_update(
         {"user_id": str(current_user["_id"])},
-        {"$set": update_data}
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
     )
 
-    updated_profile = await db.profiles.find_one({"user_id": str(current_user["_id"])})
+    if not updated_profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found. Please create a profile first."
+        )
 
+    await bump_user_version(db, updated_profile["user_id"])
     return ProfileOut(
         user_id=updated_profile["user_id"],
         age=updated_profile.get("age"),
@@ -109,4 +126,5 @@ async def delete_profile(current_user = Depends(get_current_user)):
             detail="Profile not found"
         )
 
+    await bump_user_version(db, str(current_user["_id"]))
     return None
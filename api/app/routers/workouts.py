@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import WorkoutCreate, WorkoutOut
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.bulk import BULK_OPENAPI, bulk_insert
+from app.history_index import history_index
+from app.models import BulkResult, WorkoutCreate, WorkoutOut, WorkoutUpdate
 from app.dependencies import get_current_user
 from app.database import get_database
+from app.user_versions import bump_user_version
+from app.pagination import NEXT_CURSOR_HEADER, fetch_page
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 router = APIRouter(prefix="/workouts", tags=["Workouts"])
 
+# Fields that may not be cleared by a partial update
+REQUIRED_WORKOUT_FIELDS = ("workout_name", "exercises", "workout_date")
+
+
+def build_workout_document(workout: WorkoutCreate, user_id: str) -> dict:
+    workout_dict = workout.model_dump()
+    workout_dict["user_id"] = user_id
+    workout_dict["created_at"] = datetime.now()
+    
+    if not workout_dict.get("workout_date"):
+        workout_dict["workout_date"] = datetime.now()
+    
+    return workout_dict
+
 
 @router.post("", response_model=WorkoutOut)
 async def create_workout(
@@ -15,31 +36,57 @@ async def create_workout(
     db=Depends(get_database)
 ):
     """Log a new workout"""
-    workout_dict = workout.model_dump()
-    workout_dict["user_id"] = str(current_user["_id"])
-    workout_dict["created_at"] = datetime.now()
-    
-    if not workout_dict.get("workout_date"):
-        workout_dict["workout_date"] = datetime.now()
+    workout_dict = build_workout_document(workout, str(current_user["_id"]))
     
     result = await db.workouts.insert_one(workout_dict)
+    version = await bump_user_version(db, workout_dict["user_id"])
+    history_index.add(workout_dict["user_id"], "workout", result.inserted_id, workout_dict, version)
     workout_dict["id"] = str(result.inserted_id)
     
     return WorkoutOut(**workout_dict)
 
 
+@router.post("/bulk", response_model=BulkResult, openapi_extra=BULK_OPENAPI)
+async def create_workouts_bulk(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Log many workouts from a JSON array or NDJSON stream; failures are reported per item"""
+    user_id = str(current_user["_id"])
+
+    result = await bulk_insert(
+        request,
+        WorkoutCreate,
+        lambda workout: build_workout_document(workout, user_id),
+        db.workouts,
+    )
+    # A loaded history index is left behind and rebuilt in one read on the next chat
+    await bump_user_version(db, user_id)
+    return result
+
+
 @router.get("", response_model=list[WorkoutOut])
 async def get_workouts(
+    response: Response,
     limit: int = 30,
-    skip: int = 0,
+    skip: int = Query(0, ge=0, deprecated=True),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db=Depends(get_database)
 ):
-    """Get user's workout history"""
-    workouts = await db.workouts.find(
-        {"user_id": str(current_user["_id"])}
-    ).sort("workout_date", -1).skip(skip).limit(limit).to_list(limit)
-    
+    """Get user's workout history (pass the X-Next-Cursor header back as cursor for the next page)"""
+    workouts, next_cursor = await fetch_page(
+        db.workouts,
+        {"user_id": str(current_user["_id"])},
+        "workout_date",
+        limit=limit,
+        skip=skip,
+        cursor=cursor,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
     for workout in workouts:
         workout["id"] = str(workout.pop("_id"))
     
@@ -94,18 +141,49 @@ async def update_workout(
     db=Depends(get_database)
 ):
     """Update a workout"""
-    try:
-        result = await db.workouts.update_one(
-            {"_id": ObjectId(workout_id), "user_id": str(current_user["_id"])},
-            {"$set": workout_update.model_dump()}
-        )
-    except:
+    workout_dict = workout_update.model_dump()
+    if workout_dict["workout_date"] is None:
+        del workout_dict["workout_date"]  # keep the logged date
+    
+    return await _update_workout(workout_id, workout_dict, current_user, db)
+
+
+@router.patch("/{workout_id}", response_model=WorkoutOut)
+async def patch_workout(
+    workout_id: str,
+    workout_patch: WorkoutUpdate,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_database)
+):
+    """Update only the fields present in the request"""
+    changes = workout_patch.model_dump(exclude_unset=True)
+    for field in REQUIRED_WORKOUT_FIELDS:
+        if field in changes and changes[field] is None:
+            del changes[field]
+    
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    return await _update_workout(workout_id, changes, current_user, db)
+
+
+async def _update_workout(workout_id: str, changes: dict, current_user: dict, db) -> WorkoutOut:
+    if not ObjectId.is_valid(workout_id):
         raise HTTPException(status_code=400, detail="Invalid workout ID")
     
-    if result.matched_count == 0:
+    workout = await db.workouts.find_one_and_update(
+        {"_id": ObjectId(workout_id), "user_id": str(current_user["_id"])},
+        {"$set": changes},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if workout is None:
         raise HTTPException(status_code=404, detail="Workout not found")
     
-    return await get_workout(workout_id, current_user, db)
+    version = await bump_user_version(db, workout["user_id"])
+    history_index.add(workout["user_id"], "workout", workout["_id"], workout, version)
+    workout["id"] = str(workout.pop("_id"))
+    return WorkoutOut(**workout)
 
 
 @router.delete("/{workout_id}")
@@ -126,4 +204,6 @@ async def delete_workout(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Workout not found")
     
+    version = await bump_user_version(db, str(current_user["_id"]))
+    history_index.remove(str(current_user["_id"]), "workout", workout_id, version)
     return {"message": "Workout deleted successfully"}
@@ -0,0 +1,26 @@
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+# Keep proxies (nginx, Vercel) from buffering or caching the stream
+EVENT_STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+def event_stream(events: AsyncIterator[str], background: Optional[BackgroundTask] = None) -> StreamingResponse:
+    """Wrap formatted SSE events in a text/event-stream response"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers=EVENT_STREAM_HEADERS,
+        background=background,
+    )
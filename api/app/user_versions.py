@@ -0,0 +1,29 @@
+"""
+Per-user data versions shared by every worker
+
+The coach context and the history index are cached in process memory, but
+the API runs as several worker processes. A write handled by one worker
+cannot reach the caches of the others, so each write to a user's profile,
+measurements, workouts or meals bumps that user's counter in the
+``user_versions`` collection. Cached entries remember the version they
+were built from and are reused only while it is still current; checking
+costs one ``_id`` lookup.
+"""
+from pymongo import ReturnDocument
+
+
+async def bump_user_version(db, user_id: str) -> int:
+    """Mark the user's data as changed; call after a successful write. Returns the new version"""
+    document = await db.user_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["version"]
+
+
+async def read_user_version(db, user_id: str) -> int:
+    """The user's current data version; 0 if they have never written"""
+    document = await db.user_versions.find_one({"_id": user_id}, {"version": 1})
+    return document["version"] if document else 0
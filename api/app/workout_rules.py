@@ -0,0 +1,345 @@
+"""
+Rule-based workout suggestions
+
+Most suggest-workout requests just name a body region or muscle group, a
+length and some equipment ("30 min upper body, dumbbells", "push day").
+Those are classified here and answered from the exercise catalog with a
+fixed template, without a model call. Anything the rules cannot read
+confidently (injuries, sports, plans, questions, negations, a length they
+cannot parse, or too few matching exercises) returns None so the request
+falls through to the LLM.
+"""
+import re
+from typing import NamedTuple, Optional
+
+from app.exercise_catalog import DIFFICULTY_ORDER, EXERCISES, MUSCLE_REGIONS, Exercise
+from app.metrics import registry
+from app.models import WorkoutCreate, WorkoutExercise
+
+FOCUS_WORDS = {
+    "upper": ("upper", "chest", "shoulder", "arm", "bicep", "tricep", "push", "pull"),
+    "lower": ("lower", "leg", "glute", "hamstring", "quad", "calf", "calves"),
+    "core": ("core", "abs", "plank"),
+    "cardio": ("cardio", "run", "hiit", "conditioning", "endurance"),
+    "flexibility": ("stretch", "yoga", "mobility", "flexib"),
+    "full_body": ("full body", "full-body", "total body", "whole body"),
+}
+
+# Words naming part of a region -> the catalog muscle groups it means. An
+# exercise matches when its main (first-listed) muscle group is named, unless
+# the request also names the whole region ("upper body", "legs")
+PUSH_MUSCLES = ("chest", "upper chest", "shoulders", "front delts", "side delts", "triceps")
+PULL_MUSCLES = ("back", "lats", "upper back", "rear delts", "biceps", "forearms")
+TARGET_WORDS = {
+    ("chest", "pec"): ("chest", "upper chest"),
+    ("shoulder", "delt"): ("shoulders", "front delts", "side delts", "rear delts"),
+    ("back", "lats"): ("back", "lats", "upper back"),
+    ("arm",): ("biceps", "triceps", "forearms"),
+    ("bicep",): ("biceps",),
+    ("tricep",): ("triceps",),
+    ("push",): PUSH_MUSCLES,
+    ("pull",): PULL_MUSCLES,
+    ("glute",): ("glutes",),
+    ("hamstring",): ("hamstrings",),
+    ("quad",): ("quads",),
+    ("calf", "calves"): ("calves",),
+}
+WHOLE_REGION_WORDS = {
+    "upper": ("upper",),
+    "lower": ("lower", "leg"),
+}
+
+FOCUS_LABELS = {
+    "upper": "Upper Body",
+    "lower": "Lower Body",
+    "core": "Core",
+    "cardio": "Cardio",
+    "full_body": "Full Body",
+}
+
+EQUIPMENT_WORDS = {
+    "dumbbells": ("dumbbell",),
+    "barbell": ("barbell",),
+    "kettlebell": ("kettlebell",),
+    "cable": ("cable",),
+    "machine": ("machine",),
+    "bike": ("bike", "cycling"),
+    "rowing machine": ("rower", "rowing"),
+    "jump rope": ("jump rope", "skipping"),
+    "box": ("box jump", "plyo box"),
+}
+BODYWEIGHT_WORDS = ("no equipment", "bodyweight", "body weight", "at home", "hotel")
+ALWAYS_AVAILABLE = frozenset({"bodyweight", "none"})
+DEFAULT_EQUIPMENT = ALWAYS_AVAILABLE | {"dumbbells"}
+GYM_EQUIPMENT = frozenset(exercise.equipment for exercise in EXERCISES)
+
+# Requests mentioning any of these need judgement, so they go to the model
+ESCALATION_PATTERN = re.compile(
+    r"\?|\b(?:injur|pain|hurt|rehab|recover|surgery|pregnan|medical"
+    r"|sport|marathon|race|tennis|soccer|basketball|football|swim"
+    r"|plans?\b|program|week|month|why|how|explain"
+    r"|without|except|instead|avoid|(?:no|not|don't|can't|never)\b)"
+)
+MAX_WORDS = 30
+
+DIFFICULTY_WORDS = {
+    "beginner": ("beginner", "easy", "light", "gentle"),
+    "intermediate": ("intermediate", "moderate"),
+    "advanced": ("advanced", "hard", "intense", "challenging"),
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30,
+    "forty": 40, "forty five": 45, "fifty": 50, "sixty": 60, "ninety": 90,
+}
+DURATION_UNITS = r"(min|mins|minute|minutes|hr|hrs|hour|hours)\b"
+DURATION_PATTERN = re.compile(
+    r"\b(\d{1,3}|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")\s*-?\s*" + DURATION_UNITS
+)
+# Halves are read before the number pattern, which would take "an hour"
+HALF_HOUR_PHRASES = (
+    (re.compile(r"\bhour and a half\b"), 90),
+    (re.compile(r"\bhalf (?:an? )?hour\b"), 30),
+)
+BARE_HOUR_PATTERN = re.compile(r"\bhour\b")  # "hour long", "hour session"
+DURATION_UNIT_PATTERN = re.compile(r"\b" + DURATION_UNITS)
+DEFAULT_DURATION = 45
+MIN_EXERCISES = 4
+MIN_CARDIO_EXERCISES = 2  # a cardio session can be a couple of long blocks
+MAX_EXERCISES = 8
+
+# (sets, reps) per profile fitness goal
+PRESCRIPTIONS = {
+    "gain_muscle": (4, 8),
+    "lose_weight": (3, 12),
+    "improve_fitness": (3, 12),
+    "maintain": (3, 10),
+}
+HOLD_EXERCISES = {"Plank"}
+
+
+def word_pattern(words: tuple[str, ...]) -> re.Pattern:
+    """Matches any of words at the start of a word ("arm" in "arms", not in "warm")"""
+    return re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + ")")
+
+
+FOCUS_PATTERNS = {name: word_pattern(words) for name, words in FOCUS_WORDS.items()}
+EQUIPMENT_PATTERNS = {name: word_pattern(words) for name, words in EQUIPMENT_WORDS.items()}
+BODYWEIGHT_PATTERN = word_pattern(BODYWEIGHT_WORDS)
+DIFFICULTY_PATTERNS = {level: word_pattern(words) for level, words in DIFFICULTY_WORDS.items()}
+TARGET_PATTERNS = [(word_pattern(words), muscles) for words, muscles in TARGET_WORDS.items()]
+WHOLE_REGION_PATTERNS = {region: word_pattern(words) for region, words in WHOLE_REGION_WORDS.items()}
+
+
+class WorkoutIntent(NamedTuple):
+    focus: tuple[str, ...]
+    equipment: frozenset
+    duration_minutes: int
+    difficulty: str
+    targets: frozenset = frozenset()  # muscle groups named; empty means whole regions
+
+
+def detect_focus(text: str) -> tuple[str, ...]:
+    """Body regions a request names, sorted; upper plus lower means full body"""
+    text = text.lower()
+    focus = {name for name, pattern in FOCUS_PATTERNS.items() if pattern.search(text)}
+    if {"upper", "lower"} <= focus:
+        focus = (focus - {"upper", "lower"}) | {"full_body"}
+    return tuple(sorted(focus))
+
+
+def detect_targets(text: str) -> frozenset:
+    """Muscle groups a request singles out, except in regions it names as a whole"""
+    whole = {region for region, pattern in WHOLE_REGION_PATTERNS.items() if pattern.search(text)}
+    targets = set()
+    for pattern, muscles in TARGET_PATTERNS:
+        if pattern.search(text):
+            targets.update(muscle for muscle in muscles if MUSCLE_REGIONS[muscle] not in whole)
+    return frozenset(targets)
+
+
+def detect_duration(text: str) -> Optional[int]:
+    """Session length in minutes; None when a length is mentioned but cannot be read"""
+    text = re.sub(r"(?<=[a-z])-(?=[a-z])", " ", text)
+    minutes = next((length for pattern, length in HALF_HOUR_PHRASES if pattern.search(text)), None)
+    match = DURATION_PATTERN.search(text) if minutes is None else None
+    if match is not None:
+        amount = match.group(1)
+        minutes = int(amount) if amount.isdigit() else NUMBER_WORDS[amount]
+        minutes *= 60 if match.group(2).startswith("h") else 1
+    elif minutes is None:
+        if BARE_HOUR_PATTERN.search(text):
+            minutes = 60
+        elif DURATION_UNIT_PATTERN.search(text):
+            return None
+        else:
+            return DEFAULT_DURATION
+    return min(max(minutes, 15), 120)
+
+
+def detect_equipment(text: str) -> frozenset:
+    named = {name for name, pattern in EQUIPMENT_PATTERNS.items() if pattern.search(text)}
+    if re.search(r"\bgym\b", text):
+        return GYM_EQUIPMENT
+    if named:
+        return ALWAYS_AVAILABLE | named
+    if BODYWEIGHT_PATTERN.search(text):
+        return ALWAYS_AVAILABLE
+    return DEFAULT_EQUIPMENT
+
+
+def classify_request(message: str) -> Optional[WorkoutIntent]:
+    """Read a suggest-workout request, or None when the rules should not answer it"""
+    text = " ".join(message.lower().split())
+    if not text or len(text.split()) > MAX_WORDS:
+        return None
+
+    if ESCALATION_PATTERN.search(text.replace("no equipment", "")):
+        return None
+
+    focus = detect_focus(text)
+    # Stretching and mobility are not in the catalog
+    if not focus or "flexibility" in focus:
+        return None
+
+    duration = detect_duration(text)
+    if duration is None:
+        return None
+
+    difficulty = next(
+        (level for level, pattern in DIFFICULTY_PATTERNS.items() if pattern.search(text)),
+        "beginner",
+    )
+    return WorkoutIntent(focus, detect_equipment(text), duration, difficulty, detect_targets(text))
+
+
+def _candidates(region: str, intent: WorkoutIntent) -> list[Exercise]:
+    """Matching exercises, compound movements and harder variations first"""
+    level = DIFFICULTY_ORDER.index(intent.difficulty)
+    if region == "cardio":
+        matches = [e for e in EXERCISES if e.category == "cardio"]
+    else:
+        matches = [e for e in EXERCISES if e.category == "strength" and e.primary_region == region]
+        targets = {muscle for muscle in intent.targets if MUSCLE_REGIONS[muscle] == region}
+        if targets:
+            matches = [e for e in matches if e.muscle_groups[0] in targets]
+    matches = [e for e in matches if e.equipment in intent.equipment and e.level <= level]
+    return sorted(matches, key=lambda e: (-len(e.muscle_groups), -e.level))
+
+
+def select_exercises(intent: WorkoutIntent, count: int) -> list[Exercise]:
+    """Round-robin over the focus regions, spreading picks across muscle groups"""
+    regions = []
+    for region in intent.focus:
+        regions.extend(("lower", "upper", "core") if region == "full_body" else (region,))
+    queues = [_candidates(region, intent) for region in regions]
+
+    chosen: list[Exercise] = []
+    trained: set[str] = set()
+    while len(chosen) < count and any(queues):
+        for queue in queues:
+            if not queue or len(chosen) == count:
+                continue
+            pick = next((e for e in queue if e.muscle_groups[0] not in trained), queue[0])
+            queue.remove(pick)
+            chosen.append(pick)
+            trained.add(pick.muscle_groups[0])
+    return chosen
+
+
+def prescribe(exercise: Exercise, cardio_minutes: int, fitness_goal: Optional[str]) -> WorkoutExercise:
+    if exercise.category == "cardio":
+        return WorkoutExercise(
+            exercise_name=exercise.name,
+            exercise_type="cardio",
+            duration_minutes=cardio_minutes,
+            notes=exercise.note,
+        )
+
+    sets, reps = PRESCRIPTIONS.get(fitness_goal, PRESCRIPTIONS["maintain"])
+    if exercise.name in HOLD_EXERCISES:
+        return WorkoutExercise(
+            exercise_name=exercise.name,
+            exercise_type="strength",
+            sets=sets,
+            notes=f"Hold 30-45 seconds. {exercise.note}",
+        )
+    return WorkoutExercise(
+        exercise_name=exercise.name,
+        exercise_type="strength",
+        sets=sets,
+        reps=reps,
+        notes=exercise.note,
+    )
+
+
+def generate_workout(intent: WorkoutIntent, fitness_goal: Optional[str] = None) -> Optional[dict]:
+    """
+    Build a WorkoutCreate-shaped workout (plus a description) for the intent,
+    or None if the catalog has too few matching exercises
+    """
+    # About 7 minutes per exercise after a short warm-up
+    count = min(max((intent.duration_minutes - 10) // 7, MIN_EXERCISES), MAX_EXERCISES)
+    exercises = select_exercises(intent, count)
+    if len(exercises) < (MIN_CARDIO_EXERCISES if intent.focus == ("cardio",) else MIN_EXERCISES):
+        return None
+
+    cardio = [e for e in exercises if e.category == "cardio"]
+    if len(cardio) == len(exercises):
+        cardio_minutes = max((intent.duration_minutes - 5) // len(cardio), 5)
+    else:
+        cardio_minutes = 10
+
+    label = " + ".join(FOCUS_LABELS[region] for region in intent.focus)
+    equipment = sorted({exercise.equipment for exercise in exercises} - ALWAYS_AVAILABLE)
+    workout = {
+        "workout_name": f"{intent.duration_minutes}-Minute {label} Workout",
+        "description": (
+            f"A {intent.difficulty} {label.lower()} session using "
+            f"{', '.join(equipment) if equipment else 'bodyweight only'}."
+        ),
+        "exercises": [
+            prescribe(exercise, cardio_minutes, fitness_goal).model_dump(mode="json") for exercise in exercises
+        ],
+        "duration_minutes": intent.duration_minutes,
+        "notes": "Warm up for 5 minutes first and rest 60-90 seconds between sets.",
+    }
+    WorkoutCreate(**workout)  # the result must be saveable as-is
+    return workout
+
+
+def suggest_from_rules(message: str, fitness_goal: Optional[str] = None) -> Optional[dict]:
+    """A suggest-workout response built without the model, or None to fall through"""
+    intent = classify_request(message)
+    if intent is None:
+        return None
+
+    workout = generate_workout(intent, fitness_goal)
+    if workout is None:
+        return None
+
+    return {
+        "success": True,
+        "workout": workout,
+        "message": "Here's a workout I've created for you! You can review it and save it directly to your workout log.",
+        "source": "rules",
+    }
+
+
+# Which path served each suggest-workout request: rules, model or last_good
+suggestion_paths: dict[str, int] = {}
+
+
+def record_suggestion_path(source: str) -> None:
+    suggestion_paths[source] = suggestion_paths.get(source, 0) + 1
+
+
+def suggestion_path_stats() -> dict:
+    served = sum(suggestion_paths.values())
+    return {
+        "served": dict(suggestion_paths),
+        "rules_ratio": round(suggestion_paths.get("rules", 0) / served, 4) if served else 0.0,
+    }
+
+
+registry.register("suggest_paths", suggestion_path_stats)
@@ -0,0 +1,171 @@
+"""
+AI coach load benchmark
+
+Drives an AI coach endpoint in-process against the offline stub LLM
+backend, so capacity can be planned without calling Gemini. The stub's
+latency profile, streaming cadence and error rate come from the flags
+below (or the matching LLM_STUB_* settings); MongoDB is faked.
+
+    cd api
+    python -m benchmarks.ai_coach_load --endpoint chat --requests 500 --concurrency 100
+    python -m benchmarks.ai_coach_load --endpoint chat-stream --latency-ms 600 --chunk-interval-ms 30
+    python -m benchmarks.ai_coach_load --endpoint suggest --error-rate 0.05 --users 20
+
+Latency is measured per request from send to full response; for
+chat-stream the server-reported time to first chunk is also summarised.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+ENDPOINTS = {
+    "chat": ("/api/ai-coach/chat", {"message": "How do I improve my squat?"}),
+    "chat-stream": ("/api/ai-coach/chat/stream", {"message": "How do I improve my squat?"}),
+    "suggest": ("/api/ai-coach/suggest-workout", {"message": "Give me a 45 minute full body workout"}),
+    "plan": ("/api/ai-coach/generate-workout-plan", {
+        "goal": "gain_muscle", "experience_level": "beginner", "days_per_week": 3,
+        "equipment_available": ["dumbbells"], "duration_per_session": 45,
+    }),
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fake_database():
+    from bson import ObjectId
+
+    database = MagicMock()
+    database.profiles.find_one = AsyncMock(return_value={"age": 25, "sex": "male", "activity_level": "moderate"})
+    database.measurements.find_one = AsyncMock(return_value=None)
+    for collection in (database.workouts, database.meals, database.measurements):
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+    database.ai_conversations.insert_one = AsyncMock(
+        side_effect=lambda doc: SimpleNamespace(inserted_id=ObjectId())
+    )
+    database.ai_conversations.find_one_and_update = AsyncMock(return_value=None)
+    database.ai_conversations.find_one = AsyncMock(return_value=None)
+    database.ai_plan_cache.find_one = AsyncMock(return_value=None)
+    database.ai_plan_cache.replace_one = AsyncMock()
+    return database
+
+
+async def run(endpoint: str, requests: int, concurrency: int, users: int) -> dict:
+    import httpx
+    from fastapi import Request
+
+    from app.database import get_database
+    from app.dependencies import get_current_user
+    from app.main import app
+
+    def bench_user(request: Request) -> dict:
+        return {"_id": request.headers["x-bench-user"]}
+
+    database = fake_database()
+    app.dependency_overrides[get_database] = lambda: database
+    app.dependency_overrides[get_current_user] = bench_user
+
+    path, body = ENDPOINTS[endpoint]
+    semaphore = asyncio.Semaphore(concurrency)
+    status_counts: dict[int, int] = {}
+    latencies: list[float] = []
+    first_chunk_ms: list[float] = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(index: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(path, json=body, headers={"x-bench-user": f"user-{index % users}"})
+                latencies.append((time.perf_counter() - started) * 1000)
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+                if endpoint == "chat-stream" and response.status_code == 200:
+                    for block in response.text.strip().split("\n\n"):
+                        if block.startswith("event: done"):
+                            data = json.loads(block.split("data: ", 1)[1])
+                            first_chunk_ms.append(data["timing"]["first_chunk_ms"])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    app.dependency_overrides.clear()
+    result = {
+        "elapsed_s": elapsed,
+        "requests_per_s": requests / elapsed,
+        "statuses": status_counts,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+    }
+    if first_chunk_ms:
+        result["first_chunk_p50_ms"] = statistics.median(first_chunk_ms)
+        result["first_chunk_p99_ms"] = percentile(first_chunk_ms, 99)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="chat")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000, help="distinct callers, for per-user limits")
+    parser.add_argument("--latency-ms", type=float, help="median stub latency to first chunk")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--spread", type=float)
+    parser.add_argument("--chunk-interval-ms", type=float)
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+    os.environ["LLM_PROVIDER"] = "stub"
+    overrides = {
+        "LLM_STUB_LATENCY_MS": args.latency_ms,
+        "LLM_STUB_LATENCY_DISTRIBUTION": args.distribution,
+        "LLM_STUB_LATENCY_SPREAD": args.spread,
+        "LLM_STUB_CHUNK_INTERVAL_MS": args.chunk_interval_ms,
+        "LLM_STUB_ERROR_RATE": args.error_rate,
+        "LLM_STUB_SEED": args.seed,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name] = str(value)
+
+    from app.plan_cache import PlanCache
+
+    # Measure generation, not the plan cache
+    with patch("app.plan_jobs.plan_cache", PlanCache(0, 0, 0)):
+        result = asyncio.run(run(args.endpoint, args.requests, args.concurrency, args.users))
+
+    from app.ai_coach import coach_limiter, llm, model_tiers
+
+    print(f"endpoint:        {args.endpoint} (stub: {llm.distribution} median {llm.latency_ms:.0f} ms, "
+          f"error rate {llm.error_rate:.0%})")
+    print(f"requests:        {args.requests} in {result['elapsed_s']:.2f}s ({result['requests_per_s']:.1f}/s)")
+    print(f"concurrency:     {args.concurrency} clients, AI limit {coach_limiter.max_concurrent}")
+    print(f"statuses:        {result['statuses']}")
+    print("tier calls:      " + ", ".join(
+        f"{name} {tier.stats()['calls']}" for name, tier in model_tiers.items()
+    ))
+    print(f"latency p50:     {result['p50_ms']:.1f} ms")
+    print(f"latency p95:     {result['p95_ms']:.1f} ms")
+    print(f"latency p99:     {result['p99_ms']:.1f} ms")
+    print(f"latency max:     {result['max_ms']:.1f} ms")
+    if "first_chunk_p50_ms" in result:
+        print(f"first chunk p50: {result['first_chunk_p50_ms']:.1f} ms")
+        print(f"first chunk p99: {result['first_chunk_p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Batch TDEE/BMI benchmark
+
+Computes TDEE and BMI for a population of random members three ways:
+- the scalar functions in a Python loop
+- the NumPy batch functions
+- POST /calculations/tdee/batch end to end, including validation and JSON
+
+It reports the per-row cost of each and checks that the batch results are
+bit for bit the scalar ones:
+
+    cd api
+    python -m benchmarks.calculations_batch --rows 50000
+    python -m benchmarks.calculations_batch --rows 50000 --layout rows
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+import httpx  # noqa: E402
+
+from app.calculations import (  # noqa: E402
+    calculate_bmi,
+    calculate_bmi_batch,
+    calculate_tdee,
+    calculate_tdee_batch,
+    get_bmi_categories,
+    get_bmi_category,
+)
+from app.main import app  # noqa: E402
+from app.models import ActivityLevel  # noqa: E402
+
+FIELDS = ("weight_kg", "height_cm", "age", "sex", "activity_level")
+
+
+def population(rows: int, seed: int) -> dict[str, list]:
+    rng = random.Random(seed)
+    return {
+        "weight_kg": [round(rng.uniform(35, 200), 1) for _ in range(rows)],
+        "height_cm": [round(rng.uniform(130, 215), 1) for _ in range(rows)],
+        "age": [rng.randint(13, 120) for _ in range(rows)],
+        "sex": [rng.choice(["male", "female"]) for _ in range(rows)],
+        "activity_level": [rng.choice([level.value for level in ActivityLevel]) for _ in range(rows)],
+    }
+
+
+def best_of(repeat: int, fn) -> tuple[float, object]:
+    """Fastest of repeat runs in seconds, and the last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def scalar_loop(columns: dict[str, list]) -> tuple[list[dict], list[tuple]]:
+    tdee = [calculate_tdee(*row) for row in zip(*(columns[field] for field in FIELDS))]
+    bmi = []
+    for weight, height in zip(columns["weight_kg"], columns["height_cm"]):
+        value = calculate_bmi(weight, height)
+        bmi.append((value, get_bmi_category(value)))
+    return tdee, bmi
+
+
+def batch(columns: dict[str, list]) -> tuple[dict, tuple]:
+    tdee = calculate_tdee_batch(**columns)
+    bmi = calculate_bmi_batch(columns["weight_kg"], columns["height_cm"])
+    return tdee, (bmi, get_bmi_categories(bmi))
+
+
+def mismatches(scalar: tuple, vectorized: tuple) -> int:
+    """Values whose bits differ between the scalar and batch results"""
+    scalar_tdee, scalar_bmi = scalar
+    batch_tdee, (batch_bmi, batch_categories) = vectorized
+    columns = {key: values.tolist() for key, values in batch_tdee.items()}
+    count = 0
+    for index, expected in enumerate(scalar_tdee):
+        count += sum(columns[key][index].hex() != value.hex() for key, value in expected.items())
+    for index, (value, category) in enumerate(scalar_bmi):
+        count += batch_bmi[index].item().hex() != value.hex()
+        count += batch_categories[index] != category
+    return count
+
+
+async def post_batch(body: dict) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        response = await client.post("/api/calculations/tdee/batch", json=body, timeout=None)
+        elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--layout", choices=("columns", "rows"), default="columns", help="request body layout")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    columns = population(args.rows, args.seed)
+    scalar_s, scalar = best_of(args.repeat, lambda: scalar_loop(columns))
+    batch_s, vectorized = best_of(args.repeat, lambda: batch(columns))
+
+    if args.layout == "columns":
+        body = {"columns": columns}
+    else:
+        body = {"rows": [dict(zip(FIELDS, row)) for row in zip(*(columns[field] for field in FIELDS))]}
+    endpoint_s = min(asyncio.run(post_batch(body)) for _ in range(args.repeat))
+
+    def per_row_us(seconds: float) -> float:
+        return seconds / args.rows * 1e6
+
+    print(f"rows:             {args.rows}")
+    print(f"scalar loop:      {scalar_s * 1000:8.1f} ms  ({per_row_us(scalar_s):6.2f} us/row)")
+    print(f"numpy batch:      {batch_s * 1000:8.1f} ms  ({per_row_us(batch_s):6.2f} us/row)"
+          f"  {scalar_s / batch_s:.1f}x faster")
+    print(f"endpoint ({args.layout}): {endpoint_s * 1000:8.1f} ms  ({per_row_us(endpoint_s):6.2f} us/row)")
+    print(f"mismatched bits:  {mismatches(scalar, vectorized)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Login storm benchmark
+
+Fires concurrent logins at the API in-process while probing an unrelated
+endpoint (/health) on a fixed schedule and reports login throughput plus
+the probe latency distribution. Probe latency is measured from each probe's
+scheduled start, so event-loop stalls show up instead of being skipped.
+Run with --inline to hash on the event loop (the old behaviour) for
+comparison:
+
+    cd api
+    python -m benchmarks.login_storm --logins 200 --concurrency 50
+    python -m benchmarks.login_storm --logins 200 --concurrency 50 --inline
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from unittest.mock import AsyncMock, patch
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+import httpx  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.main import app  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fake_database():
+    users = AsyncMock()
+    users.find_one = AsyncMock(return_value={
+        "_id": "benchmark-user",
+        "email": "bench@example.com",
+        "password_hash": auth.get_password_hash(PASSWORD),
+    })
+    database = AsyncMock()
+    database.users = users
+    return AsyncMock(return_value=database)
+
+
+async def run(logins: int, concurrency: int, probe_interval: float) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    status_counts: dict[int, int] = {}
+    probe_latencies: list[float] = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    "/api/auth/login",
+                    data={"username": "bench@example.com", "password": PASSWORD},
+                )
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+
+        async def probe():
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                scheduled += probe_interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await client.get("/health")
+                probe_latencies.append((time.perf_counter() - scheduled) * 1000)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "elapsed_s": elapsed,
+        "logins_per_s": logins / elapsed,
+        "statuses": status_counts,
+        "probe_count": len(probe_latencies),
+        "probe_p50_ms": statistics.median(probe_latencies),
+        "probe_p99_ms": percentile(probe_latencies, 99),
+        "probe_max_ms": max(probe_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the pool")
+    args = parser.parse_args()
+
+    patches = [patch("app.routers.auth.get_database", fake_database())]
+    if args.inline:
+        async def inline_verify(plain, hashed):
+            return auth.verify_password(plain, hashed)
+        patches.append(patch("app.routers.auth.verify_password_async", inline_verify))
+
+    for p in patches:
+        p.start()
+    try:
+        result = asyncio.run(run(args.logins, args.concurrency, args.probe_interval))
+    finally:
+        for p in patches:
+            p.stop()
+        auth.password_hash_pool.shutdown()
+
+    mode = "inline" if args.inline else f"pool(workers={auth.password_hash_pool.max_workers})"
+    print(f"mode:            {mode}")
+    print(f"logins:          {args.logins} in {result['elapsed_s']:.2f}s ({result['logins_per_s']:.1f}/s)")
+    print(f"login statuses:  {result['statuses']}")
+    print(f"/health probes:  {result['probe_count']}")
+    print(f"/health p50:     {result['probe_p50_ms']:.1f} ms")
+    print(f"/health p99:     {result['probe_p99_ms']:.1f} ms")
+    print(f"/health max:     {result['probe_max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,21 @@ import pytest
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
 from app.main import app
+from app import ai_coach
+from app.cache import TTLCache
+from app.circuit import CircuitBreaker
+from app.coach_context import coach_context_cache
+from app.history_index import history_index
 from app.database import get_database
 from app.auth import create_access_token
+from app.dependencies import get_current_user
+from bson import ObjectId
 from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
 import os
 
+TEST_USER_ID = ObjectId()
+
 
 @pytest.fixture(scope="session")
 def test_app():
@@ -69,3 +79,51 @@ def auth_headers(auth_token):
     """Provide authorization headers with test token"""
     return {"Authorization": f"Bearer {auth_token}"}
 
+
+
+def user_versions(database) -> dict:
+    """Back database.user_versions with an in-memory counter per user"""
+    versions = {}
+
+    async def bump(query, update, **kwargs):
+        versions[query["_id"]] = versions.get(query["_id"], 0) + update["$inc"]["version"]
+        return {"_id": query["_id"], "version": versions[query["_id"]]}
+
+    async def read(query, projection=None):
+        if query["_id"] not in versions:
+            return None
+        return {"_id": query["_id"], "version": versions[query["_id"]]}
+
+    database.user_versions.find_one_and_update = AsyncMock(side_effect=bump)
+    database.user_versions.find_one = AsyncMock(side_effect=read)
+    return versions
+
+
+@pytest.fixture
+def mock_db(test_app):
+    """Override auth and database dependencies with a mock database"""
+    database = MagicMock()
+    user_versions(database)
+    test_app.dependency_overrides[get_current_user] = lambda: {"_id": TEST_USER_ID, "email": "test@example.com"}
+    test_app.dependency_overrides[get_database] = lambda: database
+    yield database
+    test_app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_circuit():
+    """Give every test a closed circuit breaker and no remembered results"""
+    circuit = CircuitBreaker(window=20, min_calls=10, failure_ratio=0.5, slow_call_ratio=0.5, open_seconds=30)
+    with patch.object(ai_coach, "model_circuit", circuit), \
+            patch.object(ai_coach, "last_good", TTLCache(100, 3600)):
+        yield circuit
+
+
+@pytest.fixture(autouse=True)
+def fresh_coach_context():
+    """Start every test without cached coach context or history indexes"""
+    coach_context_cache.clear()
+    history_index.clear()
+    yield
+    coach_context_cache.clear()
+    history_index.clear()
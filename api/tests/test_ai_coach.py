@@ -0,0 +1,585 @@
+"""
+Test AI coach endpoints with a stubbed model
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from bson import ObjectId
+
+from app import ai_coach, plan_jobs
+from app.ai_coach import CoachBusy, CoachTimeout, ConcurrencyLimiter, LLMMetrics, ModelTier, SingleFlight
+from app.llm import LLMProvider, Usage
+from app.metrics import Histogram
+from app.plan_cache import PlanCache
+from tests.conftest import TEST_USER_ID
+
+
+class StubModel(LLMProvider):
+    """LLM backend stub that answers after a fixed delay"""
+
+    def __init__(self, delay: float, text: str = "Keep it up!", chunks: Optional[list] = None):
+        self.delay = delay
+        self.text = text
+        self.chunks = chunks or [text]
+        self.calls = 0
+        self.prompts = []
+
+    async def generate(self, prompt, endpoint):
+        self.calls += 1
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return self.text
+
+    async def stream(self, prompt, endpoint):
+        self.calls += 1
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def coach_db(mock_db):
+    """Mock database answering the coach's context queries with empty history"""
+    mock_db.profiles.find_one = AsyncMock(return_value=None)
+    mock_db.measurements.find_one = AsyncMock(return_value=None)
+    for collection in (mock_db.workouts, mock_db.meals, mock_db.measurements):
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+    mock_db.ai_conversations.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+    mock_db.ai_conversations.find_one_and_update = AsyncMock(return_value=None)
+    mock_db.ai_conversations.find_one = AsyncMock(return_value=None)
+    mock_db.ai_plan_cache.find_one = AsyncMock(return_value=None)
+    mock_db.ai_plan_cache.replace_one = AsyncMock()
+    return mock_db
+
+
+def async_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestNonBlockingChat:
+    """Test that model calls never stall the event loop"""
+
+    async def test_health_responsive_during_chats(self, test_app, coach_db):
+        """Test /health answers quickly while ten chats are waiting on the model"""
+        stub = StubModel(delay=0.5)
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(20, 20, 5)):
+            async with async_client(test_app) as client:
+                chats = [
+                    asyncio.create_task(client.post("/api/ai-coach/chat", json={"message": f"hi {i}"}))
+                    for i in range(10)
+                ]
+                await asyncio.sleep(0.05)
+
+                started = time.perf_counter()
+                health = await client.get("/health")
+                elapsed = time.perf_counter() - started
+
+                responses = await asyncio.gather(*chats)
+
+        assert health.status_code == 200
+        assert elapsed < 0.1
+        assert [r.status_code for r in responses] == [200] * 10
+        assert stub.calls == 10
+
+    async def test_chat_busy_returns_429(self, test_app, coach_db):
+        """Test a user over their concurrency share gets 429 with Retry-After"""
+        with patch.object(ai_coach, "llm", StubModel(delay=0.5)), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 1, 0.05)):
+            async with async_client(test_app) as client:
+                first = asyncio.create_task(client.post("/api/ai-coach/chat", json={"message": "a"}))
+                await asyncio.sleep(0.05)
+                second = await client.post("/api/ai-coach/chat", json={"message": "b"})
+                assert (await first).status_code == 200
+
+        assert second.status_code == 429
+        assert second.headers["retry-after"]
+
+    async def test_plan_timeout_returns_504(self, test_app, coach_db):
+        """Test a model call past its deadline surfaces as 504"""
+        with patch.object(ai_coach, "llm", StubModel(delay=1)), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(plan_jobs, "plan_cache", PlanCache(10, 60, 60)), \
+                patch.object(ai_coach.settings, "ai_plan_timeout_seconds", 0.05):
+            async with async_client(test_app) as client:
+                response = await client.post("/api/ai-coach/generate-workout-plan", json={
+                    "goal": "maintain", "experience_level": "beginner", "days_per_week": 3, "duration_per_session": 45,
+                })
+
+        assert response.status_code == 504
+
+
+class TestChatStream:
+    """Test server-sent-event chat streaming"""
+
+    async def test_stream_chunks_then_done(self, test_app, coach_db):
+        """Test each model chunk becomes a chunk event and done carries the full reply"""
+        stub = StubModel(delay=0, chunks=["Drink ", "more ", "water."])
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)):
+            async with async_client(test_app) as client:
+                response = await client.post("/api/ai-coach/chat/stream", json={"message": "tips?"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["chunk", "chunk", "chunk", "done"]
+        assert [data["text"] for _, data in events[:3]] == ["Drink ", "more ", "water."]
+        done = events[-1][1]
+        assert done["response"] == "Drink more water."
+        assert set(done["timing"]) == {"context_ms", "first_chunk_ms", "total_ms"}
+        assert done["timing"]["first_chunk_ms"] <= done["timing"]["total_ms"]
+
+    async def test_stream_error_after_first_chunk(self, test_app, coach_db):
+        """Test a failure mid-stream is reported as an error event"""
+        stub = StubModel(delay=0, chunks=["Start ", RuntimeError("connection reset")])
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)):
+            async with async_client(test_app) as client:
+                response = await client.post("/api/ai-coach/chat/stream", json={"message": "tips?"})
+
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["chunk", "error"]
+
+    async def test_stream_timeout_before_first_chunk(self, test_app, coach_db):
+        """Test a model timeout before any text streams the fallback reply, like /chat"""
+        with patch.object(ai_coach, "llm", StubModel(delay=0.2)), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(ai_coach.settings, "ai_chat_timeout_seconds", 0.01):
+            async with async_client(test_app) as client:
+                response = await client.post("/api/ai-coach/chat/stream", json={"message": "tips?"})
+
+        assert response.status_code == 200
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["chunk", "done"]
+        assert events[-1][1]["response"] == ai_coach.CHAT_FALLBACK_MESSAGE
+
+
+SUGGESTION = json.dumps({
+    "workout_name": "Push Day",
+    "exercises": [
+        {"exercise_name": "Bench Press", "exercise_type": "strength", "sets": 3, "reps": 8, "notes": "Feet {planted}"},
+        {"exercise_name": "Dips", "exercise_type": "strength", "sets": 3, "reps": 10},
+    ],
+    "duration_minutes": 40,
+})
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+class TestSuggestionStream:
+    """Test schema-constrained suggestions parsed as they stream"""
+
+    async def test_exercises_emitted_as_they_close(self):
+        """Test each exercise is yielded before the rest of the output arrives"""
+        first_end = SUGGESTION.index("}", SUGGESTION.index("planted}") + 8) + 1
+        stub = StubModel(delay=0, chunks=[SUGGESTION[:first_end], RuntimeError("connection reset")])
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            suggestion = ai_coach.stream_workout_suggestion("push day", "")
+            event, exercise = await anext(suggestion)
+            with pytest.raises(Exception):
+                await anext(suggestion)
+
+        assert event == "exercise"
+        assert exercise["exercise_name"] == "Bench Press"
+        assert exercise["notes"] == "Feet {planted}"
+
+    async def test_invalid_exercise_dropped(self):
+        """Test an exercise failing validation is skipped and the rest still served"""
+        data = json.loads(SUGGESTION)
+        data["exercises"].insert(1, {"exercise_name": "Mystery", "exercise_type": "juggling"})
+        with patch.object(ai_coach, "llm", StubModel(delay=0, chunks=split(json.dumps(data), 7))), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            events = [event async for event in ai_coach.stream_workout_suggestion("push day", "")]
+
+        assert [name for name, _ in events] == ["exercise", "exercise", "done"]
+        done = events[-1][1]
+        assert [e["exercise_name"] for e in done["workout"]["exercises"]] == ["Bench Press", "Dips"]
+        assert done["source"] == "model"
+
+    async def test_schema_passed_to_model(self):
+        """Test the suggest call constrains the model to the suggestion schema"""
+        schemas = []
+
+        class SchemaModel(StubModel):
+            async def generate_with_usage(self, prompt, endpoint, usage, max_output_tokens=None, response_schema=None):
+                schemas.append(response_schema)
+                return SUGGESTION
+
+        with patch.object(ai_coach, "llm", SchemaModel(delay=0)), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            result = await ai_coach.suggest_workout("push day", "")
+
+        assert schemas == [ai_coach.SUGGESTION_SCHEMA]
+        assert result["workout"]["exercises"][1]["exercise_type"] == "strength"
+
+    async def test_stream_endpoint_events(self, test_app, coach_db):
+        """Test the endpoint sends an indexed exercise event per exercise, then done"""
+        with patch.object(ai_coach, "llm", StubModel(delay=0, chunks=split(SUGGESTION, 16))), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)):
+            async with async_client(test_app) as client:
+                response = await client.post("/api/ai-coach/suggest-workout/stream", json={"message": "Legs, but my knee hurts"})
+
+        assert response.status_code == 200
+        events = parse_events(response.text)
+        assert [name for name, _ in events] == ["exercise", "exercise", "done"]
+        assert [data["index"] for _, data in events[:2]] == [0, 1]
+        assert events[-1][1]["workout"]["workout_name"] == "Push Day"
+
+    async def test_unusable_output_returns_502(self, test_app, coach_db):
+        """Test output that never forms a workout is a 502, not a fallback body"""
+        with patch.object(ai_coach, "llm", StubModel(delay=0, text='{"workout_name": "Oops"', chunks=None)), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)):
+            async with async_client(test_app) as client:
+                streamed = await client.post("/api/ai-coach/suggest-workout/stream", json={"message": "Legs, but my knee hurts"})
+                plain = await client.post("/api/ai-coach/suggest-workout", json={"message": "Legs, but my knee hurts"})
+
+        assert streamed.status_code == 502
+        assert plain.status_code == 502
+
+    async def test_stream_busy_returns_429(self, test_app, coach_db):
+        """Test limiter rejections happen before the stream starts"""
+        limiter = ConcurrencyLimiter(1, 1, 0.01)
+        with patch.object(ai_coach, "llm", StubModel(delay=0)), \
+                patch.object(ai_coach, "coach_limiter", limiter):
+            async with async_client(test_app) as client:
+                async with limiter.slot():
+                    response = await client.post("/api/ai-coach/chat/stream", json={"message": "tips?"})
+
+        assert response.status_code == 429
+        assert limiter.stats()["in_flight"] == 0
+
+
+class TestPlanCache:
+    """Test the shared workout plan cache"""
+
+    PLAN_REQUEST = {
+        "goal": "gain_muscle", "experience_level": "Beginner", "days_per_week": 3,
+        "equipment_available": ["Dumbbells", "barbell"], "duration_per_session": 45,
+    }
+
+    async def test_repeat_plan_skips_model(self, test_app, coach_db):
+        """Test an identical request is served from memory without a model call"""
+        stub = StubModel(delay=0, text="Day 1: squats")
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(plan_jobs, "plan_cache", PlanCache(10, 60, 60)) as cache:
+            async with async_client(test_app) as client:
+                first = await client.post("/api/ai-coach/generate-workout-plan", json=self.PLAN_REQUEST)
+                reordered = {**self.PLAN_REQUEST, "equipment_available": ["barbell", "dumbbells"]}
+                second = await client.post("/api/ai-coach/generate-workout-plan", json=reordered)
+
+        first_plan, second_plan = first.json(), second.json()
+        assert second_plan.pop("created_at") >= first_plan.pop("created_at")
+        assert first_plan == second_plan
+        assert first_plan["ai_generated_plan"] == "Day 1: squats"
+        assert stub.calls == 1
+        assert cache.stats()["memory_hits"] == 1
+        coach_db.ai_plan_cache.replace_one.assert_awaited_once()
+
+    async def test_plan_prompt_excludes_personal_details(self, test_app, coach_db):
+        """Test shared plans are generated from the profile bucket only"""
+        coach_db.profiles.find_one = AsyncMock(return_value={"age": 34, "sex": "female", "activity_level": "active"})
+        stub = StubModel(delay=0)
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(plan_jobs, "plan_cache", PlanCache(10, 60, 60)):
+            async with async_client(test_app) as client:
+                await client.post("/api/ai-coach/generate-workout-plan", json=self.PLAN_REQUEST)
+
+        assert "30-39 years old" in stub.prompts[0]
+        assert "34" not in stub.prompts[0]
+        projection = coach_db.profiles.find_one.call_args.args[1]
+        assert set(projection) == {"_id", "age", "sex", "activity_level"}
+
+
+class TestSingleFlight:
+    """Test coalescing of identical in-flight prompts"""
+
+    async def test_identical_prompts_share_one_call(self):
+        """Test concurrent callers with the same prompt trigger one model call"""
+        stub = StubModel(delay=0.05, text="shared")
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(ai_coach, "prompt_flights", SingleFlight()) as flights:
+            results = await asyncio.gather(*(
+                ai_coach.generate_text("same prompt", timeout=1, endpoint="plan", user_id=str(i), coalesce=True)
+                for i in range(5)
+            ))
+            other = await ai_coach.generate_text("other prompt", timeout=1, endpoint="plan", coalesce=True)
+
+        assert results == ["shared"] * 5
+        assert other == "shared"
+        assert stub.calls == 2
+        assert flights.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 4, "abandoned": 0}
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Test one disconnecting caller leaves the shared call running"""
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", call))
+        second = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "done"
+        assert first.cancelled()
+        assert flights.stats()["abandoned"] == 0
+
+    async def test_last_waiter_leaving_cancels_call(self):
+        """Test the shared call is cancelled once nobody is waiting for it"""
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1, "abandoned": 1}
+
+    async def test_failure_reaches_every_waiter(self):
+        """Test an error from the shared call is raised to all callers"""
+        flights = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flights.do("k", call) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flights.stats()["in_flight"] == 0
+
+    async def test_concurrent_suggestions_coalesce(self, test_app, coach_db):
+        """Test identical suggest-workout requests share one model call"""
+        stub = StubModel(delay=0.05, text=json.dumps({
+            "workout_name": "Legs", "exercises": [{"exercise_name": "Squat", "exercise_type": "strength"}],
+        }))
+        with patch.object(ai_coach, "llm", stub), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)), \
+                patch.object(ai_coach, "prompt_flights", SingleFlight()):
+            async with async_client(test_app) as client:
+                responses = await asyncio.gather(*(
+                    client.post("/api/ai-coach/suggest-workout", json={"message": "Surprise me with something new"})
+                    for _ in range(5)
+                ))
+
+        assert [r.json()["workout"]["workout_name"] for r in responses] == ["Legs"] * 5
+        assert stub.calls == 1
+
+
+class TestConcurrencyLimiter:
+    """Test the global and per-user AI slots"""
+
+    async def test_per_user_slots_released(self):
+        """Test per-user bookkeeping is dropped once all holders leave"""
+        limiter = ConcurrencyLimiter(2, 1, 1)
+        async with limiter.slot(str(TEST_USER_ID)):
+            assert limiter.stats()["in_flight"] == 1
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter._users == {}
+
+
+class UsageModel(StubModel):
+    """Stub backend that reports token usage like Gemini's usage metadata"""
+
+    async def generate_with_usage(self, prompt, endpoint, usage: Usage, max_output_tokens=None, response_schema=None):
+        usage.prompt_tokens, usage.response_tokens = 321, 12
+        return await self.generate(prompt, endpoint)
+
+
+class TestLLMMetrics:
+    """Test model call instrumentation"""
+
+    def test_histogram_buckets_and_quantiles(self):
+        """Test observations land in cumulative buckets with bucket-bound quantiles"""
+        histogram = Histogram((10, 100))
+        for value in (5, 50, 50, 500):
+            histogram.observe(value)
+
+        stats = histogram.stats()
+        assert stats["buckets"] == {"10": 1, "100": 3, "+Inf": 4}
+        assert stats["p50"] == 100
+        assert stats["p99"] == "+Inf"
+        assert stats["sum"] == 605
+
+    async def test_usage_and_latency_recorded_per_endpoint(self):
+        """Test reported usage is recorded under the call's endpoint label"""
+        metrics = LLMMetrics()
+        with patch.object(ai_coach, "llm", UsageModel(delay=0.01)), \
+                patch.object(ai_coach, "llm_metrics", metrics), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            await ai_coach.generate_text("prompt", timeout=1, endpoint="plan")
+
+        stats = metrics.stats()["plan"]
+        assert stats["outcomes"]["ok"] == 1
+        assert stats["prompt_tokens"]["sum"] == 321
+        assert stats["response_tokens"]["sum"] == 12
+        assert stats["estimated_usage"] == 0
+        assert stats["latency_ms"]["count"] == 1
+        assert stats["queue_wait_ms"]["count"] == 1
+
+    async def test_stream_first_chunk_and_estimated_usage(self):
+        """Test streams record time to first chunk and estimate missing usage"""
+        metrics = LLMMetrics()
+        with patch.object(ai_coach, "llm", StubModel(delay=0.01, chunks=["a" * 40, "b" * 40])), \
+                patch.object(ai_coach, "llm_metrics", metrics), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            text = "".join([chunk async for chunk in ai_coach.stream_text("p" * 400, timeout=1, endpoint="chat")])
+
+        stats = metrics.stats()["chat"]
+        assert len(text) == 80
+        assert stats["first_chunk_ms"]["count"] == 1
+        assert stats["estimated_usage"] == 1
+        assert stats["prompt_tokens"]["sum"] == 101
+        assert stats["response_tokens"]["sum"] == 21
+
+    async def test_timeouts_and_fallbacks_counted(self):
+        """Test a timed-out chat counts as a timeout and a fallback"""
+        metrics = LLMMetrics()
+        with patch.object(ai_coach, "llm", StubModel(delay=0.2)), \
+                patch.object(ai_coach, "llm_metrics", metrics), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)), \
+                patch.object(ai_coach.settings, "ai_chat_timeout_seconds", 0.01):
+            reply = await ai_coach.chat_with_coach("hi", "")
+
+        stats = metrics.stats()["chat"]
+        assert reply == ai_coach.CHAT_FALLBACK_MESSAGE
+        assert stats["outcomes"]["timeout"] == 1
+        assert stats["fallback_rate"] == 1.0
+
+    async def test_suggest_parse_failure_counted(self):
+        """Test unparseable suggestion JSON is counted as a parse failure and raised"""
+        metrics = LLMMetrics()
+        with patch.object(ai_coach, "llm", StubModel(delay=0, text="not json")), \
+                patch.object(ai_coach, "llm_metrics", metrics), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            with pytest.raises(ai_coach.InvalidModelOutput):
+                await ai_coach.suggest_workout("legs", "")
+
+        assert metrics.stats()["suggest"]["parse_failures"] == 1
+
+
+class CappedModel(StubModel):
+    """Stub backend that records the output cap of each call"""
+
+    def __init__(self, delay: float = 0):
+        super().__init__(delay)
+        self.caps = []
+
+    async def generate_with_usage(self, prompt, endpoint, usage: Usage, max_output_tokens=None, response_schema=None):
+        self.caps.append(max_output_tokens)
+        return await self.generate(prompt, endpoint)
+
+
+def tiers(**overrides):
+    """Fresh fast/standard/heavy tiers; overrides map a tier name to ModelTier options"""
+    options = {
+        "fast": dict(timeout=None, max_concurrency=5, max_output_tokens=256),
+        "standard": dict(timeout=None, max_concurrency=5, max_output_tokens=None),
+        "heavy": dict(timeout=None, max_concurrency=5, max_output_tokens=None),
+    }
+    for name, changes in overrides.items():
+        options[name].update(changes)
+    return {name: ModelTier(name, model=None, **tier) for name, tier in options.items()}
+
+
+class TestModelTiers:
+    """Test requests are routed to model tiers with their own limits and metrics"""
+
+    def test_chat_routing(self):
+        """Test short chat turns go to the fast tier and big ones to standard"""
+        assert ai_coach.chat_tier("hi", [], "prompt") == "fast"
+        assert ai_coach.chat_tier("x" * 1000, [], "prompt") == "standard"
+        assert ai_coach.chat_tier("hi", [object()] * 20, "prompt") == "standard"
+        assert ai_coach.chat_tier("hi", [], "p" * 20000) == "standard"
+
+    async def test_endpoints_use_their_tiers(self):
+        """Test each call lands in its tier's metrics and gets the tier's output cap"""
+        model = CappedModel()
+        routed = tiers()
+        with patch.object(ai_coach, "llm", model), patch.object(ai_coach, "model_tiers", routed), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            await ai_coach.chat_with_coach("hi", "")
+            await ai_coach.generate_text("plan prompt", timeout=1, endpoint="plan")
+            await ai_coach.generate_text("suggest prompt", timeout=1, endpoint="suggest")
+            await ai_coach.generate_text("summary prompt", timeout=1, endpoint="summary")
+
+        assert {name: tier.stats()["calls"] for name, tier in routed.items()} == \
+            {"fast": 2, "standard": 1, "heavy": 1}
+        assert routed["fast"].stats()["latency_ms"]["count"] == 2
+        assert model.caps == [256, None, None, 256]
+
+    async def test_tier_timeout_shortens_deadline(self):
+        """Test a tier deadline tighter than the endpoint's applies"""
+        routed = tiers(fast={"timeout": 0.01})
+        with patch.object(ai_coach, "llm", StubModel(delay=0.2)), patch.object(ai_coach, "model_tiers", routed), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            with pytest.raises(CoachTimeout):
+                await ai_coach.generate_text("p", timeout=5, endpoint="chat", tier="fast")
+
+        assert routed["fast"].stats()["outcomes"]["timeout"] == 1
+
+    async def test_heavy_pool_does_not_block_chat(self):
+        """Test a full heavy tier rejects more plans while chat keeps flowing"""
+        with patch.object(ai_coach.settings, "ai_queue_timeout_seconds", 0.05):
+            routed = tiers(heavy={"max_concurrency": 1})
+        with patch.object(ai_coach, "llm", StubModel(delay=0.2)), patch.object(ai_coach, "model_tiers", routed), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            plan = asyncio.create_task(ai_coach.generate_text("plan 1", timeout=1, endpoint="plan"))
+            await asyncio.sleep(0.01)
+            with pytest.raises(CoachBusy):
+                await ai_coach.generate_text("plan 2", timeout=1, endpoint="plan")
+            reply = await ai_coach.chat_with_coach("hi", "")
+            await plan
+
+        assert reply == "Keep it up!"
+        assert routed["heavy"].stats()["outcomes"]["busy"] == 1
+
+    async def test_tier_with_own_model(self):
+        """Test a tier configured with its own model does not use the default backend"""
+        default, fast = StubModel(delay=0), StubModel(delay=0, text="quick")
+        routed = tiers()
+        routed["fast"]._provider = fast
+        with patch.object(ai_coach, "llm", default), patch.object(ai_coach, "model_tiers", routed), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            assert await ai_coach.chat_with_coach("hi", "") == "quick"
+
+        assert (default.calls, fast.calls) == (0, 1)
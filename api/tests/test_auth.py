@@ -1,6 +1,8 @@
 """
 Test authentication endpoints
 """
+import asyncio
+import threading
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from app.auth import get_password_hash, verify_password, create_access_token, decode_access_token
@@ -28,6 +30,62 @@ class TestPasswordHashing:
         assert verify_password(password, hash1) is True
         assert verify_password(password, hash2) is True
 
+    async def test_async_hash_and_verify(self):
+        """Test that the pooled async APIs match the synchronous ones"""
+        from app.auth import get_password_hash_async, verify_password_async
+
+        hashed = await get_password_hash_async("mySecurePassword123")
+
+        assert await verify_password_async("mySecurePassword123", hashed) is True
+        assert await verify_password_async("wrongPassword", hashed) is False
+
+    async def test_saturated_pool_rejects(self):
+        """Test that calls beyond the queue-depth limit are shed"""
+        from app.auth import PasswordHashPool, PasswordHasherBusy
+
+        pool = PasswordHashPool(max_workers=1, max_pending=0)
+        with pytest.raises(PasswordHasherBusy):
+            await pool.run(get_password_hash, "password123")
+        assert pool.stats()["rejected"] == 1
+
+    async def test_cancelled_call_stays_pending_until_thread_finishes(self):
+        """Test that cancelling the caller does not free a slot still in use"""
+        from app.auth import PasswordHashPool, PasswordHasherBusy
+
+        pool = PasswordHashPool(max_workers=1, max_pending=1)
+        release = threading.Event()
+        task = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(PasswordHasherBusy):
+            await pool.run(get_password_hash, "password123")
+
+        release.set()
+        for _ in range(100):
+            if pool.stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.stats()["pending"] == 0
+        assert pool.stats()["completed"] == 1
+        pool.shutdown()
+
+    async def test_failures_counted_as_errors(self):
+        """Test that a call that raises is counted as an error, not completed"""
+        from app.auth import PasswordHashPool
+
+        pool = PasswordHashPool(max_workers=1, max_pending=1)
+        with pytest.raises(ValueError):
+            await pool.run(verify_password, "password123", "not-a-bcrypt-hash")
+
+        assert pool.stats()["errors"] == 1
+        assert pool.stats()["completed"] == 0
+        assert pool.stats()["pending"] == 0
+        pool.shutdown()
+
 
 class TestJWTTokens:
     """Test JWT token creation and validation"""
@@ -219,3 +277,88 @@ class TestAuthEndpoints:
 
             response = client.post("/api/auth/login", data=login_data)
             assert response.status_code == 401  # Returns 401 for both wrong password and non-existent user
+
+    def test_login_when_hashing_pool_busy(self, client):
+        """Test login sheds load with 503 when the hashing pool is saturated"""
+        from app.auth import PasswordHasherBusy
+
+        with patch('app.routers.auth.get_database') as mock_db, \
+                patch('app.routers.auth.verify_password_async',
+                      AsyncMock(side_effect=PasswordHasherBusy())):
+            mock_collection = AsyncMock()
+            mock_collection.find_one = AsyncMock(return_value={
+                "_id": "test_user_id",
+                "email": "test@example.com",
+                "password_hash": "irrelevant"
+            })
+
+            mock_db_instance = AsyncMock()
+            mock_db_instance.users = mock_collection
+            mock_db.return_value = mock_db_instance
+
+            response = client.post(
+                "/api/auth/login",
+                data={"username": "test@example.com", "password": "password123"}
+            )
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "1"
+
+
+class TestPrincipalCache:
+    """Test the authenticated-principal cache in get_current_user"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from app.dependencies import principal_cache
+        principal_cache.clear()
+        yield
+        principal_cache.clear()
+
+    def _mock_db(self, user):
+        mock_collection = AsyncMock()
+        mock_collection.find_one = AsyncMock(return_value=user)
+        mock_db_instance = AsyncMock()
+        mock_db_instance.users = mock_collection
+        return mock_db_instance
+
+    async def test_cache_hit_skips_decode_and_db(self):
+        """Test that a repeated token is served without verifying or querying"""
+        from bson import ObjectId
+        from app.dependencies import get_current_user
+
+        user = {"_id": ObjectId(), "email": "test@example.com"}
+        token = create_access_token({"sub": str(user["_id"])})
+        db = self._mock_db(user)
+
+        with patch('app.dependencies.get_database', AsyncMock(return_value=db)):
+            first = await get_current_user(token)
+            with patch('app.dependencies.decode_access_token_claims') as mock_decode:
+                second = await get_current_user(token)
+                mock_decode.assert_not_called()
+
+        assert first["email"] == second["email"]
+        assert db.users.find_one.await_count == 1
+
+    async def test_invalidate_user_forces_lookup(self):
+        """Test that invalidating a user drops all of their cached tokens"""
+        from bson import ObjectId
+        from app.dependencies import get_current_user, principal_cache
+
+        user = {"_id": ObjectId(), "email": "test@example.com"}
+        token = create_access_token({"sub": str(user["_id"])})
+        db = self._mock_db(user)
+
+        with patch('app.dependencies.get_database', AsyncMock(return_value=db)):
+            await get_current_user(token)
+            assert principal_cache.invalidate_user(str(user["_id"])) == 1
+            await get_current_user(token)
+
+        assert db.users.find_one.await_count == 2
+
+    def test_entry_does_not_outlive_token(self):
+        """Test that entries expire with the token's exp claim"""
+        import time
+        from app.dependencies import principal_cache
+
+        principal_cache.put("expired-token", {"_id": "u1"}, expires_at=time.time() - 1)
+        assert principal_cache.get("expired-token") is None
@@ -0,0 +1,109 @@
+"""
+Test bulk ingestion endpoints
+"""
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+
+def assign_ids(documents, ordered=False):
+    for document in documents:
+        document["_id"] = ObjectId()
+
+
+class TestBulkIngestion:
+    """Test JSON array and NDJSON bulk inserts"""
+
+    def test_json_array_reports_invalid_items(self, client, mock_db):
+        """Test invalid items are reported without aborting the batch"""
+        mock_db.workouts.insert_many = AsyncMock(side_effect=assign_ids)
+
+        response = client.post("/api/workouts/bulk", json=[
+            {"workout_name": "Push", "exercises": []},
+            {"exercises": []},
+            {"workout_name": "Pull", "exercises": []},
+        ])
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 2
+        assert data["ids"][1] is None
+        assert data["errors"][0]["index"] == 1
+        assert "workout_name" in data["errors"][0]["error"]
+        mock_db.workouts.insert_many.assert_awaited_once()
+
+    def test_ndjson_stream(self, client, mock_db):
+        """Test NDJSON bodies are parsed line by line"""
+        mock_db.measurements.insert_many = AsyncMock(side_effect=assign_ids)
+        body = "\n".join([
+            json.dumps({"weight_kg": 80.5}),
+            "{not json",
+            json.dumps({"weight_kg": 80.1, "body_fat_pct": 18}),
+        ]) + "\n"
+
+        with patch('app.routers.measurements.get_database', AsyncMock(return_value=mock_db)):
+            response = client.post(
+                "/api/measurements/bulk",
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["inserted"] == 2
+        assert [e["index"] for e in data["errors"]] == [1]
+        documents = mock_db.measurements.insert_many.call_args.args[0]
+        assert all(d["user_id"] for d in documents)
+
+    def test_inserts_in_chunks(self, client, mock_db):
+        """Test writes are split into chunks of bulk_chunk_size"""
+        mock_db.workouts.insert_many = AsyncMock(side_effect=assign_ids)
+
+        with patch('app.bulk.settings.bulk_chunk_size', 2):
+            response = client.post(
+                "/api/workouts/bulk",
+                json=[{"workout_name": f"W{i}", "exercises": []} for i in range(5)]
+            )
+
+        assert response.json()["inserted"] == 5
+        assert mock_db.workouts.insert_many.await_count == 3
+
+    def test_write_errors_map_to_items(self, client, mock_db):
+        """Test per-document write failures are attributed to their items"""
+        def partial_failure(documents, ordered=False):
+            assign_ids(documents)
+            raise BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "duplicate key"}]})
+
+        mock_db.workouts.insert_many = AsyncMock(side_effect=partial_failure)
+
+        response = client.post("/api/workouts/bulk", json=[
+            {"workout_name": "A", "exercises": []},
+            {"workout_name": "B", "exercises": []},
+        ])
+
+        data = response.json()
+        assert data["inserted"] == 1
+        assert data["errors"] == [{"index": 0, "error": "duplicate key"}]
+
+    def test_meal_bulk_updates_rollups_once_per_day(self, client, mock_db):
+        """Test meal totals are folded into one rollup delta per day"""
+        mock_db.meals.insert_many = AsyncMock(side_effect=assign_ids)
+        mock_db.nutrition_daily.bulk_write = AsyncMock()
+        meal = {"meal_type": "snack", "meal_date": "2025-05-01T10:00:00",
+                "foods": [{"food_name": "Apple", "calories": 95}]}
+
+        response = client.post("/api/nutrition/bulk", json=[meal, meal, meal])
+
+        assert response.json()["inserted"] == 3
+        ops = mock_db.nutrition_daily.bulk_write.call_args.args[0]
+        assert len(ops) == 1
+        assert ops[0]._filter["day"] == datetime(2025, 5, 1)
+        assert ops[0]._doc["$inc"]["total_calories"] == 285
+        assert ops[0]._doc["$inc"]["meals_logged"] == 3
+
+    def test_rejects_non_array_body(self, client, mock_db):
+        """Test a JSON object body is rejected"""
+        response = client.post("/api/workouts/bulk", json={"workout_name": "A"})
+        assert response.status_code == 400
@@ -1,13 +1,39 @@
 """
 Test fitness calculations (BMR, TDEE, macros)
 """
+import random
+from unittest.mock import patch
+
+import numpy as np
 import pytest
 from app.calculations import (
+    _round2,
+    calculate_bmi,
+    calculate_bmi_batch,
     calculate_bmr_mifflin_st_jeor,
     calculate_tdee,
+    calculate_tdee_batch,
+    get_bmi_categories,
+    get_bmi_category,
     ACTIVITY_MULTIPLIERS
 )
 from app.models import ActivityLevel
+from app.routers import calculations
+
+
+def random_people(count: int, seed: int = 7) -> list[tuple]:
+    """Rows of (weight_kg, height_cm, age, sex, activity_level) with realistic precision"""
+    rng = random.Random(seed)
+    return [
+        (
+            round(rng.uniform(35, 200), rng.choice([0, 1, 2])),
+            round(rng.uniform(130, 215), rng.choice([0, 1, 2])),
+            rng.randint(13, 120),
+            rng.choice(["male", "female"]),
+            rng.choice(list(ActivityLevel)),
+        )
+        for _ in range(count)
+    ]
 
 
 class TestBMRCalculations:
@@ -179,3 +205,88 @@ class TestCalculationEndpoints:
 
         assert response.status_code in [422, 401, 403]
 
+
+class TestBatchCalculations:
+    """Test the NumPy batch path against the scalar functions"""
+
+    def test_round2_matches_round(self):
+        """Test values whose scaled form lands near .5 still round like round()"""
+        values = np.array([2382.985, 1.005, 0.125, 0.135, -2.675, 1805.0])
+
+        assert [v.hex() for v in _round2(values).tolist()] == [round(v, 2).hex() for v in values.tolist()]
+
+    def test_tdee_batch_bit_identical(self):
+        """Test every batch result is bit for bit the scalar result"""
+        people = random_people(20000)
+        batch = calculate_tdee_batch(*zip(*people))
+
+        for index, person in enumerate(people):
+            expected = calculate_tdee(*person)
+            actual = {key: float(values[index]) for key, values in batch.items()}
+            assert {k: v.hex() for k, v in actual.items()} == {k: v.hex() for k, v in expected.items()}
+
+    def test_bmi_batch_bit_identical(self):
+        """Test batch BMI values and categories match the scalar functions"""
+        weights, heights, *_ = zip(*random_people(20000))
+        bmi = calculate_bmi_batch(weights, heights)
+
+        expected = [calculate_bmi(w, h) for w, h in zip(weights, heights)]
+        assert [v.hex() for v in bmi.tolist()] == [v.hex() for v in expected]
+        assert get_bmi_categories(bmi) == [get_bmi_category(v) for v in expected]
+
+    def test_bmi_category_bounds(self):
+        """Test category boundaries belong to the higher category, as in get_bmi_category"""
+        assert get_bmi_categories(np.array([18.49, 18.5, 24.99, 25.0, 30.0])) == [
+            "Underweight", "Normal weight", "Normal weight", "Overweight", "Obese",
+        ]
+
+
+class TestBatchEndpoints:
+    """Test the batch calculation endpoints"""
+
+    def test_rows_and_columns_agree_with_single_endpoint(self, client):
+        """Test both layouts return what /tdee returns for each person"""
+        people = [
+            {"age": 25, "sex": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderate"},
+            {"age": 41, "sex": "female", "height_cm": 163.5, "weight_kg": 61.2, "activity_level": "light"},
+        ]
+        columns = {field: [person[field] for person in people] for field in people[0]}
+
+        by_rows = client.post("/api/calculations/tdee/batch", json={"rows": people}).json()
+        by_columns = client.post("/api/calculations/tdee/batch", json={"columns": columns}).json()
+
+        assert by_rows == by_columns
+        assert by_rows["count"] == 2
+        for index, person in enumerate(people):
+            single = client.post("/api/calculations/tdee", json=person).json()
+            assert {field: values[index] for field, values in by_rows.items() if field != "count"} == single
+
+    def test_bmi_batch(self, client):
+        """Test the BMI batch endpoint returns values and categories in input order"""
+        response = client.post("/api/calculations/bmi/batch", json={
+            "columns": {"weight_kg": [50, 90], "height_cm": [180, 175]},
+        })
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "count": 2, "bmi": [15.43, 29.39], "category": ["Underweight", "Overweight"],
+        }
+
+    @pytest.mark.parametrize("body", [
+        {},
+        {"rows": [], "columns": {"weight_kg": [], "height_cm": []}},
+        {"columns": {"weight_kg": [70, 80], "height_cm": [180]}},
+        {"columns": {"weight_kg": [70], "height_cm": [-1]}},
+    ])
+    def test_invalid_batches(self, client, body):
+        """Test both layouts at once, ragged columns and out-of-range values are rejected"""
+        assert client.post("/api/calculations/bmi/batch", json=body).status_code == 422
+
+    def test_batch_size_limit(self, client):
+        """Test batches over the row limit are refused"""
+        with patch.object(calculations.settings, "calculation_batch_max_rows", 2):
+            response = client.post("/api/calculations/bmi/batch", json={
+                "rows": [{"weight_kg": 70, "height_cm": 175}] * 3,
+            })
+
+        assert response.status_code == 413
@@ -0,0 +1,202 @@
+"""
+Test the model circuit breaker, hedged calls and last-good fallbacks
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app import ai_coach, plan_jobs
+from app.ai_coach import ConcurrencyLimiter
+from app.circuit import CircuitBreaker, CircuitOpen, Hedger
+from app.llm import LLMProvider
+from app.plan_cache import PlanCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyModel(LLMProvider):
+    """Fails while `failing` is set, otherwise answers with `text`"""
+
+    def __init__(self, text="ok", delays=None):
+        self.text = text
+        self.failing = False
+        self.delays = list(delays or [])
+        self.calls = 0
+
+    async def generate(self, prompt, endpoint):
+        self.calls += 1
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+        if self.failing:
+            raise RuntimeError("model down")
+        return self.text
+
+    async def stream(self, prompt, endpoint):
+        yield await self.generate(prompt, endpoint)
+
+
+def breaker(clock=None, **overrides):
+    options = dict(window=4, min_calls=4, failure_ratio=0.5, slow_call_ratio=0.5, open_seconds=10)
+    options.update(overrides)
+    return CircuitBreaker(clock=clock or FakeClock(), **options)
+
+
+@pytest.fixture
+def coach_slots():
+    with patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 1)):
+        yield
+
+
+class TestCircuitBreaker:
+    """Test the breaker state machine"""
+
+    def test_trips_on_failure_ratio(self):
+        """Test the circuit opens once enough recent calls fail"""
+        circuit = breaker()
+        for failed in (False, True, False, True):
+            circuit.record(failed=failed)
+
+        assert circuit.state == "open"
+        with pytest.raises(CircuitOpen) as error:
+            circuit.before_call()
+        assert error.value.retry_after == 10
+
+    def test_trips_on_slow_calls(self):
+        """Test successful but slow calls also open the circuit"""
+        circuit = breaker()
+        for slow in (True, True, False, False):
+            circuit.record(failed=False, slow=slow)
+        assert circuit.state == "open"
+
+    def test_needs_min_calls(self):
+        """Test a single early failure does not trip the circuit"""
+        circuit = breaker()
+        circuit.record(failed=True)
+        assert circuit.state == "closed"
+
+    def test_half_open_probe(self):
+        """Test one probe is allowed after the cool-off; success closes the circuit"""
+        clock = FakeClock()
+        circuit = breaker(clock)
+        for _ in range(4):
+            circuit.record(failed=True)
+
+        clock.now = 11
+        circuit.before_call()
+        assert circuit.state == "half_open"
+        with pytest.raises(CircuitOpen):
+            circuit.before_call()
+
+        circuit.record(failed=False)
+        assert circuit.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        """Test a failing probe starts a new cool-off"""
+        clock = FakeClock()
+        circuit = breaker(clock)
+        for _ in range(4):
+            circuit.record(failed=True)
+        clock.now = 11
+        circuit.before_call()
+        circuit.record(failed=True)
+
+        assert circuit.state == "open"
+        assert circuit.stats()["opened"] == 2
+
+    def test_busy_not_held_against_model(self):
+        """Test ignored exceptions neither count as failures nor block the probe"""
+        circuit = breaker()
+        for _ in range(8):
+            with pytest.raises(ai_coach.CoachBusy):
+                with circuit.call(slow_after=1, ignore=(ai_coach.CoachBusy,)):
+                    raise ai_coach.CoachBusy("busy")
+        assert circuit.state == "closed"
+        assert circuit.stats()["recent_calls"] == 0
+
+
+class TestHedger:
+    """Test hedged model calls"""
+
+    async def test_backup_wins_slow_first_call(self):
+        """Test a backup call answers when the first one is stuck"""
+        hedger = Hedger(delay=0.02)
+        delays = [1.0, 0.0]
+
+        async def call():
+            await asyncio.sleep(delays.pop(0))
+            return "done"
+
+        started = time.perf_counter()
+        assert await hedger.run(call) == "done"
+        assert time.perf_counter() - started < 0.5
+        assert hedger.stats() == {"delay_seconds": 0.02, "hedged": 1, "hedge_wins": 1}
+
+    async def test_fast_call_not_hedged(self):
+        """Test calls answering before the delay never start a backup"""
+        hedger = Hedger(delay=0.5)
+        factory = AsyncMock(return_value="fast")
+        assert await hedger.run(factory) == "fast"
+        assert factory.await_count == 1
+
+    async def test_hedged_generate_text(self, coach_slots):
+        """Test generate_text hedges model calls when a delay is configured"""
+        model = FlakyModel(delays=[1.0, 0.0])
+        with patch.object(ai_coach, "llm", model), patch.object(ai_coach, "hedger", Hedger(delay=0.02)):
+            assert await ai_coach.generate_text("p", timeout=2, endpoint="chat") == "ok"
+        assert model.calls == 2
+
+
+class TestOpenCircuit:
+    """Test requests fail fast and fall back while the model is down"""
+
+    async def test_chat_fails_fast(self, fresh_circuit, coach_slots):
+        """Test chat returns the fallback without calling the model once open"""
+        model = FlakyModel()
+        model.failing = True
+        with patch.object(ai_coach, "llm", model):
+            for _ in range(10):
+                await ai_coach.chat_with_coach("hi", "")
+            assert fresh_circuit.state == "open"
+            reply = await ai_coach.chat_with_coach("hi", "")
+
+        assert reply == ai_coach.CHAT_FALLBACK_MESSAGE
+        assert model.calls == 10
+
+    async def test_suggestion_served_from_last_good(self, fresh_circuit, coach_slots):
+        """Test an open circuit serves the last good suggestion for a similar request"""
+        model = FlakyModel(text='{"workout_name": "Arms", "exercises": [{"exercise_name": "Curl", "exercise_type": "strength"}]}')
+        with patch.object(ai_coach, "llm", model):
+            await ai_coach.suggest_workout("Quick upper body pump", "")
+            fresh_circuit._open()
+            result = await ai_coach.suggest_workout("upper body with dumbbells please", "")
+
+            with pytest.raises(CircuitOpen):
+                await ai_coach.suggest_workout("leg day", "")
+
+        assert result["source"] == "last_good"
+        assert result["workout"]["workout_name"] == "Arms"
+        assert model.calls == 1
+
+    async def test_plan_503_without_last_good(self, test_app, mock_db, fresh_circuit):
+        """Test the plan endpoint answers 503 with Retry-After when nothing similar is cached"""
+        mock_db.profiles.find_one = AsyncMock(return_value=None)
+        mock_db.ai_plan_cache.find_one = AsyncMock(return_value=None)
+        fresh_circuit._open()
+        with patch.object(plan_jobs, "plan_cache", PlanCache(10, 60, 60)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=test_app), base_url="http://test") as client:
+                response = await client.post("/api/ai-coach/generate-workout-plan", json={
+                    "goal": "maintain", "experience_level": "beginner", "days_per_week": 3,
+                    "equipment_available": [], "duration_per_session": 45,
+                })
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "30"
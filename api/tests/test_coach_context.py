@@ -0,0 +1,172 @@
+"""
+Test the concurrent, cached coach context loader
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app import ai_coach
+from app.coach_context import CoachContext, CoachContextCache, coach_context_cache, load_coach_context
+from app.llm import StubProvider
+from app.routers import measurements, profile
+from app.user_versions import bump_user_version, read_user_version
+from tests.conftest import TEST_USER_ID
+
+USER_ID = str(TEST_USER_ID)
+
+
+def slow(value, delay=0.05):
+    async def read(*args, **kwargs):
+        await asyncio.sleep(delay)
+        return value
+    return AsyncMock(side_effect=read)
+
+
+@pytest.fixture
+def context_db(mock_db):
+    mock_db.profiles.find_one = AsyncMock(return_value={"age": 30, "fitness_goal": "lose_weight"})
+    mock_db.measurements.find_one = AsyncMock(return_value={"weight_kg": 70.5})
+    for collection in (mock_db.workouts, mock_db.meals, mock_db.measurements):
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+            return_value=[{"_id": ObjectId()}, {"_id": ObjectId()}]
+        )
+    return mock_db
+
+
+class TestLoadCoachContext:
+    """Test the shared loader"""
+
+    async def test_renders_context(self, context_db):
+        """Test the loaded context renders every section and keeps the fitness goal"""
+        context = await load_coach_context(context_db, USER_ID)
+
+        assert "- Age: 30 years old" in context.text
+        assert "- Weight: 70.5 kg" in context.text
+        assert "Recent Workouts: 2 workouts logged" in context.text
+        assert "Recent Nutrition: 2 meals logged" in context.text
+        assert context.fitness_goal == "lose_weight"
+
+    async def test_reads_run_concurrently(self, context_db):
+        """Test the four reads overlap instead of running back to back"""
+        context_db.profiles.find_one = slow(None)
+        context_db.measurements.find_one = slow(None)
+        for collection in (context_db.workouts, context_db.meals):
+            collection.find.return_value.sort.return_value.limit.return_value.to_list = slow([])
+
+        started = time.perf_counter()
+        await load_coach_context(context_db, USER_ID)
+
+        assert time.perf_counter() - started < 0.15
+
+    async def test_reads_are_projected(self, context_db):
+        """Test each read asks only for the fields the prompt uses"""
+        await load_coach_context(context_db, USER_ID)
+
+        profile_projection = context_db.profiles.find_one.call_args.args[1]
+        assert profile_projection["_id"] == 0
+        assert "fitness_goal" in profile_projection and "target_calories" not in profile_projection
+        assert context_db.measurements.find_one.call_args.args[1] == {"_id": 0, "weight_kg": 1, "body_fat_pct": 1}
+        assert context_db.measurements.find_one.call_args.kwargs["sort"] == [("measurement_date", -1)]
+        assert context_db.workouts.find.call_args.args[1] == {"_id": 1}
+
+    async def test_repeat_load_is_cached(self, context_db):
+        """Test a second load for the same user does not touch the database"""
+        first = await load_coach_context(context_db, USER_ID)
+        second = await load_coach_context(context_db, USER_ID)
+
+        assert second == first
+        assert context_db.profiles.find_one.await_count == 1
+        assert context_db.workouts.find.call_count == 1
+
+
+class TestCoachContextCache:
+    """Test version checks"""
+
+    async def test_newer_version_forces_reload(self):
+        """Test a version bump drops only that user's context"""
+        cache = CoachContextCache(maxsize=10, ttl=60)
+        await cache.get_or_load("a", 0, AsyncMock(return_value=CoachContext("old", None)))
+        await cache.get_or_load("b", 0, AsyncMock(return_value=CoachContext("b", None)))
+
+        reloaded = await cache.get_or_load("a", 1, AsyncMock(return_value=CoachContext("new", None)))
+        untouched = await cache.get_or_load("b", 0, AsyncMock(return_value=CoachContext("other", None)))
+
+        assert reloaded.text == "new"
+        assert untouched.text == "b"
+        assert cache.stats()["stale"] == 1
+
+    async def test_load_racing_a_write_not_reused(self):
+        """Test a load that started before a write is replaced on the next read"""
+        cache = CoachContextCache(maxsize=10, ttl=60)
+
+        # A write lands while the version-0 reads are in flight
+        await cache.get_or_load("a", 0, AsyncMock(return_value=CoachContext("stale", None)))
+        fresh = await cache.get_or_load("a", 1, AsyncMock(return_value=CoachContext("fresh", None)))
+
+        assert fresh.text == "fresh"
+
+
+class TestWriteInvalidation:
+    """Test writes through the API make the cached context stale"""
+
+    @pytest.fixture
+    def warm_cache(self, context_db):
+        coach_context_cache._entries.set(USER_ID, (0, CoachContext("cached", None)))
+        return coach_context_cache
+
+    async def test_new_measurement(self, client: TestClient, context_db, warm_cache):
+        """Test logging a measurement invalidates the context"""
+        context_db.measurements.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+
+        with patch.object(measurements, "get_database", AsyncMock(return_value=context_db)):
+            response = client.post("/api/measurements", json={"weight_kg": 71})
+
+        assert response.status_code == 201
+        assert await read_user_version(context_db, USER_ID) == 1
+        assert (await load_coach_context(context_db, USER_ID)).text != "cached"
+
+    async def test_profile_update(self, client: TestClient, context_db, warm_cache):
+        """Test updating the profile invalidates the context"""
+        context_db.profiles.find_one_and_update = AsyncMock(return_value={
+            "user_id": USER_ID, "fitness_goal": "gain_muscle", "updated_at": "2026-01-01T00:00:00",
+        })
+
+        with patch.object(profile, "get_database", AsyncMock(return_value=context_db)):
+            response = client.patch("/api/profile", json={"fitness_goal": "gain_muscle"})
+
+        assert response.status_code == 200
+        assert (await load_coach_context(context_db, USER_ID)).text != "cached"
+
+    async def test_write_on_another_worker(self, context_db, warm_cache):
+        """Test a write handled by another process is seen through the shared version"""
+        assert (await load_coach_context(context_db, USER_ID)).text == "cached"
+
+        await bump_user_version(context_db, USER_ID)
+
+        assert (await load_coach_context(context_db, USER_ID)).text != "cached"
+        assert context_db.profiles.find_one.await_count == 1
+
+    async def test_failed_write_keeps_context(self, client: TestClient, context_db, warm_cache):
+        """Test a write that changes nothing leaves the cached context alone"""
+        context_db.workouts.delete_one = AsyncMock(return_value=SimpleNamespace(deleted_count=0))
+
+        response = client.delete(f"/api/workouts/{ObjectId()}")
+
+        assert response.status_code == 404
+        assert (await load_coach_context(context_db, USER_ID)).text == "cached"
+
+    def test_chat_turns_reuse_context(self, client: TestClient, context_db):
+        """Test repeated chat turns read the context from the database once"""
+        context_db.ai_conversations.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+        context_db.ai_conversations.find_one_and_update = AsyncMock(return_value=None)
+        with patch.object(ai_coach, "llm", StubProvider(latency_ms=0, distribution="fixed")):
+            for _ in range(3):
+                assert client.post("/api/ai-coach/chat", json={"message": "hi"}).status_code == 200
+
+        assert context_db.profiles.find_one.await_count == 1
+        assert context_db.measurements.find_one.await_count == 1
@@ -0,0 +1,202 @@
+"""
+Test server-side conversation memory and rolling summarization
+"""
+import copy
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app import ai_coach
+from app.ai_coach import ConcurrencyLimiter, build_chat_prompt
+from app.config import settings
+from app.conversations import compact_conversation, estimate_tokens, recent_turns_within
+from app.llm import LLMProvider
+from app.models import ChatMessage
+from tests.conftest import TEST_USER_ID
+
+
+class FakeConversations:
+    """In-memory stand-in for the ai_conversations collection"""
+
+    def __init__(self):
+        self.docs: dict[ObjectId, dict] = {}
+
+    def _match(self, doc, query):
+        return all(doc.get(field) == value for field, value in query.items())
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one(self, query):
+        for doc in self.docs.values():
+            if self._match(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        for doc in self.docs.values():
+            if self._match(doc, query):
+                doc["turns"].extend(copy.deepcopy(update["$push"]["turns"]["$each"]))
+                doc["turn_count"] += update["$inc"]["turn_count"]
+                doc.update(update["$set"])
+                return copy.deepcopy(doc)
+        return None
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if self._match(doc, query):
+                doc.update(copy.deepcopy(update["$set"]))
+                return SimpleNamespace(modified_count=1)
+        return SimpleNamespace(modified_count=0)
+
+
+class StubModel(LLMProvider):
+    """Answers chat prompts with a fixed reply and summary prompts with a fixed summary"""
+
+    def __init__(self, reply="x" * 400):
+        self.reply = reply
+        self.prompts = []
+
+    async def generate(self, prompt, endpoint):
+        self.prompts.append(prompt)
+        return "SUMMARY: user wants to run a 10k" if endpoint == "summary" else self.reply
+
+    async def stream(self, prompt, endpoint):
+        yield await self.generate(prompt, endpoint)
+
+
+@pytest.fixture
+def conversations(mock_db):
+    store = FakeConversations()
+    mock_db.ai_conversations = store
+    mock_db.profiles.find_one = AsyncMock(return_value=None)
+    mock_db.measurements.find_one = AsyncMock(return_value=None)
+    for collection in (mock_db.workouts, mock_db.meals):
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+    return store
+
+
+@pytest.fixture
+def coach_model():
+    stub = StubModel()
+    with patch.object(ai_coach, "llm", stub), \
+            patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(10, 10, 5)):
+        yield stub
+
+
+class TestPromptBudget:
+    """Test the prompt stays bounded"""
+
+    def test_recent_turns_fit_budget(self):
+        """Test only the newest turns that fit are kept, in order"""
+        turns = [ChatMessage(role="user", content=f"{i}" * 40) for i in range(10)]
+        kept = recent_turns_within(turns, budget=35)
+        assert [t.content[0] for t in kept] == ["7", "8", "9"]
+
+    def test_prompt_bounded_for_long_history(self):
+        """Test prompt size does not grow with the length of the history"""
+        turn = ChatMessage(role="user", content="I want to get stronger. " * 10)
+        short = build_chat_prompt("hi", "", [turn] * 50)
+        long = build_chat_prompt("hi", "", [turn] * 5000)
+        assert len(long) == len(short)
+        assert estimate_tokens(long) < settings.chat_history_token_budget + 500
+
+    def test_summary_included(self):
+        """Test the running summary is part of the prompt"""
+        assert "Training for a marathon" in build_chat_prompt("hi", "", [], summary="Training for a marathon")
+
+
+class TestConversationStore:
+    """Test chat turns are persisted and compacted server-side"""
+
+    def test_new_conversation_returns_id(self, client: TestClient, conversations, coach_model):
+        """Test a chat without an id starts a conversation and stores both turns"""
+        response = client.post("/api/ai-coach/chat", json={"message": "Hello coach"})
+
+        assert response.status_code == 200
+        conversation_id = response.json()["conversation_id"]
+        doc = conversations.docs[ObjectId(conversation_id)]
+        assert doc["user_id"] == str(TEST_USER_ID)
+        assert [t["role"] for t in doc["turns"]] == ["user", "assistant"]
+        assert doc["turns"][0]["content"] == "Hello coach"
+
+    def test_follow_up_uses_stored_history(self, client: TestClient, conversations, coach_model):
+        """Test the stored turns feed the next prompt without client history"""
+        first = client.post("/api/ai-coach/chat", json={"message": "My knee hurts when I squat"})
+        client.post("/api/ai-coach/chat", json={
+            "message": "What should I do instead?",
+            "conversation_id": first.json()["conversation_id"],
+        })
+
+        assert "My knee hurts when I squat" in coach_model.prompts[-1]
+
+    def test_unknown_conversation_404(self, client: TestClient, conversations, coach_model):
+        """Test another user's or a missing conversation is not found"""
+        response = client.post("/api/ai-coach/chat", json={"message": "hi", "conversation_id": str(ObjectId())})
+        assert response.status_code == 404
+
+    def test_malformed_conversation_id(self, client: TestClient, conversations, coach_model):
+        """Test a malformed id is not found on read and rejected on delete"""
+        assert client.get("/api/ai-coach/conversations/not-an-id").status_code == 404
+        assert client.delete("/api/ai-coach/conversations/not-an-id").status_code == 400
+
+    def test_delete_database_error_propagates(self, client: TestClient, conversations, coach_model):
+        """Test a failing delete is a server error, not an invalid id"""
+        conversations.delete_one = AsyncMock(side_effect=RuntimeError("connection lost"))
+
+        with pytest.raises(RuntimeError):
+            client.delete(f"/api/ai-coach/conversations/{ObjectId()}")
+
+    def test_old_turns_compacted_into_summary(self, client: TestClient, conversations, coach_model):
+        """Test exceeding the budget folds older turns into the summary"""
+        with patch.object(settings, "chat_history_token_budget", 300):
+            conversation_id = None
+            for i in range(6):
+                response = client.post("/api/ai-coach/chat", json={
+                    "message": f"turn {i}", "conversation_id": conversation_id,
+                })
+                conversation_id = response.json()["conversation_id"]
+
+            stored = client.get(f"/api/ai-coach/conversations/{conversation_id}").json()
+
+        assert stored["summary"] == "SUMMARY: user wants to run a 10k"
+        assert stored["summarized_turns"] > 0
+        assert stored["summarized_turns"] + len(stored["turns"]) == 12
+        assert sum(estimate_tokens(t["content"]) for t in stored["turns"]) <= 300
+        assert "SUMMARY: user wants to run a 10k" in coach_model.prompts[-2]
+
+
+class TestCompaction:
+    """Test compaction edge cases"""
+
+    async def test_concurrent_append_skips_compaction(self):
+        """Test compaction is a no-op if a turn was appended meanwhile"""
+        store = FakeConversations()
+        db = SimpleNamespace(ai_conversations=store)
+        turns = [{"role": "user", "content": "y" * 4000, "timestamp": None}] * 3
+        await store.insert_one({"user_id": "u", "turns": list(turns), "turn_count": 3, "summary": None})
+        conversation_id = next(iter(store.docs))
+
+        async def summarize(previous, older):
+            store.docs[conversation_id]["turn_count"] += 1
+            return "summary"
+
+        assert await compact_conversation(db, conversation_id, summarize) is False
+        assert store.docs[conversation_id]["summary"] is None
+
+    async def test_summarizer_failure_keeps_turns(self):
+        """Test a failed summary leaves the conversation untouched"""
+        store = FakeConversations()
+        db = SimpleNamespace(ai_conversations=store)
+        await store.insert_one({"user_id": "u", "turns": [{"role": "user", "content": "y" * 20000}] * 2,
+                                "turn_count": 2, "summary": None})
+
+        summarize = AsyncMock(side_effect=RuntimeError("model down"))
+
+        assert await compact_conversation(db, next(iter(store.docs)), summarize) is False
+        assert len(next(iter(store.docs.values()))["turns"]) == 2
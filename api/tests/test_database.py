@@ -0,0 +1,54 @@
+"""
+Test MongoDB client configuration and pool metrics
+"""
+from types import SimpleNamespace
+from pymongo import monitoring
+from app.config import settings
+from app.database import PoolMetricsListener, client_options
+
+
+class TestClientOptions:
+    """Test that pool settings reach the Motor client"""
+
+    def test_pool_settings_applied(self):
+        """Test pool sizing and timeouts come from Settings"""
+        options = client_options()
+
+        assert options["maxPoolSize"] == settings.mongodb_max_pool_size
+        assert options["minPoolSize"] == settings.mongodb_min_pool_size
+        assert options["waitQueueTimeoutMS"] == settings.mongodb_wait_queue_timeout_ms
+        assert options["retryWrites"] == settings.mongodb_retry_writes
+
+
+class TestPoolMetricsListener:
+    """Test CMAP event accounting"""
+
+    def test_checkout_and_checkin(self):
+        """Test checked-out gauge and wait time tracking"""
+        listener = PoolMetricsListener()
+        event = SimpleNamespace(address=("localhost", 27017), connection_id=1, duration=0.004)
+
+        listener.connection_checked_out(event)
+        listener.connection_checked_out(event)
+        listener.connection_checked_in(event)
+
+        stats = listener.stats()
+        assert stats["checked_out"] == 1
+        assert stats["max_checked_out"] == 2
+        assert stats["avg_wait_ms"] == 4.0
+
+    def test_pool_exhaustion_counted(self):
+        """Test wait-queue timeouts are reported as pool exhaustion"""
+        listener = PoolMetricsListener()
+        event = SimpleNamespace(
+            address=("localhost", 27017),
+            connection_id=None,
+            duration=0.5,
+            reason=monitoring.ConnectionCheckOutFailedReason.TIMEOUT,
+        )
+
+        listener.connection_check_out_failed(event)
+
+        stats = listener.stats()
+        assert stats["pool_exhausted"] == 1
+        assert stats["checkout_failures"] == 1
@@ -0,0 +1,93 @@
+"""
+Test streaming account export
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+from bson import ObjectId
+
+
+class FakeCursor:
+    """Minimal async Motor cursor over a list of documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.batch = None
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return dict(next(self._iter))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def collections_with(**documents):
+    cursors = {name: FakeCursor(docs) for name, docs in documents.items()}
+    database = MagicMock()
+    database.__getitem__.side_effect = lambda name: MagicMock(
+        find=MagicMock(return_value=cursors.get(name, FakeCursor([])))
+    )
+    return database, cursors
+
+
+MEAL = {
+    "_id": ObjectId(), "meal_date": datetime(2025, 5, 1, 12), "meal_type": "lunch",
+    "total_calories": 450.0, "total_protein_g": 40.0, "total_carbs_g": 45.0, "total_fat_g": 8.0,
+    "foods": [{"food_name": "Rice", "calories": 200}], "notes": None, "created_at": datetime(2025, 5, 1, 12)
+}
+WORKOUT = {
+    "_id": ObjectId(), "workout_date": datetime(2025, 5, 2), "workout_name": "Push",
+    "exercises": [], "created_at": datetime(2025, 5, 2)
+}
+
+
+class TestExport:
+    """Test NDJSON and CSV export streams"""
+
+    def test_ndjson_export(self, client, mock_db):
+        """Test each document becomes one tagged JSON line"""
+        database, cursors = collections_with(meals=[MEAL], workouts=[WORKOUT])
+        mock_db.__getitem__.side_effect = database.__getitem__.side_effect
+
+        response = client.get("/api/export", params={"collections": "workouts,meals"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["collection"] for line in lines] == ["workouts", "meals"]
+        assert lines[1]["id"] == str(MEAL["_id"])
+        assert lines[1]["meal_date"] == "2025-05-01T12:00:00"
+        assert cursors["meals"].batch is not None
+
+    def test_csv_export_gzip(self, client, mock_db):
+        """Test CSV sections are produced and gzip-compressed on the fly"""
+        database, _ = collections_with(meals=[MEAL])
+        mock_db.__getitem__.side_effect = database.__getitem__.side_effect
+
+        response = client.get("/api/export", params={"format": "csv", "collections": "meals", "gzip": "true"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+        assert rows[0][:3] == ["collection", "id", "meal_date"]
+        assert rows[1][0] == "meals"
+        assert json.loads(rows[1][rows[0].index("foods")]) == MEAL["foods"]
+
+    def test_unknown_collection_rejected(self, client, mock_db):
+        """Test an unknown collection name is a client error"""
+        response = client.get("/api/export", params={"collections": "users"})
+        assert response.status_code == 400
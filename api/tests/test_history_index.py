@@ -0,0 +1,287 @@
+"""
+Test per-user retrieval over logged workouts, meals and measurements
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app import ai_coach, history_index as history_index_module
+from app.history_index import (
+    HistoryIndex,
+    SearchHit,
+    UserIndex,
+    fit_to_budget,
+    history_index,
+    relevant_history,
+    render_record,
+    tokenize,
+)
+from app.llm import LLMProvider
+from app.user_versions import bump_user_version
+from tests.conftest import TEST_USER_ID
+
+USER_ID = str(TEST_USER_ID)
+
+
+def workout(day, name, *exercises):
+    return {
+        "_id": ObjectId(),
+        "workout_name": name,
+        "workout_date": datetime(2026, 5, day),
+        "exercises": [
+            {"exercise_name": exercise, "exercise_type": "strength", "sets": 3, "reps": 8, "weight_kg": weight}
+            for exercise, weight in exercises
+        ],
+    }
+
+
+WORKOUTS = [
+    workout(1, "Push", ("Bench Press", 60), ("Overhead Press", 35)),
+    workout(3, "Legs", ("Squat", 80), ("Lunges", 20)),
+    workout(8, "Push", ("Bench Press", 65), ("Dips", 0)),
+]
+MEALS = [{
+    "_id": ObjectId(), "meal_type": "breakfast", "meal_date": datetime(2026, 5, 2),
+    "foods": [{"food_name": "Oatmeal"}, {"food_name": "Banana"}], "total_calories": 420.4, "total_protein_g": 12,
+}]
+MEASUREMENTS = [{"_id": ObjectId(), "weight_kg": 72.5, "body_fat_pct": 18.0, "measurement_date": datetime(2026, 5, 4)}]
+
+
+def history_db(mock_db, workouts=WORKOUTS, meals=MEALS, measurements=MEASUREMENTS):
+    for collection, documents in (
+        (mock_db.workouts, workouts), (mock_db.meals, meals), (mock_db.measurements, measurements),
+    ):
+        collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=documents)
+    return mock_db
+
+
+def indexed(*documents):
+    index = UserIndex()
+    for kind, document in documents:
+        index.add(f"{kind}:{document['_id']}", render_record(kind, document), document.get("workout_date"))
+    return index
+
+
+class TestRendering:
+    """Test records become short searchable lines"""
+
+    def test_tokenize(self):
+        """Test stopwords are dropped and plurals folded"""
+        assert tokenize("How have my Squats gone?") == ["squat", "gone"]
+        assert tokenize("press 72.5 kg") == ["press", "72.5", "kg"]
+
+    def test_render_each_kind(self):
+        """Test workouts, meals and measurements render their key numbers"""
+        assert render_record("workout", WORKOUTS[0]) == \
+            "2026-05-01 workout Push: Bench Press 3x8 @ 60 kg; Overhead Press 3x8 @ 35 kg"
+        assert render_record("meal", MEALS[0]) == \
+            "2026-05-02 meal breakfast: Oatmeal, Banana (420 kcal, 12 g protein)"
+        assert render_record("measurement", MEASUREMENTS[0]) == \
+            "2026-05-04 measurement: weight 72.5 kg, body fat 18%"
+
+
+class TestUserIndex:
+    """Test BM25 scoring and incremental updates"""
+
+    def test_ranks_matching_records(self):
+        """Test a bench question returns the bench workouts, not leg day"""
+        index = indexed(*(("workout", w) for w in WORKOUTS))
+
+        hits = index.search("how has my bench progressed?", k=5)
+
+        assert sorted(hit.date.day for hit in hits) == [1, 8]
+        assert all("Bench Press" in hit.line for hit in hits)
+
+    def test_top_k(self):
+        """Test only the k best records come back, best first"""
+        index = indexed(*(("workout", w) for w in WORKOUTS))
+
+        hits = index.search("press squat", k=1)
+
+        assert len(hits) == 1
+        assert hits[0].score == max(hit.score for hit in index.search("press squat", k=10))
+
+    def test_remove_and_replace(self):
+        """Test removed records stop matching and re-adding a key replaces it"""
+        index = indexed(*(("workout", w) for w in WORKOUTS))
+        index.remove(f"workout:{WORKOUTS[1]['_id']}")
+        assert index.search("squat", k=5) == []
+
+        index.add(f"workout:{WORKOUTS[0]['_id']}", "2026-05-01 workout Push: Incline Press", None)
+
+        assert len(index) == 2
+        assert [hit.line for hit in index.search("bench", k=5)] == [render_record("workout", WORKOUTS[2])]
+        assert len(index._lines) == 3  # the freed slot was reused
+
+    def test_no_match(self):
+        """Test a query sharing no terms with the history returns nothing"""
+        assert indexed(("workout", WORKOUTS[0])).search("swimming", k=5) == []
+
+
+class TestHistoryIndex:
+    """Test per-user index lifecycle"""
+
+    async def test_built_once_then_updated_on_write(self, mock_db):
+        """Test the index is read from the database once and kept current by writes"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+        await index.search(db, USER_ID, "bench", k=5)
+
+        new = workout(10, "Push", ("Bench Press", 70))
+        index.add(USER_ID, "workout", new["_id"], new, await bump_user_version(db, USER_ID))
+        hits = await index.search(db, USER_ID, "bench", k=5)
+
+        assert db.workouts.find.call_count == 1
+        assert db.workouts.find.return_value.sort.call_args.args[0] == [("workout_date", -1), ("_id", -1)]
+        assert any("@ 70 kg" in hit.line for hit in hits)
+        assert index.stats()["incremental_updates"] == 1
+
+    async def test_concurrent_first_searches_share_one_build(self, mock_db):
+        """Test simultaneous chats for a cold user trigger a single build"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+
+        await asyncio.gather(*(index.search(db, USER_ID, "bench", k=5) for _ in range(5)))
+
+        assert db.workouts.find.call_count == 1
+
+    async def test_write_during_build_not_cached(self, mock_db):
+        """Test an index that may have missed a concurrent write is rebuilt next time"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+        gate = asyncio.Event()
+
+        async def slow_workouts(length):
+            await gate.wait()
+            return WORKOUTS
+
+        db.workouts.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(side_effect=slow_workouts)
+        search = asyncio.create_task(index.search(db, USER_ID, "bench", k=5))
+        await asyncio.sleep(0.01)
+        index.remove(USER_ID, "workout", WORKOUTS[0]["_id"], await bump_user_version(db, USER_ID))
+        gate.set()
+        await search
+        await index.search(db, USER_ID, "bench", k=5)
+
+        assert db.workouts.find.call_count == 2
+
+    async def test_write_on_another_worker_rebuilds(self, mock_db):
+        """Test a write this process did not see makes the loaded index stale"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+        await index.search(db, USER_ID, "bench", k=5)
+
+        await bump_user_version(db, USER_ID)  # handled by another worker
+        await index.search(db, USER_ID, "bench", k=5)
+
+        assert db.workouts.find.call_count == 2
+        assert index.stats()["stale"] == 1
+
+    async def test_update_after_missed_write_drops_index(self, mock_db):
+        """Test an update that does not follow the loaded version is not applied in place"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+        await index.search(db, USER_ID, "bench", k=5)
+
+        await bump_user_version(db, USER_ID)  # handled by another worker
+        new = workout(10, "Push", ("Bench Press", 70))
+        index.add(USER_ID, "workout", new["_id"], new, await bump_user_version(db, USER_ID))
+        hits = await index.search(db, USER_ID, "bench", k=5)
+
+        assert index.stats()["incremental_updates"] == 0
+        assert db.workouts.find.call_count == 2
+        assert not any("@ 70 kg" in hit.line for hit in hits)
+
+    async def test_incremental_adds_keep_max_records(self, mock_db):
+        """Test adds evict the oldest record of their kind past max_records"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=3)
+        await index.search(db, USER_ID, "bench", k=5)
+
+        new = workout(10, "Push", ("Bench Press", 70))
+        index.add(USER_ID, "workout", new["_id"], new, await bump_user_version(db, USER_ID))
+        hits = await index.search(db, USER_ID, "press", k=10)
+
+        assert len(index._users.get(USER_ID)) == 3 + len(MEALS) + len(MEASUREMENTS)
+        assert not any("Overhead Press" in hit.line for hit in hits)
+        assert any("@ 70 kg" in hit.line for hit in hits)
+
+
+class TestChatRetrieval:
+    """Test chat pulls in relevant records within the budget"""
+
+    def test_budget_keeps_best_hits_oldest_first(self):
+        """Test lower-ranked hits are dropped once the budget is spent"""
+        hits = [
+            SearchHit("b" * 40, datetime(2026, 5, 8), 3.0),
+            SearchHit("a" * 40, datetime(2026, 5, 1), 2.0),
+            SearchHit("c" * 40, datetime(2026, 5, 9), 1.0),
+        ]
+
+        chosen = fit_to_budget(hits, token_budget=22)
+
+        assert [hit.line[0] for hit in chosen] == ["a", "b"]
+
+    async def test_relevant_history_survives_db_errors(self, mock_db):
+        """Test a failed build degrades to no retrieved history"""
+        mock_db.workouts.find.side_effect = RuntimeError("db down")
+
+        assert await relevant_history(mock_db, USER_ID, "bench") == ""
+
+    async def test_aware_write_ranks_with_stored_records(self, mock_db):
+        """Test a dated request body mixes with naive dates read from the database"""
+        db = history_db(mock_db)
+        index = HistoryIndex(max_users=10, ttl=60, max_records=100)
+        await index.search(db, USER_ID, "bench", k=5)
+        new = workout(10, "Push", ("Bench Press", 70))
+        new["workout_date"] = datetime(2026, 5, 10, 22, 0, tzinfo=timezone(timedelta(hours=-5)))
+        index.add(USER_ID, "workout", new["_id"], new, await bump_user_version(db, USER_ID))
+
+        with patch.object(history_index_module, "history_index", index):
+            lines = (await relevant_history(db, USER_ID, "bench press")).splitlines()
+
+        assert lines[-1].startswith("2026-05-11 workout Push: Bench Press 3x8 @ 70 kg")
+        assert len(lines) == 3
+
+    def test_chat_prompt_includes_matching_records(self, client: TestClient, mock_db):
+        """Test the chat prompt carries the matching records and leaves out the rest"""
+        db = history_db(mock_db)
+        db.profiles.find_one = AsyncMock(return_value=None)
+        db.measurements.find_one = AsyncMock(return_value=None)
+        db.ai_conversations.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+        db.ai_conversations.find_one_and_update = AsyncMock(return_value=None)
+
+        class RecordingModel(LLMProvider):
+            prompt = None
+
+            async def generate(self, prompt, endpoint):
+                RecordingModel.prompt = prompt
+                return "Nice progress!"
+
+            async def stream(self, prompt, endpoint):
+                yield await self.generate(prompt, endpoint)
+
+        with patch.object(ai_coach, "llm", RecordingModel()):
+            response = client.post("/api/ai-coach/chat", json={"message": "How has my bench progressed?"})
+
+        assert response.status_code == 200
+        assert "Bench Press 3x8 @ 60 kg" in RecordingModel.prompt
+        assert "Bench Press 3x8 @ 65 kg" in RecordingModel.prompt
+        assert "Squat" not in RecordingModel.prompt
+        assert "Oatmeal" not in RecordingModel.prompt
+
+    def test_new_workout_indexed_on_write(self, client: TestClient, mock_db):
+        """Test logging a workout updates a loaded index without a rebuild"""
+        history_index._users.set(USER_ID, UserIndex())
+        mock_db.workouts.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+
+        response = client.post("/api/workouts", json={
+            "workout_name": "Pull", "exercises": [{"exercise_name": "Deadlift", "exercise_type": "strength"}],
+        })
+
+        assert response.status_code == 200
+        assert "Deadlift" in history_index._users.get(USER_ID).search("deadlift", k=1)[0].line
@@ -0,0 +1,100 @@
+"""
+Test the MongoDB index registry and plan checks
+"""
+from collections import defaultdict
+from unittest.mock import AsyncMock, MagicMock
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.indexes import (
+    INDEXES,
+    RETIRED_INDEXES,
+    QueryShape,
+    ensure_indexes,
+    index_supports,
+    plan_has_collscan,
+    uncovered_queries,
+)
+
+
+class TestIndexCoverage:
+    """Test that registered indexes serve every router query"""
+
+    def test_all_router_queries_covered(self):
+        """Test that no router query shape lacks a supporting index"""
+        assert uncovered_queries() == []
+
+    def test_users_email_is_unique(self):
+        """Test that users.email is backed by a unique index"""
+        documents = [model.document for model in INDEXES["users"]]
+        assert any(doc.get("unique") and list(doc["key"]) == ["email"] for doc in documents)
+
+    def test_missing_index_is_reported(self):
+        """Test that a query without a matching index is flagged"""
+        shape = QueryShape("workouts", {"user_id": "u"}, [("workout_date", DESCENDING)])
+        indexes = {"workouts": [IndexModel([("user_id", ASCENDING)])]}
+
+        assert uncovered_queries(indexes, [shape]) == [shape]
+
+    def test_reverse_walk_supported(self):
+        """Test that an index can serve the opposite sort direction"""
+        keys = [("user_id", ASCENDING), ("meal_date", DESCENDING)]
+        shape = QueryShape("meals", {"user_id": "u"}, [("meal_date", ASCENDING)])
+
+        assert index_supports(keys, shape) is True
+
+    def test_sort_field_must_follow_equality_prefix(self):
+        """Test that a sort on a non-adjacent key is not considered covered"""
+        keys = [("meal_date", DESCENDING), ("user_id", ASCENDING)]
+        shape = QueryShape("meals", {"user_id": "u"}, [("meal_date", DESCENDING)])
+
+        assert index_supports(keys, shape) is False
+
+
+class TestPlanInspection:
+    """Test COLLSCAN detection in explain() output"""
+
+    def test_detects_nested_collscan(self):
+        """Test COLLSCAN below a SORT stage is detected"""
+        plan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+        assert plan_has_collscan(plan) is True
+
+    def test_ixscan_plan_passes(self):
+        """Test an index-backed plan is accepted"""
+        plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+        assert plan_has_collscan(plan) is False
+
+
+class TestEnsureIndexes:
+    """Test index creation and retired index cleanup at startup"""
+
+    @staticmethod
+    def database():
+        def collection():
+            coll = MagicMock()
+            coll.create_indexes = AsyncMock(return_value=["ok"])
+            coll.index_information = AsyncMock(return_value={"_id_": {}})
+            coll.drop_index = AsyncMock()
+            return coll
+        return defaultdict(collection)
+
+    async def test_retired_indexes_dropped(self):
+        """Test retired indexes still present are dropped"""
+        database = self.database()
+        database["meals"].index_information.return_value = {"_id_": {}, "user_meal_date": {}}
+
+        await ensure_indexes(database)
+
+        database["meals"].drop_index.assert_awaited_once_with("user_meal_date")
+        database["workouts"].drop_index.assert_not_awaited()
+
+    async def test_failed_drop_is_logged_not_raised(self):
+        """Test a failed drop does not stop startup or the other collections"""
+        database = self.database()
+        for collection, names in RETIRED_INDEXES.items():
+            database[collection].index_information.return_value = dict.fromkeys(names, {})
+        database["workouts"].drop_index.side_effect = OperationFailure("not authorized")
+
+        created = await ensure_indexes(database)
+
+        assert set(created) == set(INDEXES)
+        database["measurements"].drop_index.assert_awaited_once_with("user_measurement_date")
@@ -0,0 +1,64 @@
+"""
+Test incremental parsing of streamed JSON
+"""
+import json
+
+import pytest
+
+from app.json_stream import JSONItemStream, JSONStreamError
+
+WORKOUT = {
+    "workout_name": "Legs {and} \"glutes\"",
+    "exercises": [
+        {"exercise_name": "Squat", "tags": ["a", "b"], "notes": "Brace, then sit back ]"},
+        {"exercise_name": "Lunge", "sub": {"exercises": [{"exercise_name": "nested"}]}},
+    ],
+    "notes": "done",
+}
+
+
+def fed_char_by_char(text: str, array_key: str = "exercises") -> tuple[JSONItemStream, list[list]]:
+    stream = JSONItemStream(array_key)
+    return stream, [stream.feed(char) for char in text]
+
+
+class TestJSONItemStream:
+    """Test array items are handed back as soon as they close"""
+
+    def test_items_complete_at_their_closing_brace(self):
+        """Test each item is returned by the chunk that closes it, whatever the chunking"""
+        text = json.dumps(WORKOUT)
+        stream, results = fed_char_by_char(text)
+
+        closed_at = [position for position, items in enumerate(results) if items]
+        assert [items for items in results if items] == [[WORKOUT["exercises"][0]], [WORKOUT["exercises"][1]]]
+        assert text[closed_at[0]] == "}" and text[closed_at[0] + 1] == ","
+        assert stream.finish() == WORKOUT
+
+    def test_whole_text_in_one_chunk(self):
+        """Test a single feed returns every item and nested arrays are not mistaken for the target"""
+        stream = JSONItemStream("exercises")
+
+        assert stream.feed(json.dumps(WORKOUT)) == WORKOUT["exercises"]
+        assert stream.finish() == WORKOUT
+
+    def test_leading_text_ignored(self):
+        """Test text before the object does not affect parsing"""
+        stream = JSONItemStream("exercises")
+        stream.feed('Sure! {"exercises": [{"x": 1}]}\n')
+
+        assert stream.finish() == {"exercises": [{"x": 1}]}
+
+    def test_incomplete_object(self):
+        """Test finishing before the object closes raises"""
+        stream = JSONItemStream("exercises")
+        assert stream.feed('{"exercises": [{"x": 1}, {"x"') == [{"x": 1}]
+
+        with pytest.raises(JSONStreamError):
+            stream.finish()
+
+    @pytest.mark.parametrize("text", ['{"exercises": [}]}', '{"a": 1} trailing', '{"exercises": [{"x": 01}]}'])
+    def test_malformed(self, text):
+        """Test mismatched brackets, trailing text and invalid items raise"""
+        with pytest.raises(JSONStreamError):
+            JSONItemStream("exercises").feed(text)
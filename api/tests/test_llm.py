@@ -0,0 +1,159 @@
+"""
+Test LLM provider selection and the offline stub backend
+"""
+import json
+import statistics
+import time
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from app.llm import GeminiProvider, InvalidModelOutput, LLMError, LLMProvider, StubProvider, Usage, create_provider, gemini_schema
+from app.models import WorkoutSuggestion
+
+
+class TestStubProvider:
+    """Test the load-testing stub backend"""
+
+    async def test_canned_suggestion_is_valid_workout_json(self):
+        """Test suggest_workout gets parseable JSON with exercises"""
+        provider = StubProvider(latency_ms=0, distribution="fixed", chunk_interval_ms=0)
+        workout = json.loads(await provider.generate("any prompt", endpoint="suggest"))
+        assert workout["workout_name"]
+        assert len(workout["exercises"]) >= 4
+
+    async def test_stream_cadence(self):
+        """Test streamed chunks reassemble the reply and follow the chunk interval"""
+        provider = StubProvider(latency_ms=20, distribution="fixed", chunk_interval_ms=10, chunk_chars=50)
+        started = time.perf_counter()
+        arrivals, chunks = [], []
+        async for chunk in provider.stream("hi", endpoint="chat"):
+            arrivals.append(time.perf_counter() - started)
+            chunks.append(chunk)
+
+        assert "".join(chunks) == provider.response_for("hi", "chat")
+        assert all(len(chunk) <= 50 for chunk in chunks)
+        assert arrivals[0] >= 0.02
+        assert arrivals[-1] >= 0.02 + 0.01 * (len(chunks) - 1)
+
+    async def test_output_cap(self):
+        """Test max_output_tokens truncates the canned reply"""
+        provider = StubProvider(latency_ms=0, distribution="fixed", chunk_interval_ms=0)
+        usage = Usage()
+        text = await provider.generate_with_usage("hi", "chat", usage, max_output_tokens=10)
+
+        assert len(text) <= 41
+        assert usage.response_tokens <= 11
+
+    def test_seeded_latency_is_reproducible(self):
+        """Test the same seed draws the same latency sequence"""
+        first = StubProvider(latency_ms=500, seed=7)
+        second = StubProvider(latency_ms=500, seed=7)
+        assert [first.sample_latency() for _ in range(20)] == [second.sample_latency() for _ in range(20)]
+
+    def test_lognormal_median(self):
+        """Test latency_ms is the median of the lognormal distribution"""
+        provider = StubProvider(latency_ms=800, distribution="lognormal", spread=0.5, seed=1)
+        median = statistics.median(provider.sample_latency() for _ in range(5000))
+        assert 0.75 < median < 0.85
+
+    def test_uniform_bounds(self):
+        """Test uniform latency stays within +/- spread of the centre"""
+        provider = StubProvider(latency_ms=100, distribution="uniform", spread=0.2, seed=1)
+        samples = [provider.sample_latency() for _ in range(1000)]
+        assert 0.08 <= min(samples) and max(samples) <= 0.12
+
+    async def test_error_rate(self):
+        """Test injected failures follow the configured rate"""
+        provider = StubProvider(latency_ms=0, distribution="fixed", chunk_interval_ms=0, error_rate=0.3, seed=3)
+        failures = 0
+        for _ in range(500):
+            try:
+                await provider.generate("hi", endpoint="chat")
+            except LLMError:
+                failures += 1
+        assert 100 < failures < 200
+
+    def test_unknown_distribution(self):
+        """Test a typo in the distribution name fails fast"""
+        with pytest.raises(ValueError):
+            StubProvider(distribution="normal")
+
+
+class TestCreateProvider:
+    """Test backend selection from settings"""
+
+    def test_stub_selected(self):
+        """Test the stub backend is built from its settings"""
+        assert isinstance(create_provider("stub"), StubProvider)
+
+    def test_gemini_selected(self):
+        """Test Gemini remains the default production backend"""
+        assert isinstance(create_provider("gemini"), GeminiProvider)
+
+    def test_unknown_provider(self):
+        """Test an unknown provider name fails fast"""
+        with pytest.raises(ValueError):
+            create_provider("openai")
+
+    def test_incomplete_provider_rejected(self):
+        """Test a backend must implement both generate and stream"""
+        class GenerateOnly(LLMProvider):
+            async def generate(self, prompt, endpoint):
+                return "ok"
+
+        with pytest.raises(TypeError):
+            GenerateOnly()
+
+
+class TestGeminiSchema:
+    """Test pydantic schemas are converted to what Gemini accepts"""
+
+    def test_suggestion_schema(self):
+        """Test refs are inlined, optionals become nullable and titles are dropped"""
+        schema = gemini_schema(WorkoutSuggestion.model_json_schema())
+        exercise = schema["properties"]["exercises"]["items"]
+
+        assert schema["required"] == ["workout_name", "exercises"]
+        assert exercise["properties"]["exercise_type"] == {
+            "type": "string", "enum": ["strength", "cardio", "flexibility", "sports"],
+        }
+        assert exercise["properties"]["sets"] == {"type": "integer", "nullable": True}
+        assert "$defs" not in schema and "title" not in exercise
+
+
+class EmptyResponse:
+    """A Gemini response whose candidate has no parts, as when thinking fills the output cap"""
+    usage_metadata = None
+    candidates = [SimpleNamespace(finish_reason=SimpleNamespace(name="MAX_TOKENS"))]
+
+    @property
+    def text(self):
+        raise ValueError("The `response.text` quick accessor only works when the response contains a valid `Part`")
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        yield self
+
+
+class TestGeminiEmptyOutput:
+    """Test an empty candidate is reported as invalid output, not returned as text"""
+
+    async def test_generate_raises(self):
+        """Test generate rejects a response without text"""
+        provider = GeminiProvider(api_key="test", model_name="gemini-test")
+        provider._model.generate_content_async = AsyncMock(return_value=EmptyResponse())
+
+        with pytest.raises(InvalidModelOutput, match="MAX_TOKENS"):
+            await provider.generate_with_usage("hi", "chat", Usage(), max_output_tokens=16)
+
+    async def test_stream_raises(self):
+        """Test a stream that ends without any text is rejected"""
+        provider = GeminiProvider(api_key="test", model_name="gemini-test")
+        provider._model.generate_content_async = AsyncMock(return_value=EmptyResponse())
+
+        with pytest.raises(InvalidModelOutput):
+            [chunk async for chunk in provider.stream_with_usage("hi", "chat", Usage())]
@@ -0,0 +1,264 @@
+"""
+Test nutrition summary endpoints
+"""
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from app.main import app
+from tests.conftest import TEST_USER_ID as USER_ID
+
+
+def aggregate_returning(documents):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=documents)
+    return MagicMock(return_value=cursor)
+
+
+class TestNutritionSummary:
+    """Test summaries served from the daily rollups"""
+
+    def test_today_summary_reads_rollup(self, mock_db):
+        """Test today's totals come from a single rollup document"""
+        mock_db.nutrition_daily.find_one = AsyncMock(return_value={
+            "total_calories": 1800.0,
+            "total_protein_g": 120.0,
+            "total_carbs_g": 200.0,
+            "total_fat_g": 60.0,
+            "meals_logged": 3
+        })
+
+        response = TestClient(app).get("/api/nutrition/summary/today")
+
+        assert response.status_code == 200
+        assert response.json()["total_calories"] == 1800.0
+        assert response.json()["meals_logged"] == 3
+        query = mock_db.nutrition_daily.find_one.call_args.args[0]
+        assert query["user_id"] == str(USER_ID)
+
+    def test_today_summary_without_meals(self, mock_db):
+        """Test an empty day returns zero totals"""
+        mock_db.nutrition_daily.find_one = AsyncMock(return_value=None)
+
+        response = TestClient(app).get("/api/nutrition/summary/today")
+
+        assert response.status_code == 200
+        assert response.json()["total_calories"] == 0
+        assert response.json()["meals_logged"] == 0
+
+    def test_monthly_summary_groups_rollups(self, mock_db):
+        """Test coarser buckets aggregate daily rollups server-side"""
+        mock_db.nutrition_daily.aggregate = aggregate_returning([
+            {"_id": datetime(2025, 5, 1), "total_calories": 52000.0, "total_protein_g": 3500.0,
+             "total_carbs_g": 6000.0, "total_fat_g": 1800.0, "meals_logged": 80},
+        ])
+
+        response = TestClient(app).get(
+            "/api/nutrition/summary",
+            params={"from": "2025-05-01", "to": "2025-06-01", "bucket": "month"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["bucket"] == "month"
+        assert data["periods"][0]["period_start"] == "2025-05-01T00:00:00"
+        assert data["periods"][0]["meals_logged"] == 80
+        pipeline = mock_db.nutrition_daily.aggregate.call_args.args[0]
+        assert pipeline[1]["$group"]["_id"]["$dateTrunc"]["unit"] == "month"
+
+    def test_range_summary_rejects_inverted_range(self, mock_db):
+        """Test 'to' must be after 'from'"""
+        response = TestClient(app).get(
+            "/api/nutrition/summary",
+            params={"from": "2025-06-01", "to": "2025-05-01"}
+        )
+        assert response.status_code == 400
+
+    def test_range_summary_aware_from(self, mock_db):
+        """Test a timezone-aware 'from' with the default 'to' is read as naive UTC"""
+        mock_db.nutrition_daily.find.return_value.sort.return_value.to_list = AsyncMock(return_value=[])
+        mock_db.nutrition_daily.aggregate = aggregate_returning([])
+
+        response = TestClient(app).get("/api/nutrition/summary", params={"from": "2025-05-01T00:00:00Z"})
+
+        assert response.status_code == 200
+        assert response.json()["from_date"] == "2025-05-01T00:00:00"
+
+    def test_range_summary_aware_from_naive_to(self, mock_db):
+        """Test mixing an aware 'from' with a naive 'to' compares both in UTC"""
+        mock_db.nutrition_daily.find.return_value.sort.return_value.to_list = AsyncMock(return_value=[])
+        mock_db.nutrition_daily.aggregate = aggregate_returning([])
+
+        response = TestClient(app).get(
+            "/api/nutrition/summary",
+            params={"from": "2025-05-01T02:00:00+02:00", "to": "2025-05-02T00:00:00", "bucket": "week"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["from_date"] == "2025-05-01T00:00:00"
+        assert response.json()["to_date"] == "2025-05-02T00:00:00"
+        match = mock_db.nutrition_daily.aggregate.call_args.args[0][0]["$match"]
+        assert match["day"] == {"$gte": datetime(2025, 5, 1), "$lt": datetime(2025, 5, 2)}
+
+
+class TestNutritionRollup:
+    """Test that meal writes keep nutrition_daily in step"""
+
+    def test_create_meal_increments_rollup(self, mock_db):
+        """Test logging a meal adds its totals to its day"""
+        mock_db.meals.insert_one = AsyncMock(return_value=MagicMock(inserted_id=ObjectId()))
+        mock_db.nutrition_daily.bulk_write = AsyncMock()
+
+        response = TestClient(app).post("/api/nutrition", json={
+            "meal_type": "lunch",
+            "meal_date": "2025-05-01T12:30:00",
+            "foods": [
+                {"food_name": "Rice", "calories": 200, "carbs_g": 45},
+                {"food_name": "Chicken", "calories": 250, "protein_g": 40, "fat_g": 8}
+            ]
+        })
+
+        assert response.status_code == 200
+        assert response.json()["total_calories"] == 450
+        ops = mock_db.nutrition_daily.bulk_write.call_args.args[0]
+        assert len(ops) == 1
+        assert ops[0]._filter == {"user_id": str(USER_ID), "day": datetime(2025, 5, 1)}
+        assert ops[0]._doc["$inc"]["total_calories"] == 450
+        assert ops[0]._doc["$inc"]["meals_logged"] == 1
+
+    def test_delete_meal_decrements_rollup(self, mock_db):
+        """Test deleting a meal subtracts its totals from its day"""
+        mock_db.meals.find_one_and_delete = AsyncMock(return_value={
+            "_id": ObjectId(), "meal_date": datetime(2025, 5, 1, 8), "total_calories": 300.0,
+            "total_protein_g": 20.0, "total_carbs_g": 30.0, "total_fat_g": 10.0
+        })
+        mock_db.nutrition_daily.bulk_write = AsyncMock()
+
+        response = TestClient(app).delete(f"/api/nutrition/{ObjectId()}")
+
+        assert response.status_code == 200
+        ops = mock_db.nutrition_daily.bulk_write.call_args.args[0]
+        assert ops[0]._doc["$inc"]["total_calories"] == -300.0
+        assert ops[0]._doc["$inc"]["meals_logged"] == -1
+
+    async def test_offset_meal_date_through_create_update_rebuild(self, mock_db):
+        """Test a meal_date with a UTC offset is filed under its UTC day everywhere"""
+        from app.nutrition_rollup import rebuild_user
+
+        meal_id = ObjectId()
+        mock_db.meals.insert_one = AsyncMock(return_value=MagicMock(inserted_id=meal_id))
+        mock_db.nutrition_daily.bulk_write = AsyncMock()
+        body = {
+            "meal_type": "dinner",
+            "meal_date": "2026-03-01T23:30:00-05:00",
+            "foods": [{"food_name": "Pasta", "calories": 600}]
+        }
+
+        created = TestClient(app).post("/api/nutrition", json=body)
+
+        stored = mock_db.meals.insert_one.call_args.args[0]
+        assert stored["meal_date"] == datetime(2026, 3, 2, 4, 30)
+        assert created.json()["meal_date"] == "2026-03-02T04:30:00"
+        create_op = mock_db.nutrition_daily.bulk_write.call_args.args[0][0]
+        assert create_op._filter["day"] == datetime(2026, 3, 2)
+
+        # The stored meal reads back naive; re-saving the same offset date is a same-day edit
+        mock_db.meals.find_one_and_update = AsyncMock(return_value={**stored, "_id": meal_id})
+        updated = TestClient(app).put(f"/api/nutrition/{meal_id}", json={
+            **body, "foods": [{"food_name": "Pasta", "calories": 700}]
+        })
+
+        assert updated.status_code == 200
+        assert mock_db.meals.find_one_and_update.call_args.args[1]["$set"]["meal_date"] == datetime(2026, 3, 2, 4, 30)
+        update_ops = mock_db.nutrition_daily.bulk_write.call_args.args[0]
+        assert len(update_ops) == 1
+        assert update_ops[0]._filter["day"] == datetime(2026, 3, 2)
+        assert update_ops[0]._doc["$inc"]["total_calories"] == 100.0
+        assert update_ops[0]._doc["$inc"]["meals_logged"] == 0
+
+        # $dateTrunc groups the stored meal under the same UTC day, so there is no drift
+        totals = {"total_calories": 700.0, "total_protein_g": 0.0, "total_carbs_g": 0.0, "total_fat_g": 0.0}
+        mock_db.meals.aggregate = aggregate_returning([{"_id": datetime(2026, 3, 2), "meals_logged": 1, **totals}])
+        mock_db.nutrition_daily.find.return_value.to_list = AsyncMock(return_value=[
+            {"_id": ObjectId(), "user_id": str(USER_ID), "day": update_ops[0]._filter["day"], "meals_logged": 1, **totals}
+        ])
+
+        assert await rebuild_user(mock_db, str(USER_ID), check_only=True) == 0
+
+
+class TestRollupOps:
+    """Test rollup delta folding"""
+
+    def test_moving_meal_between_days(self):
+        """Test a date change moves totals from the old day to the new one"""
+        from app.nutrition_rollup import rollup_ops
+
+        before = {"meal_date": datetime(2025, 5, 1, 9), "total_calories": 500.0}
+        after = {"meal_date": datetime(2025, 5, 2, 9), "total_calories": 600.0}
+
+        ops = {op._filter["day"]: op._doc["$inc"] for op in rollup_ops("u1", [(before, -1), (after, 1)])}
+
+        assert ops[datetime(2025, 5, 1)]["total_calories"] == -500.0
+        assert ops[datetime(2025, 5, 1)]["meals_logged"] == -1
+        assert ops[datetime(2025, 5, 2)]["total_calories"] == 600.0
+
+    def test_same_day_edit_is_single_delta(self):
+        """Test an edit within a day folds into one $inc"""
+        from app.nutrition_rollup import rollup_ops
+
+        before = {"meal_date": datetime(2025, 5, 1, 9), "total_calories": 500.0}
+        after = {"meal_date": datetime(2025, 5, 1, 10), "total_calories": 650.0}
+
+        ops = rollup_ops("u1", [(before, -1), (after, 1)])
+
+        assert len(ops) == 1
+        assert ops[0]._doc["$inc"]["total_calories"] == 150.0
+        assert ops[0]._doc["$inc"]["meals_logged"] == 0
+
+
+class TestMealUpdates:
+    """Test single-round-trip meal updates"""
+
+    def test_patch_add_foods_uses_inc(self, mock_db):
+        """Test appending foods pushes them and increments totals"""
+        meal_id = ObjectId()
+        before = {
+            "_id": meal_id, "user_id": str(USER_ID), "meal_type": "lunch",
+            "meal_date": datetime(2025, 5, 1, 12), "created_at": datetime(2025, 5, 1, 12),
+            "foods": [{"food_name": "Rice", "calories": 200.0, "carbs_g": 45.0}],
+            "total_calories": 200.0, "total_protein_g": 0, "total_carbs_g": 45.0, "total_fat_g": 0
+        }
+        mock_db.meals.find_one_and_update = AsyncMock(return_value=before)
+        mock_db.nutrition_daily.bulk_write = AsyncMock()
+
+        response = TestClient(app).patch(f"/api/nutrition/{meal_id}", json={
+            "add_foods": [{"food_name": "Chicken", "calories": 250, "protein_g": 40}]
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["foods"]) == 2
+        assert data["total_calories"] == 450.0
+        assert data["total_protein_g"] == 40.0
+
+        update = mock_db.meals.find_one_and_update.call_args.args[1]
+        assert "$set" not in update
+        assert update["$inc"]["total_calories"] == 250
+        assert update["$push"]["foods"]["$each"][0]["food_name"] == "Chicken"
+        ops = mock_db.nutrition_daily.bulk_write.call_args.args[0]
+        assert ops[0]._doc["$inc"]["total_calories"] == 250.0
+        assert ops[0]._doc["$inc"]["meals_logged"] == 0
+
+    def test_patch_without_changes_rejected(self, mock_db):
+        """Test an empty patch is a client error"""
+        response = TestClient(app).patch(f"/api/nutrition/{ObjectId()}", json={})
+        assert response.status_code == 400
+
+    def test_patch_invalid_id(self, mock_db):
+        """Test a malformed meal ID is rejected before querying"""
+        mock_db.meals.find_one_and_update = AsyncMock()
+
+        response = TestClient(app).patch("/api/nutrition/not-an-id", json={"notes": "x"})
+
+        assert response.status_code == 400
+        mock_db.meals.find_one_and_update.assert_not_awaited()
@@ -0,0 +1,108 @@
+"""
+Test keyset (cursor) pagination helpers
+"""
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+from app.pagination import decode_cursor, encode_cursor, fetch_page, keyset_filter
+
+
+class TestCursorEncoding:
+    """Test opaque cursor round trips"""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the position it encodes"""
+        date = datetime(2025, 3, 14, 9, 26, 53, 589000)
+        doc_id = ObjectId()
+
+        assert decode_cursor(encode_cursor(date, doc_id)) == (date, doc_id)
+
+    def test_round_trip_undated(self):
+        """Test that a cursor for a document without a date keeps only its _id"""
+        doc_id = ObjectId()
+
+        assert decode_cursor(encode_cursor(None, doc_id)) == (None, doc_id)
+
+    def test_cursor_is_url_safe(self):
+        """Test that cursors need no escaping in a query string"""
+        cursor = encode_cursor(datetime(2025, 1, 1), ObjectId())
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", encode_cursor(datetime(2025, 1, 1), ObjectId())[:-4]])
+    def test_malformed_cursor_rejected(self, cursor):
+        """Test that tampered cursors are a client error"""
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(cursor)
+        assert exc.value.status_code == 400
+
+
+class TestKeysetFilter:
+    """Test seek filter construction"""
+
+    def test_without_cursor_returns_base_filter(self):
+        """Test the first page uses the plain user filter"""
+        base = {"user_id": "u1"}
+        assert keyset_filter(base, "meal_date", None) == base
+
+    def test_seek_after_cursor(self):
+        """Test the filter resumes strictly after (date, _id)"""
+        date = datetime(2025, 5, 1, 12, 0)
+        doc_id = ObjectId()
+
+        query = keyset_filter({"user_id": "u1"}, "meal_date", encode_cursor(date, doc_id))
+
+        assert query["user_id"] == "u1"
+        assert {"meal_date": {"$lt": date}} in query["$or"]
+        assert {"meal_date": date, "_id": {"$lt": doc_id}} in query["$or"]
+
+    def test_dated_seek_reaches_undated_documents(self):
+        """Test that undated documents, which sort last, follow the dated ones"""
+        query = keyset_filter({"user_id": "u1"}, "meal_date", encode_cursor(datetime(2025, 5, 1), ObjectId()))
+
+        assert {"meal_date": None} in query["$or"]
+
+    def test_seek_after_undated_cursor(self):
+        """Test that an undated cursor seeks on _id among undated documents"""
+        doc_id = ObjectId()
+
+        query = keyset_filter({"user_id": "u1"}, "meal_date", encode_cursor(None, doc_id))
+
+        assert query == {"user_id": "u1", "meal_date": None, "_id": {"$lt": doc_id}}
+
+
+class TestFetchPage:
+    """Test next-cursor emission"""
+
+    @staticmethod
+    def collection(docs):
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.skip.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=docs)
+        collection = MagicMock()
+        collection.find.return_value = cursor
+        return collection
+
+    async def test_full_page_ending_undated_has_cursor(self):
+        """Test that a full page whose last document has no date still continues"""
+        docs = [
+            {"_id": ObjectId(), "meal_date": datetime(2025, 5, 1)},
+            {"_id": ObjectId(), "meal_date": None},
+            {"_id": ObjectId()},
+        ]
+
+        page, next_cursor = await fetch_page(self.collection(docs), {"user_id": "u1"}, "meal_date", limit=3)
+
+        assert page == docs
+        assert decode_cursor(next_cursor) == (None, docs[-1]["_id"])
+
+    async def test_short_page_has_no_cursor(self):
+        """Test that a page shorter than the limit is the last one"""
+        docs = [{"_id": ObjectId(), "meal_date": None}]
+
+        _, next_cursor = await fetch_page(self.collection(docs), {"user_id": "u1"}, "meal_date", limit=3)
+
+        assert next_cursor is None
@@ -0,0 +1,104 @@
+"""
+Test plan cache keys and tiers
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.models import WorkoutPlanRequest
+from app.plan_cache import PlanCache, age_band, plan_cache_key, profile_bucket
+
+
+def plan_request(**overrides):
+    data = {
+        "goal": "lose_weight", "experience_level": "beginner", "days_per_week": 3,
+        "equipment_available": ["dumbbells", "bench"], "duration_per_session": 45,
+    }
+    data.update(overrides)
+    return WorkoutPlanRequest(**data)
+
+
+class TestPlanCacheKey:
+    """Test request normalization and profile bucketing"""
+
+    def test_equipment_order_and_case_ignored(self):
+        """Test equivalent equipment lists share a key"""
+        bucket = profile_bucket({"age": 25, "sex": "male", "activity_level": "moderate"})
+        assert plan_cache_key(plan_request(), bucket) == plan_cache_key(
+            plan_request(equipment_available=[" Bench", "DUMBBELLS", "bench"], experience_level="Beginner "),
+            bucket,
+        )
+
+    def test_profile_bucket_changes_key(self):
+        """Test users in different age bands get different plans"""
+        young = profile_bucket({"age": 25, "sex": "male", "activity_level": "moderate"})
+        older = profile_bucket({"age": 52, "sex": "male", "activity_level": "moderate"})
+        assert plan_cache_key(plan_request(), young) != plan_cache_key(plan_request(), older)
+
+    def test_bucket_ignores_identifying_fields(self):
+        """Test weights and exact age never reach the bucket"""
+        bucket = profile_bucket({"age": 27, "sex": "male", "activity_level": "light", "current_weight_kg": 90})
+        assert bucket == {"age_band": "18-29", "sex": "male", "activity_level": "light"}
+
+    def test_age_bands(self):
+        """Test band boundaries"""
+        assert age_band(None) is None
+        assert age_band(17) == "under 18"
+        assert age_band(30) == "30-39"
+        assert age_band(75) == "60+"
+
+
+class TestPlanCacheTiers:
+    """Test memory and MongoDB tiers"""
+
+    async def test_store_hit_warms_memory(self):
+        """Test a MongoDB hit is promoted to the in-memory tier"""
+        db = MagicMock()
+        db.ai_plan_cache.find_one = AsyncMock(return_value={
+            "_id": "k", "plan": {"plan_name": "Cached"}, "expires_at": datetime.utcnow() + timedelta(days=1),
+        })
+        cache = PlanCache(10, 60, 3600)
+
+        assert (await cache.get(db, "k"))["plan_name"] == "Cached"
+        assert (await cache.get(db, "k"))["plan_name"] == "Cached"
+
+        db.ai_plan_cache.find_one.assert_awaited_once()
+        stats = cache.stats()
+        assert (stats["store_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+    async def test_store_errors_are_misses(self):
+        """Test an unreachable store degrades to a miss instead of failing"""
+        db = MagicMock()
+        db.ai_plan_cache.find_one = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+        db.ai_plan_cache.replace_one = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+        cache = PlanCache(10, 60, 3600)
+
+        assert await cache.get(db, "k") is None
+        await cache.put(db, "k", {"plan_name": "Fresh"})
+
+        assert cache.stats()["store_errors"] == 2
+        assert (await cache.get(db, "k"))["plan_name"] == "Fresh"
+
+    async def test_returned_plans_are_copies(self):
+        """Test callers cannot mutate the cached plan"""
+        db = MagicMock()
+        db.ai_plan_cache.replace_one = AsyncMock()
+        cache = PlanCache(10, 60, 3600)
+        await cache.put(db, "k", {"plan_name": "Fresh"})
+
+        (await cache.get(db, "k"))["plan_name"] = "Mutated"
+        assert (await cache.get(db, "k"))["plan_name"] == "Fresh"
+
+    async def test_served_plan_has_fresh_created_at(self):
+        """Test a cache hit is stamped when served, not with its generation time"""
+        db = MagicMock()
+        db.ai_plan_cache.replace_one = AsyncMock()
+        cache = PlanCache(10, 60, 3600)
+        await cache.put(db, "k", {"plan_name": "Fresh", "created_at": datetime(2020, 1, 1)})
+
+        stored = db.ai_plan_cache.replace_one.call_args.args[1]["plan"]
+        served = await cache.get(db, "k")
+
+        assert "created_at" not in stored
+        assert served["created_at"] > datetime(2020, 1, 1)
@@ -0,0 +1,311 @@
+"""
+Test background workout-plan jobs
+"""
+import asyncio
+import copy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from app import plan_jobs
+from app.ai_coach import CoachBusy
+from app.config import settings
+from app.main import app
+from app.models import WorkoutPlanRequest
+from app.plan_cache import PlanCache
+from app.plan_jobs import PlanJobWorkers, claim_job, enqueue_plan_job, run_job
+from tests.conftest import TEST_USER_ID
+
+PLAN = {
+    "plan_name": "3-Day Maintain Plan",
+    "description": "Plan",
+    "duration_weeks": 4,
+    "ai_generated_plan": "Day 1: squats",
+    "created_at": datetime(2026, 1, 1),
+}
+
+PLAN_REQUEST = {
+    "goal": "maintain",
+    "experience_level": "beginner",
+    "days_per_week": 3,
+    "equipment_available": ["dumbbells"],
+    "duration_per_session": 45,
+}
+
+
+class FakeCollection:
+    """In-memory stand-in for the ai_jobs and workout_plans collections"""
+
+    def __init__(self):
+        self.docs: dict[ObjectId, dict] = {}
+
+    OPERATORS = {
+        "$lt": lambda actual, bound: actual is not None and actual < bound,
+        "$gt": lambda actual, bound: actual is not None and actual > bound,
+        "$gte": lambda actual, bound: actual is not None and actual >= bound,
+    }
+
+    def _test(self, actual, condition):
+        if not isinstance(condition, dict):
+            return actual == condition
+        for operator, bound in condition.items():
+            if operator == "$not":
+                if self._test(actual, bound):
+                    return False
+            elif not self.OPERATORS[operator](actual, bound):
+                return False
+        return True
+
+    def _match(self, doc, query):
+        return all(self._test(doc.get(field), condition) for field, condition in query.items())
+
+    def _apply(self, doc, update):
+        doc.update(copy.deepcopy(update["$set"]))
+        for name, amount in update.get("$inc", {}).items():
+            doc[name] = doc.get(name, 0) + amount
+        for name in update.get("$unset", {}):
+            doc.pop(name, None)
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = copy.deepcopy(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one(self, query):
+        for doc in self.docs.values():
+            if self._match(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        matches = [doc for doc in self.docs.values() if self._match(doc, query)]
+        if not matches:
+            return None
+        field = sort[0][0]
+        doc = min(matches, key=lambda d: d[field])
+        self._apply(doc, update)
+        return copy.deepcopy(doc)
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if self._match(doc, query):
+                self._apply(doc, update)
+                return SimpleNamespace(modified_count=1)
+        return SimpleNamespace(modified_count=0)
+
+    async def update_many(self, query, update):
+        matches = [doc for doc in self.docs.values() if self._match(doc, query)]
+        for doc in matches:
+            self._apply(doc, update)
+        return SimpleNamespace(modified_count=len(matches))
+
+
+@pytest.fixture
+def job_db(mock_db):
+    mock_db.ai_jobs = FakeCollection()
+    mock_db.workout_plans = FakeCollection()
+    mock_db.profiles.find_one = AsyncMock(return_value={"age": 30, "sex": "female", "activity_level": "moderate"})
+    mock_db.ai_plan_cache.find_one = AsyncMock(return_value=None)
+    mock_db.ai_plan_cache.replace_one = AsyncMock()
+    with patch.object(plan_jobs, "plan_cache", PlanCache(10, 60, 60)):
+        yield mock_db
+
+
+async def queued_job(db, user_id=str(TEST_USER_ID)):
+    return await enqueue_plan_job(db, user_id, WorkoutPlanRequest(**PLAN_REQUEST))
+
+
+class TestClaim:
+    """Test workers claim jobs atomically under a lease"""
+
+    async def test_claims_oldest_queued_once(self, job_db):
+        """Test the oldest queued job is claimed and not handed out twice"""
+        first = await queued_job(job_db)
+        await queued_job(job_db)
+
+        claimed = await claim_job(job_db, "w1", lease_seconds=60)
+
+        assert claimed["_id"] == first["_id"]
+        assert claimed["status"] == "running"
+        assert claimed["attempts"] == 1
+        assert (await claim_job(job_db, "w2", lease_seconds=60))["_id"] != first["_id"]
+        assert await claim_job(job_db, "w3", lease_seconds=60) is None
+
+    async def test_expired_lease_reclaimed(self, job_db):
+        """Test a job whose worker died is picked up again after its lease"""
+        job = await queued_job(job_db)
+        await claim_job(job_db, "dead", lease_seconds=60)
+        assert await claim_job(job_db, "w2", lease_seconds=60) is None
+
+        job_db.ai_jobs.docs[job["_id"]]["lease_expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        reclaimed = await claim_job(job_db, "w2", lease_seconds=60)
+
+        assert reclaimed["worker"] == "w2"
+        assert reclaimed["attempts"] == 2
+
+    async def test_expired_lease_on_last_attempt_fails(self, job_db):
+        """Test a job that keeps outliving its lease is failed, not retried forever"""
+        job = await queued_job(job_db)
+        with patch.object(settings, "plan_job_max_attempts", 1):
+            await claim_job(job_db, "dead", lease_seconds=60)
+            job_db.ai_jobs.docs[job["_id"]]["lease_expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+            assert await claim_job(job_db, "w2", lease_seconds=60) is None
+
+        stored = job_db.ai_jobs.docs[job["_id"]]
+        assert stored["status"] == "failed"
+        assert stored["attempts"] == 1
+        assert "lease_expires_at" not in stored
+
+    async def test_legacy_job_without_not_before_claimed(self, job_db):
+        """Test jobs queued before retry backoff existed are still picked up"""
+        job = await queued_job(job_db)
+        del job_db.ai_jobs.docs[job["_id"]]["not_before"]
+
+        assert (await claim_job(job_db, "w1", lease_seconds=60))["_id"] == job["_id"]
+
+
+class TestRunJob:
+    """Test job outcomes"""
+
+    async def test_success_stores_plan(self, job_db):
+        """Test a finished job links to its stored plan"""
+        job = await queued_job(job_db)
+        claimed = await claim_job(job_db, "w1", lease_seconds=60)
+        with patch.object(plan_jobs, "generate_workout_plan", AsyncMock(return_value=dict(PLAN))):
+            assert await run_job(job_db, claimed) == "succeeded"
+
+        stored = job_db.ai_jobs.docs[job["_id"]]
+        plan = job_db.workout_plans.docs[stored["plan_id"]]
+        assert plan["user_id"] == str(TEST_USER_ID)
+        assert plan["ai_generated_plan"] == "Day 1: squats"
+        assert plan["created_at"] > PLAN["created_at"]
+        assert "lease_expires_at" not in stored
+
+    async def test_busy_requeued_until_attempts_run_out(self, job_db):
+        """Test capacity errors retry the job, then fail it"""
+        job = await queued_job(job_db)
+        busy = AsyncMock(side_effect=CoachBusy("AI coach is busy"))
+        with patch.object(plan_jobs, "generate_workout_plan", busy), \
+                patch.object(settings, "plan_job_max_attempts", 2), \
+                patch.object(settings, "plan_job_retry_backoff_seconds", 0):
+            assert await run_job(job_db, await claim_job(job_db, "w1", 60)) == "queued"
+            assert await run_job(job_db, await claim_job(job_db, "w1", 60)) == "failed"
+
+        stored = job_db.ai_jobs.docs[job["_id"]]
+        assert stored["status"] == "failed"
+        assert stored["error"] == "AI coach is busy"
+
+    async def test_requeued_job_backs_off(self, job_db):
+        """Test a transiently failed job is not claimable until its backoff passes"""
+        job = await queued_job(job_db)
+        busy = AsyncMock(side_effect=CoachBusy("AI coach is busy"))
+        with patch.object(plan_jobs, "generate_workout_plan", busy), \
+                patch.object(settings, "plan_job_retry_backoff_seconds", 30):
+            assert await run_job(job_db, await claim_job(job_db, "w1", 60)) == "queued"
+
+        assert await claim_job(job_db, "w1", 60) is None
+        assert job_db.ai_jobs.docs[job["_id"]]["not_before"] > datetime.utcnow() + timedelta(seconds=25)
+
+        job_db.ai_jobs.docs[job["_id"]]["not_before"] = datetime.utcnow() - timedelta(seconds=1)
+        assert (await claim_job(job_db, "w1", 60))["attempts"] == 2
+
+    async def test_stale_worker_cannot_finish(self, job_db):
+        """Test a worker that lost its lease does not overwrite the new owner"""
+        job = await queued_job(job_db)
+        stale = await claim_job(job_db, "w1", lease_seconds=60)
+        job_db.ai_jobs.docs[job["_id"]]["lease_expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        await claim_job(job_db, "w2", lease_seconds=60)
+
+        with patch.object(plan_jobs, "generate_workout_plan", AsyncMock(side_effect=RuntimeError("boom"))):
+            await run_job(job_db, stale)
+
+        assert job_db.ai_jobs.docs[job["_id"]]["status"] == "running"
+
+    async def test_worker_pool_drains_queue(self, job_db):
+        """Test started workers pick up an enqueued job without polling delay"""
+        workers = PlanJobWorkers(concurrency=2, poll_interval=30, lease_seconds=60)
+        with patch.object(plan_jobs, "plan_workers", workers), \
+                patch.object(plan_jobs, "get_database", AsyncMock(return_value=job_db)), \
+                patch.object(plan_jobs, "generate_workout_plan", AsyncMock(return_value=dict(PLAN))):
+            workers.start()
+            try:
+                job = await queued_job(job_db)
+                for _ in range(100):
+                    if job_db.ai_jobs.docs[job["_id"]]["status"] == "succeeded":
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await workers.stop()
+
+        assert job_db.ai_jobs.docs[job["_id"]]["status"] == "succeeded"
+        assert workers.stats()["outcomes"] == {"succeeded": 1}
+
+
+class TestJobEndpoints:
+    """Test the job and stored plan endpoints"""
+
+    def test_create_job_returns_immediately(self, client: TestClient, job_db):
+        """Test POST /jobs queues the job and answers 202"""
+        response = client.post("/api/ai-coach/jobs", json=PLAN_REQUEST)
+
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["plan"] is None
+        assert ObjectId(data["id"]) in job_db.ai_jobs.docs
+
+    async def test_finished_job_includes_plan(self, client: TestClient, job_db):
+        """Test polling a succeeded job returns the stored plan"""
+        job = await queued_job(job_db)
+        with patch.object(plan_jobs, "generate_workout_plan", AsyncMock(return_value=dict(PLAN))):
+            await run_job(job_db, await claim_job(job_db, "w1", 60))
+
+        data = client.get(f"/api/ai-coach/jobs/{job['_id']}").json()
+
+        assert data["status"] == "succeeded"
+        assert data["plan"]["ai_generated_plan"] == "Day 1: squats"
+        assert data["plan"]["request"]["goal"] == "maintain"
+        assert client.get(f"/api/ai-coach/plans/{data['plan_id']}").status_code == 200
+
+    async def test_other_users_job_not_found(self, client: TestClient, job_db):
+        """Test jobs are scoped to their owner"""
+        job = await queued_job(job_db, user_id="someone-else")
+        assert client.get(f"/api/ai-coach/jobs/{job['_id']}").status_code == 404
+        assert client.get("/api/ai-coach/jobs/not-an-id").status_code == 404
+
+    async def test_database_errors_propagate(self, client: TestClient, job_db):
+        """Test a failing lookup is a server error, not a bad or missing id"""
+        assert client.get("/api/ai-coach/plans/not-an-id").status_code == 400
+
+        job_db.ai_jobs.find_one = AsyncMock(side_effect=RuntimeError("connection lost"))
+        job_db.workout_plans.find_one = AsyncMock(side_effect=RuntimeError("connection lost"))
+        with pytest.raises(RuntimeError):
+            client.get(f"/api/ai-coach/jobs/{ObjectId()}")
+        with pytest.raises(RuntimeError):
+            client.get(f"/api/ai-coach/plans/{ObjectId()}")
+
+    async def test_events_stream_until_done(self, client: TestClient, job_db):
+        """Test the SSE endpoint reports status changes and ends with done"""
+        job = await queued_job(job_db)
+
+        async def finish_later():
+            await asyncio.sleep(0.05)
+            with patch.object(plan_jobs, "generate_workout_plan", AsyncMock(return_value=dict(PLAN))):
+                await run_job(job_db, await claim_job(job_db, "w1", 60))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            finisher = asyncio.create_task(finish_later())
+            response = await ac.get(f"/api/ai-coach/jobs/{job['_id']}/events")
+            await finisher
+
+        events = [block.split("\n", 1)[0] for block in response.text.strip().split("\n\n")]
+        assert events[0] == "event: status"
+        assert events[-1] == "event: done"
+        assert "Day 1: squats" in response.text
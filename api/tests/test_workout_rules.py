@@ -0,0 +1,188 @@
+"""
+Test the rule-based workout suggestion path
+"""
+import json
+import re
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import ai_coach, workout_rules
+from app.ai_coach import ConcurrencyLimiter
+from app.exercise_catalog import EXERCISES
+from app.llm import LLMProvider
+from app.models import WorkoutCreate
+from app.workout_rules import classify_request, generate_workout, suggest_from_rules
+
+FRONTEND_LIBRARY = Path(__file__).resolve().parents[2] / "src" / "data" / "exerciseLibrary.js"
+
+
+class CountingModel(LLMProvider):
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    async def generate(self, prompt, endpoint):
+        self.calls += 1
+        return self.text
+
+    async def stream(self, prompt, endpoint):
+        yield await self.generate(prompt, endpoint)
+
+
+class TestClassifier:
+    """Test which requests the rules take on"""
+
+    def test_simple_request_classified(self):
+        """Test region, length and equipment are read from a short request"""
+        intent = classify_request("30 min upper body, dumbbells")
+        assert intent.focus == ("upper",)
+        assert intent.duration_minutes == 30
+        assert "dumbbells" in intent.equipment
+        assert "barbell" not in intent.equipment
+
+    def test_upper_and_lower_is_full_body(self):
+        """Test naming both halves means a full body session"""
+        assert classify_request("arms and legs, 1 hour at the gym").focus == ("full_body",)
+
+    @pytest.mark.parametrize("message", [
+        "My knee hurts, what can I do for legs?",
+        "Build me a 12 week program",
+        "upper body but not chest",
+        "help me get ready for a marathon",
+        "Surprise me with something new",
+        "30 min yoga flow",
+    ])
+    def test_ambiguous_requests_fall_through(self, message):
+        """Test injuries, plans, negations, questions and unknown focus go to the model"""
+        assert classify_request(message) is None
+
+    @pytest.mark.parametrize("message, minutes", [
+        ("hour long hard full body", 60),
+        ("thirty minute upper body", 30),
+        ("forty-five minute full body", 45),
+        ("half an hour of cardio", 30),
+        ("an hour and a half full body", 90),
+    ])
+    def test_spelled_out_durations(self, message, minutes):
+        """Test lengths written in words are read, not replaced by the default"""
+        assert classify_request(message).duration_minutes == minutes
+
+    def test_unreadable_duration_falls_through(self):
+        """Test a length the rules cannot parse goes to the model"""
+        assert classify_request("a few minutes of abs") is None
+
+    def test_word_boundaries(self):
+        """Test focus words only match whole word starts"""
+        assert classify_request("warm crunches") is None  # neither "arm" nor "run"
+        assert classify_request("plank and abs, no equipment").focus == ("core",)
+
+
+class TestGenerator:
+    """Test the template-based workouts"""
+
+    def test_output_is_a_valid_workout(self):
+        """Test generated workouts validate as WorkoutCreate and match the request"""
+        workout = suggest_from_rules("45 minute full body workout at the gym")["workout"]
+
+        WorkoutCreate(**workout)
+        assert workout["duration_minutes"] == 45
+        assert 4 <= len(workout["exercises"]) <= 8
+        assert all(e["exercise_type"] == "strength" and e["sets"] for e in workout["exercises"])
+
+    def test_deterministic(self):
+        """Test the same request always gets the same workout"""
+        assert suggest_from_rules("leg day at the gym") == suggest_from_rules("leg day at the gym")
+
+    def test_respects_equipment_and_difficulty(self):
+        """Test only available equipment and difficulty at or below the request's is used"""
+        intent = classify_request("upper body with dumbbells")
+        names = {e["exercise_name"] for e in generate_workout(intent)["exercises"]}
+        catalog = {e.name: e for e in EXERCISES}
+
+        assert all(catalog[name].equipment in ("dumbbells", "bodyweight") for name in names)
+        assert all(catalog[name].difficulty == "beginner" for name in names)
+
+    def test_goal_sets_prescription(self):
+        """Test the profile's fitness goal picks sets and reps"""
+        workout = suggest_from_rules("upper body, gym", "gain_muscle")["workout"]
+        first = workout["exercises"][0]
+        assert (first["sets"], first["reps"]) == (4, 8)
+
+    def test_muscle_request_only_uses_that_muscle(self):
+        """Test a named muscle group is trained rather than its whole region"""
+        catalog = {e.name: e for e in EXERCISES}
+        assert suggest_from_rules("I want a chest workout") is None  # too few chest moves without a gym
+
+        exercises = suggest_from_rules("advanced chest workout at the gym")["workout"]["exercises"]
+        assert all(catalog[e["exercise_name"]].muscle_groups[0] in ("chest", "upper chest") for e in exercises)
+
+    def test_push_request_only_uses_push_moves(self):
+        """Test a push workout leaves out pulling exercises"""
+        catalog = {e.name: e for e in EXERCISES}
+        names = [e["exercise_name"] for e in suggest_from_rules("a push workout")["workout"]["exercises"]]
+
+        assert "Hammer Curl" not in names
+        assert all(catalog[name].muscle_groups[0] in workout_rules.PUSH_MUSCLES for name in names)
+
+    def test_whole_region_keeps_every_muscle(self):
+        """Test naming the region as well as a muscle does not narrow it"""
+        assert classify_request("upper body and chest, gym").targets == frozenset()
+
+    def test_too_few_exercises_falls_through(self):
+        """Test requests the catalog cannot fill go to the model"""
+        assert suggest_from_rules("lower body, no equipment") is None
+
+    def test_catalog_matches_frontend_library(self):
+        """Test the backend catalog has the same exercises as src/data/exerciseLibrary.js"""
+        names = re.findall(r"name: '([^']+)'", FRONTEND_LIBRARY.read_text(encoding="utf-8"))
+        assert [e.name for e in EXERCISES] == names
+
+
+class TestSuggestEndpoint:
+    """Test the router picks and reports the path"""
+
+    @pytest.fixture
+    def suggest_db(self, mock_db):
+        mock_db.profiles.find_one = AsyncMock(return_value={"fitness_goal": "lose_weight"})
+        mock_db.measurements.find_one = AsyncMock(return_value=None)
+        for collection in (mock_db.workouts, mock_db.meals, mock_db.measurements):
+            collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+        with patch.object(workout_rules, "suggestion_paths", {}), \
+                patch.object(ai_coach, "coach_limiter", ConcurrencyLimiter(5, 5, 1)):
+            yield mock_db
+
+    def test_rules_path_skips_model(self, client: TestClient, suggest_db):
+        """Test a simple request is served by rules without a model call"""
+        model = CountingModel("{}")
+        with patch.object(ai_coach, "llm", model):
+            response = client.post("/api/ai-coach/suggest-workout", json={"message": "30 min upper body, dumbbells"})
+
+        assert response.status_code == 200
+        assert response.json()["source"] == "rules"
+        assert model.calls == 0
+        assert client.get("/metrics").json()["suggest_paths"]["served"] == {"rules": 1}
+
+    def test_rules_path_streams_exercises(self, client: TestClient, suggest_db):
+        """Test the streaming endpoint replays a rules suggestion as exercise events"""
+        with patch.object(ai_coach, "llm", CountingModel("{}")):
+            response = client.post("/api/ai-coach/suggest-workout/stream", json={"message": "30 min upper body, dumbbells"})
+
+        names = re.findall(r"^event: (\w+)$", response.text, re.MULTILINE)
+        assert response.status_code == 200
+        assert names[-1] == "done" and set(names[:-1]) == {"exercise"}
+        assert '"source":"rules"' in response.text
+
+    def test_ambiguous_request_uses_model(self, client: TestClient, suggest_db):
+        """Test an ambiguous request goes to the model and says so"""
+        model = CountingModel(json.dumps({
+            "workout_name": "Rehab", "exercises": [{"exercise_name": "Glute Bridge", "exercise_type": "strength"}],
+        }))
+        with patch.object(ai_coach, "llm", model):
+            response = client.post("/api/ai-coach/suggest-workout", json={"message": "Legs, but my knee hurts"})
+
+        assert response.json()["source"] == "model"
+        assert response.json()["workout"]["workout_name"] == "Rehab"
+        assert model.calls == 1
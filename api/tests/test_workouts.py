@@ -0,0 +1,70 @@
+"""
+Test workout update endpoints
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import ServerSelectionTimeoutError
+from tests.conftest import TEST_USER_ID
+
+
+def stored_workout(**overrides):
+    workout = {
+        "_id": ObjectId(), "user_id": str(TEST_USER_ID), "workout_name": "Push",
+        "exercises": [], "workout_date": datetime(2025, 5, 1), "created_at": datetime(2025, 5, 1),
+        "duration_minutes": 45, "notes": None
+    }
+    workout.update(overrides)
+    return workout
+
+
+class TestWorkoutUpdates:
+    """Test single-round-trip workout updates"""
+
+    def test_put_returns_post_image(self, client, mock_db):
+        """Test PUT uses find_one_and_update and skips a follow-up read"""
+        mock_db.workouts.find_one_and_update = AsyncMock(return_value=stored_workout(workout_name="Pull"))
+        mock_db.workouts.find_one = AsyncMock()
+
+        response = client.put(f"/api/workouts/{ObjectId()}", json={"workout_name": "Pull", "exercises": []})
+
+        assert response.status_code == 200
+        assert response.json()["workout_name"] == "Pull"
+        assert mock_db.workouts.find_one_and_update.call_args.kwargs["return_document"] == ReturnDocument.AFTER
+        mock_db.workouts.find_one.assert_not_awaited()
+
+    def test_patch_sets_only_supplied_fields(self, client, mock_db):
+        """Test PATCH only $sets the fields in the request"""
+        mock_db.workouts.find_one_and_update = AsyncMock(return_value=stored_workout(notes="felt strong"))
+
+        response = client.patch(f"/api/workouts/{ObjectId()}", json={"notes": "felt strong"})
+
+        assert response.status_code == 200
+        update = mock_db.workouts.find_one_and_update.call_args.args[1]
+        assert update == {"$set": {"notes": "felt strong"}}
+
+    def test_patch_missing_workout(self, client, mock_db):
+        """Test PATCH on an unknown workout returns 404"""
+        mock_db.workouts.find_one_and_update = AsyncMock(return_value=None)
+
+        response = client.patch(f"/api/workouts/{ObjectId()}", json={"notes": "x"})
+
+        assert response.status_code == 404
+
+    def test_patch_invalid_id(self, client, mock_db):
+        """Test a malformed workout ID is rejected before querying"""
+        mock_db.workouts.find_one_and_update = AsyncMock()
+
+        response = client.patch("/api/workouts/not-an-id", json={"notes": "x"})
+
+        assert response.status_code == 400
+        mock_db.workouts.find_one_and_update.assert_not_awaited()
+
+    def test_patch_database_error_propagates(self, client, mock_db):
+        """Test a database failure is not reported as a bad workout ID"""
+        mock_db.workouts.find_one_and_update = AsyncMock(side_effect=ServerSelectionTimeoutError("down"))
+
+        with pytest.raises(ServerSelectionTimeoutError):
+            client.patch(f"/api/workouts/{ObjectId()}", json={"notes": "x"})
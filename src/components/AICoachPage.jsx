@@ -13,6 +13,7 @@ function AICoachPage({ onBack }) {
   const [inputMessage, setInputMessage] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const [suggestedWorkout, setSuggestedWorkout] = useState(null)
+  const [conversationId, setConversationId] = useState(null)
   const messagesEndRef = useRef(null)
 
   const scrollToBottom = () => {
@@ -63,7 +64,8 @@ function AICoachPage({ onBack }) {
           setMessages(prev => [...prev, assistantMessage])
         } else {
           // Fallback to regular chat if workout generation failed
-          const response = await apiService.chatWithCoach(messageText, messages)
+          const response = await apiService.chatWithCoach(messageText, messages, conversationId)
+          setConversationId(response.conversation_id)
           const assistantMessage = {
             role: 'assistant',
             content: response.response,
@@ -73,7 +75,8 @@ function AICoachPage({ onBack }) {
         }
       } else {
         // Regular chat response
-        const response = await apiService.chatWithCoach(messageText, messages)
+        const response = await apiService.chatWithCoach(messageText, messages, conversationId)
+        setConversationId(response.conversation_id)
         const assistantMessage = {
           role: 'assistant',
           content: response.response,
@@ -8,6 +8,35 @@
 
 const API_BASE_URL = '/api';
 
+// Reads a server-sent event stream, passing each event's name and parsed data to onEvent.
+// Throws on an `error` event and resolves with the `done` payload, or null if the stream ends first.
+async function readSSE(response, onEvent) {
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ detail: 'Unknown error' }));
+    throw new Error(error.detail || `HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) return null;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const block of events) {
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'error') throw new Error(data.detail);
+      if (event === 'done') return data;
+      onEvent(event, data);
+    }
+  }
+}
+
 class ApiService {
   constructor() {
     this.baseURL = API_BASE_URL;
@@ -174,16 +203,37 @@ class ApiService {
   }
 
   // ==================== AI Coach ====================
-  async chatWithCoach(message, conversationHistory = []) {
+  // Pass the conversation_id from a previous reply to continue a server-side
+  // conversation; the history is only sent to seed a new one.
+  async chatWithCoach(message, conversationHistory = [], conversationId = null) {
     return await this.request('/ai-coach/chat', {
       method: 'POST',
-      body: JSON.stringify({
-        message,
-        conversation_history: conversationHistory
-      }),
+      body: JSON.stringify(this.chatBody(message, conversationHistory, conversationId)),
     });
   }
 
+  chatBody(message, conversationHistory, conversationId) {
+    return conversationId
+      ? { message, conversation_id: conversationId }
+      : { message, conversation_history: conversationHistory };
+  }
+
+  // Streams the reply over SSE; onChunk receives text as it arrives.
+  // Resolves with the final `done` payload ({ response, conversation_id, timestamp, timing }).
+  async streamChatWithCoach(message, conversationHistory = [], onChunk = () => {}, conversationId = null) {
+    const response = await fetch(`${this.baseURL}/ai-coach/chat/stream`, {
+      method: 'POST',
+      headers: this.getHeaders(),
+      body: JSON.stringify(this.chatBody(message, conversationHistory, conversationId)),
+    });
+
+    const result = await readSSE(response, (event, data) => {
+      if (event === 'chunk') onChunk(data.text);
+    });
+    if (!result) throw new Error('Chat stream ended unexpectedly');
+    return result;
+  }
+
   async generateWorkoutPlan(planRequest) {
     return await this.request('/ai-coach/generate-workout-plan', {
       method: 'POST',
@@ -191,6 +241,23 @@ class ApiService {
     });
   }
 
+  // Queues plan generation; poll getPlanJob(job.id) until status is
+  // 'succeeded' (job.plan holds the plan) or 'failed'.
+  async createPlanJob(planRequest) {
+    return await this.request('/ai-coach/jobs', {
+      method: 'POST',
+      body: JSON.stringify(planRequest),
+    });
+  }
+
+  async getPlanJob(jobId) {
+    return await this.request(`/ai-coach/jobs/${jobId}`);
+  }
+
+  async getWorkoutPlans(limit = 10) {
+    return await this.request(`/ai-coach/plans?limit=${limit}`);
+  }
+
   async suggestWorkout(message) {
     return await this.request('/ai-coach/suggest-workout', {
       method: 'POST',
@@ -198,6 +265,22 @@ class ApiService {
     });
   }
 
+  // Streams the suggestion over SSE; onExercise(exercise, index) fires as each exercise is generated.
+  // Resolves with the final `done` payload (same shape as suggestWorkout).
+  async streamWorkoutSuggestion(message, onExercise = () => {}) {
+    const response = await fetch(`${this.baseURL}/ai-coach/suggest-workout/stream`, {
+      method: 'POST',
+      headers: this.getHeaders(),
+      body: JSON.stringify({ message }),
+    });
+
+    const result = await readSSE(response, (event, data) => {
+      if (event === 'exercise') onExercise(data.exercise, data.index);
+    });
+    if (!result) throw new Error('Workout suggestion stream ended unexpectedly');
+    return result;
+  }
+
   // ==================== Workouts ====================
   async getWorkouts(limit = 30, skip = 0) {
     return await this.request(`/workouts?limit=${limit}&skip=${skip}`);
@@ -240,6 +323,11 @@ class ApiService {
     return await this.request('/nutrition/summary/today');
   }
 
+  async getNutritionSummary(from, to, bucket = 'day') {
+    const params = new URLSearchParams({ from, to, bucket });
+    return await this.request(`/nutrition/summary?${params}`);
+  }
+
   async createMeal(mealData) {
     return await this.request('/nutrition', {
       method: 'POST',